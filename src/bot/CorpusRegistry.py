@@ -0,0 +1,118 @@
+import os
+import re
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from DevotionalCorpus import DevotionalCorpus
+from LogPipeline import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_CORPUS = "default"
+# devotional_prompts.json is the default corpus, devotional_prompts.<name>.json another
+CORPUS_FILE = re.compile(r"^devotional_prompts(?:\.([A-Za-z0-9_-]+))?\.json$")
+
+
+class CorpusRegistry:
+    """
+    Every devotional corpus under a directory, each loaded when it's first used.
+
+    ``devotional_prompts.es.json`` is the corpus called "es", for a
+    translation, another year's readings and so on. Only the ``capacity``
+    most recently used corpora stay in memory; the least recently used one is
+    dropped when another has to be loaded, and read back if it's needed
+    again. Pinned corpora, like the default one the cog keeps loaded itself,
+    don't count towards the capacity and are never dropped.
+
+    Requests for a corpus that is already being read wait for that read
+    rather than starting another.
+    """
+
+    def __init__(self, directory: str, capacity: int = 3):
+        self.directory = directory
+        self.capacity = capacity
+        self.paths: Dict[str, str] = {}
+        self.loads = 0
+        self._resident: "OrderedDict[str, DevotionalCorpus]" = OrderedDict()
+        self._pinned: Dict[str, DevotionalCorpus] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+
+    def __len__(self):
+        """Corpora in memory"""
+        return len(self._resident) + len(self._pinned)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.paths or name in self._pinned
+
+    def _scan(self) -> Dict[str, str]:
+        paths = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                match = CORPUS_FILE.match(entry.name)
+                if match and entry.is_file():
+                    paths[match.group(1) or DEFAULT_CORPUS] = entry.path
+        return paths
+
+    async def discover(self) -> List[str]:
+        """Find the corpora in the directory; returns their names"""
+        try:
+            self.paths = await asyncio.to_thread(self._scan)
+        except OSError as e:
+            log.error(f"Failed to list devotional corpora in {self.directory}: {e}")
+        for name in [name for name in self._resident if name not in self.paths]:
+            del self._resident[name]
+        return self.names()
+
+    def names(self) -> List[str]:
+        return sorted(set(self.paths) | set(self._pinned))
+
+    def pin(self, name: str, corpus: DevotionalCorpus) -> None:
+        """Keep a corpus in memory, outside the LRU"""
+        self._resident.pop(name, None)
+        self._pinned[name] = corpus
+
+    def resident(self, name: str) -> Optional[DevotionalCorpus]:
+        """A corpus if it's in memory, without loading it or counting it as used"""
+        return self._pinned.get(name) or self._resident.get(name)
+
+    def clear(self) -> None:
+        """Drop every corpus that isn't pinned, so each is read again when next used"""
+        self._resident.clear()
+
+    async def get(self, name: str) -> DevotionalCorpus:
+        """
+        A corpus by name, loading it if it isn't in memory.
+
+        Raises KeyError for an unknown name, and OSError or ValueError if its
+        file can't be read.
+        """
+        corpus = self._pinned.get(name)
+        if corpus is not None:
+            return corpus
+        corpus = self._resident.get(name)
+        if corpus is not None:
+            self._resident.move_to_end(name)
+            return corpus
+        if name not in self.paths:
+            raise KeyError(name)
+
+        load = self._loading.get(name)
+        if load is None:
+            load = self._loading[name] = asyncio.ensure_future(self._load(name))
+        # A cancelled caller mustn't cancel the load for everyone waiting on it
+        return await asyncio.shield(load)
+
+    async def _load(self, name: str) -> DevotionalCorpus:
+        path = self.paths[name]
+        try:
+            corpus = await asyncio.to_thread(DevotionalCorpus.from_file, path)
+        finally:
+            del self._loading[name]
+        self.loads += 1
+        corpus.log_problems(os.path.basename(path))
+        self._resident[name] = corpus
+        while len(self._resident) > self.capacity:
+            evicted, _ = self._resident.popitem(last=False)
+            log.info(f"Dropped devotional corpus {evicted} from memory")
+        log.info(f"Loaded devotional corpus {name} with {len(corpus)} devotionals")
+        return corpus
@@ -0,0 +1,73 @@
+import json
+from typing import Dict, List, Optional
+from LogPipeline import get_logger
+
+log = get_logger(__name__)
+
+DAYS_IN_YEAR = 366
+
+
+def format_days(days: List[int]) -> str:
+    """Collapse sorted days into ranges, e.g. [1, 2, 3, 7] -> '1-3, 7'"""
+    ranges = []
+    for day in days:
+        if ranges and ranges[-1][1] == day - 1:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return ", ".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+class DevotionalCorpus:
+    """
+    Devotional entries indexed by day of the year.
+
+    Entries without a valid day are dropped, and when a day appears more than
+    once the first entry wins, matching the old linear scan. Problems are
+    recorded on the corpus so callers can report them.
+    """
+
+    def __init__(self, entries: List[dict]):
+        self.by_day: Dict[int, dict] = {}
+        self.invalid_entries = 0
+        self.duplicate_days: List[int] = []
+
+        for entry in entries:
+            day = entry.get("day") if isinstance(entry, dict) else None
+            if not isinstance(day, int) or isinstance(day, bool) or not 1 <= day <= DAYS_IN_YEAR:
+                self.invalid_entries += 1
+                continue
+            if day in self.by_day:
+                self.duplicate_days.append(day)
+                continue
+            self.by_day[day] = entry
+
+        self.entries: List[dict] = list(self.by_day.values())
+        self.missing_days: List[int] = [day for day in range(1, DAYS_IN_YEAR + 1) if day not in self.by_day]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, day: int) -> Optional[dict]:
+        """Get the devotional for a day of the year"""
+        return self.by_day.get(day)
+
+    def log_problems(self, name: str) -> None:
+        if self.invalid_entries:
+            log.warning(f"{name}: skipped {self.invalid_entries} entries without a valid day")
+        if self.duplicate_days:
+            days = format_days(sorted(set(self.duplicate_days)))
+            log.warning(f"{name}: duplicate entries for days {days}, using the first of each")
+        if self.missing_days:
+            log.warning(f"{name}: no devotional for days {format_days(self.missing_days)}")
+
+    @classmethod
+    def from_file(cls, path: str) -> "DevotionalCorpus":
+        """Parse and index a devotional JSON file"""
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+
+        if not isinstance(data, list):
+            raise ValueError("expected a list of devotionals")
+
+        return cls(data)
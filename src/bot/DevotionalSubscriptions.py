@@ -0,0 +1,401 @@
+import os
+import time
+import heapq
+import asyncio
+import sqlite3
+import itertools
+from contextlib import closing
+from datetime import date, datetime, timedelta, tzinfo
+from datetime import time as dt_time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from Scheduler import MAX_SLEEP, localize
+from LogPipeline import get_logger
+
+log = get_logger(__name__)
+
+Due = List[Tuple["Subscription", date]]
+
+
+def resolve_timezone(name: Optional[str]) -> Optional[tzinfo]:
+    """
+    The time zone called ``name``, e.g. "Europe/London"; None means the bot's own.
+
+    Raises ValueError for a name that isn't a known IANA time zone.
+    """
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"unknown time zone {name!r}") from None
+
+
+def next_delivery(at: dt_time, tz: Optional[tzinfo], after: datetime) -> datetime:
+    """First ``at`` in ``tz`` strictly after ``after``"""
+    day = after.astimezone(tz).date()
+    for offset in range(3):
+        run = localize(datetime.combine(day + timedelta(days=offset), at), tz)
+        if run > after:
+            return run
+    raise ValueError(f"no delivery after {after.isoformat()}")
+
+
+def previous_delivery(at: dt_time, tz: Optional[tzinfo], before: datetime) -> datetime:
+    """Last ``at`` in ``tz`` at or before ``before``"""
+    day = before.astimezone(tz).date()
+    for offset in range(3):
+        run = localize(datetime.combine(day - timedelta(days=offset), at), tz)
+        if run <= before:
+            return run
+    raise ValueError(f"no delivery before {before.isoformat()}")
+
+
+class Subscription:
+    """A user who gets the devotional by DM at ``at`` in their time zone"""
+
+    __slots__ = ("user_id", "channel_id", "at", "tz_name", "tz", "last_day", "due")
+
+    def __init__(self, user_id: int, channel_id: int, at: dt_time, tz_name: Optional[str] = None):
+        self.user_id = user_id
+        # The DM channel, so deliveries need no user lookup or extra request
+        self.channel_id = channel_id
+        self.at = at
+        self.tz_name = tz_name
+        self.tz = resolve_timezone(tz_name)
+        # The user's local date of the last devotional they were sent
+        self.last_day: Optional[date] = None
+        self.due: Optional[datetime] = None
+
+    def to_list(self) -> list:
+        return [
+            self.channel_id,
+            self.at.strftime("%H:%M"),
+            self.tz_name,
+            self.last_day.isoformat() if self.last_day else None,
+        ]
+
+    @classmethod
+    def from_list(cls, user_id: int, data: list) -> "Subscription":
+        channel_id, at, tz_name, last_day = data
+        subscription = cls(user_id, channel_id, dt_time.fromisoformat(at), tz_name)
+        subscription.last_day = date.fromisoformat(last_day) if last_day else None
+        return subscription
+
+
+class DevotionalSubscriptions:
+    """
+    Users' devotional DM subscriptions, each delivered at the user's local time.
+
+    Every subscription's next delivery sits in one heap, and a single task
+    sleeps until the earliest is due, so tens of thousands of subscriptions
+    cost one timer rather than a poll over all of them. Everything due at the
+    same moment is handed to ``deliver`` as one batch.
+
+    Subscriptions and the day each user was last sent a devotional are kept
+    in SQLite, a row per user, and a save writes only the users whose row
+    changed since the last one, so a day's deliveries cost a row each however
+    many users are subscribed. On start, a delivery missed while the bot was
+    down is made as long as it's no older than ``catch_up``.
+    """
+
+    def __init__(self, path: str, catch_up: Optional[timedelta] = None):
+        self.path = path
+        self.catch_up = catch_up
+        self.subscriptions: Dict[int, Subscription] = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._deliver: Optional[Callable[[Due], Awaitable]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = set()
+        # Users whose subscription changed here since the last save
+        self._changed: Set[int] = set()
+        # Created on first use so they bind to the bot's running loop
+        self._wake: Optional[asyncio.Event] = None
+        self._save_lock: Optional[asyncio.Lock] = None
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def get(self, user_id: int) -> Optional[Subscription]:
+        return self.subscriptions.get(user_id)
+
+    def _schedule(self, subscription: Subscription, due: datetime) -> None:
+        subscription.due = due
+        heapq.heappush(self._heap, (due.timestamp(), next(self._counter), subscription, due))
+        # Replaced and removed subscriptions leave stale entries behind
+        if len(self._heap) > 2 * len(self.subscriptions) + 1024:
+            self._heap = [entry for entry in self._heap if self._is_current(entry)]
+            heapq.heapify(self._heap)
+        if self._wake is not None:
+            self._wake.set()
+
+    def _is_current(self, entry) -> bool:
+        _, _, subscription, due = entry
+        return self.subscriptions.get(subscription.user_id) is subscription and subscription.due is due
+
+    @staticmethod
+    def _next_due(subscription: Subscription, after: datetime) -> datetime:
+        """The next delivery for a day the user hasn't been sent yet"""
+        due = next_delivery(subscription.at, subscription.tz, after)
+        # Changing the time mustn't send the same day's devotional twice
+        while subscription.last_day is not None and due.date() <= subscription.last_day:
+            due = next_delivery(subscription.at, subscription.tz, due)
+        return due
+
+    def _first_due(self, subscription: Subscription, now: datetime) -> datetime:
+        """The next delivery, or the last one if it was missed within ``catch_up``"""
+        previous = previous_delivery(subscription.at, subscription.tz, now)
+        missed = subscription.last_day is not None and subscription.last_day < previous.date()
+        if missed and self.catch_up and now - previous <= self.catch_up:
+            return previous
+        return self._next_due(subscription, now)
+
+    async def subscribe(
+        self, user_id: int, channel_id: int, at: dt_time, tz_name: Optional[str] = None
+    ) -> Subscription:
+        """
+        Subscribe a user, replacing any subscription they had.
+
+        Raises ValueError if ``tz_name`` isn't a known time zone.
+        """
+        subscription = Subscription(user_id, channel_id, at, tz_name)
+        previous = self.subscriptions.get(user_id)
+        if previous is not None:
+            subscription.last_day = previous.last_day
+        self.subscriptions[user_id] = subscription
+        self._changed.add(user_id)
+        self._schedule(subscription, self._next_due(subscription, datetime.now().astimezone()))
+        await self.save()
+        return subscription
+
+    def remove(self, user_id: int) -> bool:
+        """Remove a user's subscription, saved with the next save; False if they had none"""
+        if self.subscriptions.pop(user_id, None) is None:
+            return False
+        self._changed.add(user_id)
+        return True
+
+    async def unsubscribe(self, user_id: int) -> bool:
+        """Remove a user's subscription; False if they had none"""
+        if not self.remove(user_id):
+            return False
+        await self.save()
+        return True
+
+    def pop_due(self, now: datetime) -> Due:
+        """Every subscription due by ``now`` with the day it's due for, each rescheduled for its next delivery"""
+        due = []
+        timestamp = now.timestamp()
+        while self._heap and self._heap[0][0] <= timestamp:
+            entry = heapq.heappop(self._heap)
+            if not self._is_current(entry):
+                continue
+            _, _, subscription, run = entry
+            due.append((subscription, run.date()))
+            self._schedule(subscription, next_delivery(subscription.at, subscription.tz, max(run, now)))
+        return due
+
+    async def claim(self, due: Due) -> Due:
+        """The due deliveries this process should make; all of them unless others share the subscriptions"""
+        return due
+
+    def mark_sent(self, subscription: Subscription, day: date) -> None:
+        subscription.last_day = day
+        self._changed.add(subscription.user_id)
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            """CREATE TABLE IF NOT EXISTS subscriptions (
+                user_id INTEGER PRIMARY KEY,
+                channel_id INTEGER NOT NULL,
+                at TEXT NOT NULL,
+                tz TEXT,
+                last_day TEXT
+            )"""
+        )
+        return connection
+
+    def _read(self) -> dict:
+        with closing(self._connect()) as connection:
+            rows = connection.execute("SELECT user_id, channel_id, at, tz, last_day FROM subscriptions")
+            return {user_id: list(value) for user_id, *value in rows}
+
+    def _write_rows(self, rows: list, deleted: list) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.executemany("DELETE FROM subscriptions WHERE user_id = ?", deleted)
+            # last_day only moves forward; a sharded bot's worker may be behind the claims others made
+            connection.executemany(
+                """INSERT INTO subscriptions (user_id, channel_id, at, tz, last_day) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    channel_id = excluded.channel_id,
+                    at = excluded.at,
+                    tz = excluded.tz,
+                    last_day = NULLIF(MAX(COALESCE(last_day, ''), COALESCE(excluded.last_day, '')), '')""",
+                rows,
+            )
+
+    async def load(self) -> None:
+        """Load subscriptions from disk and schedule their next deliveries"""
+        try:
+            data = await asyncio.to_thread(self._read)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            log.error(f"Failed to load devotional subscriptions from {self.path}: {e}")
+            return
+
+        now = datetime.now().astimezone()
+        self.subscriptions, self._heap = {}, []
+        for user_id, value in data.items():
+            try:
+                subscription = Subscription.from_list(int(user_id), value)
+            except ValueError as e:
+                log.error(f"Skipping devotional subscription for user {user_id}: {e}")
+                continue
+            self.subscriptions[subscription.user_id] = subscription
+            subscription.due = self._first_due(subscription, now)
+            self._heap.append((subscription.due.timestamp(), next(self._counter), subscription, subscription.due))
+        heapq.heapify(self._heap)
+        log.info(f"Loaded {len(self.subscriptions)} devotional subscriptions")
+
+    async def save(self) -> None:
+        """Write the subscriptions that changed here since the last save"""
+        if self._save_lock is None:
+            self._save_lock = asyncio.Lock()
+        async with self._save_lock:
+            changed, self._changed = self._changed, set()
+            if not changed:
+                return
+            rows, deleted = [], []
+            for user_id in changed:
+                subscription = self.subscriptions.get(user_id)
+                if subscription is None:
+                    deleted.append((user_id,))
+                else:
+                    rows.append((user_id, *subscription.to_list()))
+            try:
+                await asyncio.to_thread(self._write_rows, rows, deleted)
+            except (OSError, sqlite3.Error) as e:
+                self._changed |= changed
+                log.error(f"Failed to save devotional subscriptions to {self.path}: {e}")
+
+    def start(self, deliver: Callable[[Due], Awaitable]) -> None:
+        """Call ``deliver`` with each batch of due subscriptions from now on"""
+        self._deliver = deliver
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.ensure_future(self._loop())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            self._wake.clear()
+            delay = MAX_SLEEP
+            if self._heap:
+                delay = min(delay, max(0.0, self._heap[0][0] - time.time()))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                continue
+            except asyncio.TimeoutError:
+                pass
+
+            due = self.pop_due(datetime.now().astimezone())
+            if due:
+                # A slow batch mustn't hold up the next one
+                task = asyncio.ensure_future(self._run(due))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+    async def _run(self, due: Due) -> None:
+        try:
+            due = await self.claim(due)
+            if due:
+                await self._deliver(due)
+        except Exception as e:
+            log.error(f"Failed to deliver devotional subscriptions: {e}")
+        await self.save()
+
+
+class SharedDevotionalSubscriptions(DevotionalSubscriptions):
+    """
+    Devotional subscriptions in an SQLite database shared by the workers of
+    a sharded bot.
+
+    Every worker schedules every subscription, and claims each delivery
+    before making it by recording the day against the subscription, which
+    only one worker can do, so each user still gets one DM a day. A claimed
+    delivery that fails isn't retried. Each worker re-reads the table every
+    ``sync_interval`` seconds to pick up the others' changes.
+    """
+
+    def __init__(self, path: str, catch_up: Optional[timedelta] = None, sync_interval: float = 300):
+        super().__init__(path, catch_up)
+        self.sync_interval = sync_interval
+        self._sync_task: Optional[asyncio.Task] = None
+
+    def _claim_rows(self, claims: list) -> List[bool]:
+        with closing(self._connect()) as connection, connection:
+            return [
+                connection.execute(
+                    "UPDATE subscriptions SET last_day = ? WHERE user_id = ? AND (last_day IS NULL OR last_day < ?)",
+                    (day, user_id, day),
+                ).rowcount
+                == 1
+                for user_id, day in claims
+            ]
+
+    def mark_sent(self, subscription: Subscription, day: date) -> None:
+        # Claiming the delivery already stored the day
+        subscription.last_day = day
+
+    async def claim(self, due: Due) -> Due:
+        """The due deliveries no other worker has made, now recorded as made by this one"""
+        claims = [(subscription.user_id, day.isoformat()) for subscription, day in due]
+        try:
+            claimed = await asyncio.to_thread(self._claim_rows, claims)
+        except (OSError, sqlite3.Error) as e:
+            log.error(f"Failed to claim devotional deliveries, skipping {len(due)}: {e}")
+            return []
+        # Unclaimed ones were sent by another worker, or unsubscribed there
+        return [delivery for delivery, won in zip(due, claimed) if won]
+
+    async def sync(self) -> None:
+        """Pick up the subscriptions other workers added, changed or removed"""
+        await self.save()
+        await self.load()
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self, deliver: Callable[[Due], Awaitable]) -> None:
+        super().start(deliver)
+        if self._sync_task is None:
+            self._sync_task = asyncio.ensure_future(self._sync_loop())
+
+    def stop(self) -> None:
+        super().stop()
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            self._sync_task = None
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.sync()
+
+
+def create_devotional_subscriptions(
+    data_dir: str, catch_up: Optional[timedelta] = None, shared: bool = False
+) -> DevotionalSubscriptions:
+    """Subscriptions in SQLite, shared by the workers of a sharded bot if ``shared``"""
+    path = os.path.join(data_dir, "devotional_subscriptions.sqlite3")
+    if shared:
+        return SharedDevotionalSubscriptions(path, catch_up)
+    return DevotionalSubscriptions(path, catch_up)
@@ -0,0 +1,269 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Iterator, Optional, Tuple
+from discord.ext import commands
+from FanOut import RateLimiter
+from Metrics import Metrics
+
+# Seconds a message waited in its channel's queue
+QUEUE_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Dropped(Exception):
+    """A message the dispatcher refused because its channel's queue is full"""
+
+
+class Cooldowns:
+    """
+    Token buckets allowing ``rate`` actions per second per key, in bursts of up to ``burst``.
+
+    Each key holding a refilling bucket costs one (tokens, updated) pair.
+    A full bucket is the same as no bucket, so those are pruned once the
+    table doubles in size, keeping memory proportional to active keys.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[Hashable, Tuple[float, float]] = {}
+        self._prune_at = 1024
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _tokens(self, key: Hashable, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.burst
+        tokens, updated = bucket
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def retry_after(self, key: Hashable, now: float) -> float:
+        """Seconds until ``key`` may act again, 0 if it may act now"""
+        tokens = self._tokens(key, now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def consume(self, key: Hashable, now: float) -> None:
+        self._buckets[key] = (self._tokens(key, now) - 1, now)
+        if len(self._buckets) >= self._prune_at:
+            self.prune(now)
+
+    def prune(self, now: float) -> None:
+        """Forget every key whose bucket has refilled"""
+        for key in [key for key in self._buckets if self._tokens(key, now) >= self.burst]:
+            del self._buckets[key]
+        self._prune_at = max(1024, len(self._buckets) * 2)
+
+
+class _Outbound:
+    __slots__ = ("send", "content", "kwargs", "key", "future", "queued_at")
+
+    def __init__(self, send: Callable, content: Any, kwargs: dict, key: Optional[tuple]):
+        self.send = send
+        self.content = content
+        self.kwargs = kwargs
+        self.key = key
+        self.future = asyncio.get_running_loop().create_future()
+        self.queued_at = time.monotonic()
+
+
+class Dispatcher:
+    """
+    The single way the bot sends messages.
+
+    Commands are checked against two cooldowns before they run, one per user
+    and one per user and command, and refused when either is empty, so a
+    refused command changes nothing. Channel messages
+    wait in a bounded queue per channel drained one at a time, so a burst in
+    one channel can't pile requests onto its rate limit bucket, and new sends
+    start at no more than ``rate`` per second across channels. A message that
+    is identical to one still queued or sending in the same channel, and for
+    the same user when it's a reply, is not sent again; its caller gets the
+    same message.
+
+    Slash command replies skip the channel queue: they are answered through
+    the interaction, which has to happen within a few seconds and doesn't
+    count against the channel's limits.
+    """
+
+    def __init__(
+        self,
+        metrics: Metrics,
+        user_rate: Optional[float] = 1.0,
+        user_burst: int = 5,
+        command_rate: Optional[float] = 0.5,
+        command_burst: int = 3,
+        queue_size: int = 20,
+        rate: Optional[float] = 40,
+    ):
+        self.user_cooldowns = Cooldowns(user_rate, user_burst) if user_rate else None
+        self.command_cooldowns = Cooldowns(command_rate, command_burst) if command_rate else None
+        self.queue_size = queue_size
+        self.rate = rate
+        self.depth = 0
+        self._limiter: Optional[RateLimiter] = None
+        self._queues: Dict[int, Deque[_Outbound]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._pending: Dict[tuple, _Outbound] = {}
+
+        self.messages = metrics.counter("bot_dispatch_messages_total", "Outbound messages by outcome")
+        self.queue_wait = metrics.histogram(
+            "bot_dispatch_queue_wait_seconds", "Time messages waited in their channel's queue", QUEUE_WAIT_BUCKETS
+        )
+        metrics.gauge("bot_dispatch_queue_depth", "Messages waiting in channel queues", lambda: self.depth)
+        metrics.gauge("bot_dispatch_active_channels", "Channels with queued messages", lambda: len(self._queues))
+        metrics.gauge(
+            "bot_dispatch_cooldown_keys",
+            "Users and user/command pairs on cooldown",
+            lambda: sum(len(cooldowns) for cooldowns in (self.user_cooldowns, self.command_cooldowns) if cooldowns),
+        )
+
+    def _cooldowns(self, user_id: int, command: Optional[str]) -> Iterator[Tuple[Cooldowns, Hashable]]:
+        if self.user_cooldowns is not None:
+            yield self.user_cooldowns, user_id
+        if self.command_cooldowns is not None:
+            yield self.command_cooldowns, (user_id, command)
+
+    def check_cooldown(self, ctx) -> None:
+        """
+        Take a command out of its author's cooldowns before it runs.
+
+        Raises commands.CommandOnCooldown, taking nothing, if either is empty.
+        """
+        now = time.monotonic()
+        command = ctx.command.qualified_name if ctx.command is not None else None
+        buckets = list(self._cooldowns(ctx.author.id, command))
+        retry_after, empty = 0.0, None
+        for cooldowns, key in buckets:
+            wait = cooldowns.retry_after(key, now)
+            if wait > retry_after:
+                retry_after, empty = wait, cooldowns
+        if empty is not None:
+            self.messages.inc(outcome="cooldown")
+            cooldown = commands.Cooldown(empty.burst, empty.burst / empty.rate)
+            raise commands.CommandOnCooldown(cooldown, retry_after, commands.BucketType.user)
+        for cooldowns, key in buckets:
+            cooldowns.consume(key, now)
+
+    @staticmethod
+    def _coalesce_key(channel_id: int, recipient: Optional[int], content: Any, kwargs: dict) -> Optional[tuple]:
+        """What makes two messages to a channel the same, None if they can't be merged"""
+        if not kwargs.keys() <= {"embed", "ephemeral"}:
+            return None
+        embed = kwargs.get("embed")
+        if embed is not None:
+            # Embeds built for the same reply only differ in their timestamp
+            payload = embed.to_dict()
+            payload.pop("timestamp", None)
+            embed = repr(sorted(payload.items()))
+        return (channel_id, recipient, content, embed)
+
+    async def reply(self, ctx, content=None, **kwargs):
+        """
+        Reply to a command.
+
+        Returns the sent message, or None if the channel's queue was full.
+        """
+        if ctx.interaction is not None:
+            message = await ctx.send(content, **kwargs)
+            self.messages.inc(outcome="sent")
+            return message
+        try:
+            # Only merged with the same reply to the same user, so nobody's answer is lost
+            return await self._enqueue(ctx.channel.id, ctx.send, content, kwargs, ctx.author.id)
+        except Dropped:
+            return None
+
+    async def send(self, channel, content=None, **kwargs):
+        """
+        Send a message to a channel through its queue.
+
+        Raises Dropped if the channel's queue is full.
+        """
+        return await self._enqueue(channel.id, channel.send, content, kwargs)
+
+    async def _enqueue(
+        self, channel_id: int, send: Callable, content: Any, kwargs: dict, recipient: Optional[int] = None
+    ):
+        key = self._coalesce_key(channel_id, recipient, content, kwargs)
+        if key is not None:
+            pending = self._pending.get(key)
+            if pending is not None:
+                self.messages.inc(outcome="coalesced")
+                return await asyncio.shield(pending.future)
+
+        queue = self._queues.get(channel_id)
+        if queue is None:
+            queue = self._queues[channel_id] = deque()
+            self._workers[channel_id] = asyncio.ensure_future(self._drain(channel_id, queue))
+        elif len(queue) >= self.queue_size:
+            self.messages.inc(outcome="overflow")
+            raise Dropped(f"queue for channel {channel_id} is full")
+
+        item = _Outbound(send, content, kwargs, key)
+        queue.append(item)
+        self.depth += 1
+        if key is not None:
+            self._pending[key] = item
+        # A cancelled caller mustn't cancel the send for everyone waiting on it
+        return await asyncio.shield(item.future)
+
+    async def _drain(self, channel_id: int, queue: Deque[_Outbound]) -> None:
+        """Send a channel's messages in order, one at a time, until its queue is empty"""
+        try:
+            while queue:
+                # Stays queued while it sends so a cancelled worker cancels it too
+                item = queue[0]
+                if self.rate:
+                    if self._limiter is None:
+                        self._limiter = RateLimiter(self.rate)
+                    await self._limiter.acquire()
+                self.queue_wait.observe(time.monotonic() - item.queued_at)
+                try:
+                    message = await item.send(item.content, **item.kwargs)
+                except Exception as e:
+                    self.messages.inc(outcome="error")
+                    item.future.set_exception(e)
+                else:
+                    self.messages.inc(outcome="sent")
+                    item.future.set_result(message)
+                queue.popleft()
+                self.depth -= 1
+                if item.key is not None:
+                    self._pending.pop(item.key, None)
+        finally:
+            del self._queues[channel_id]
+            del self._workers[channel_id]
+            # Only left over when the worker was cancelled
+            for item in queue:
+                item.future.cancel()
+                if item.key is not None:
+                    self._pending.pop(item.key, None)
+            self.depth -= len(queue)
+
+    def close(self) -> None:
+        """Stop sending; messages still queued are cancelled"""
+        for worker in list(self._workers.values()):
+            worker.cancel()
+
+
+def create_dispatcher(metrics: Metrics) -> Dispatcher:
+    """
+    Build the dispatcher configured by the environment.
+
+    DISPATCH_USER_RATE/BURST limit each user's replies across commands,
+    DISPATCH_COMMAND_RATE/BURST each user's replies to one command (a rate of
+    0 turns a cooldown off). DISPATCH_QUEUE_SIZE bounds each channel's queue
+    and DISPATCH_RATE the sends started per second across channels (0 for no limit).
+    """
+    return Dispatcher(
+        metrics,
+        user_rate=float(os.getenv("DISPATCH_USER_RATE", 1.0)),
+        user_burst=int(os.getenv("DISPATCH_USER_BURST", 5)),
+        command_rate=float(os.getenv("DISPATCH_COMMAND_RATE", 0.5)),
+        command_burst=int(os.getenv("DISPATCH_COMMAND_BURST", 3)),
+        queue_size=int(os.getenv("DISPATCH_QUEUE_SIZE", 20)),
+        rate=float(os.getenv("DISPATCH_RATE", 40)),
+    )
@@ -0,0 +1,222 @@
+import os
+import re
+import time
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from LogPipeline import get_logger
+
+log = get_logger(__name__)
+
+# Rows deleted per transaction when compacting, so writers are never held up long
+COMPACT_BATCH = 5000
+
+Entry = Tuple[int, int, str]
+
+
+def owner_terms(user_id: int, text: str) -> str:
+    """
+    The words of ``text`` as they're indexed: each one prefixed with its owner.
+
+    "Work meeting" logged by user 42 becomes "u42xwork u42xmeeting", so the
+    postings for a word are kept per user and a search reads only its own.
+    """
+    return " ".join(f"u{user_id}x{word}" for word in re.findall(r"[^\W_]+", text.lower()))
+
+
+def match_query(user_id: int, terms: str) -> Optional[str]:
+    """
+    An FTS5 query matching a user's entries that contain every word of ``terms``.
+
+    Words are quoted so user input can't use query syntax. The index stems
+    words, so "meetings" also finds "meeting".
+    """
+    words = owner_terms(user_id, terms).split()
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words[:8])
+
+
+class DistractionJournal:
+    """
+    Every distraction users have logged, in SQLite with a full-text index.
+
+    Entries are appended to a plain table, and triggers keep an FTS5 inverted
+    index over their words up to date as each one is inserted, so a search
+    reads only the postings for its terms rather than scanning history.
+    Words are indexed together with their owner (see ``owner_terms``), so how
+    long a search takes depends on the user's history, not everyone's.
+    Results are ranked with BM25.
+
+    New entries are buffered and written in one transaction per
+    ``flush_interval`` seconds, or before a read so it sees them. All
+    database work runs on a single worker thread.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pending: List[Tuple[int, Optional[int], int, str]] = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="distraction-journal")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        # Created on first use so it binds to the bot's running loop
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            # Used by the index's triggers, so it has to exist before any write
+            connection.create_function("owner_terms", 2, owner_terms, deterministic=True)
+            # Only takes effect for a new file; lets compaction return space
+            connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS journal (
+                    id INTEGER PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    guild_id INTEGER,
+                    logged_at INTEGER NOT NULL,
+                    text TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS journal_user ON journal (user_id, id);
+                CREATE INDEX IF NOT EXISTS journal_logged_at ON journal (logged_at);
+
+                -- The index's view of an entry: its words, prefixed with its owner
+                CREATE VIEW IF NOT EXISTS journal_content AS
+                    SELECT id, owner_terms(user_id, text) AS terms FROM journal;
+                CREATE VIRTUAL TABLE IF NOT EXISTS journal_index USING fts5(
+                    terms, content='journal_content', content_rowid='id', tokenize='porter unicode61'
+                );
+
+                CREATE TRIGGER IF NOT EXISTS journal_indexed AFTER INSERT ON journal BEGIN
+                    INSERT INTO journal_index (rowid, terms) VALUES (new.id, owner_terms(new.user_id, new.text));
+                END;
+                CREATE TRIGGER IF NOT EXISTS journal_unindexed AFTER DELETE ON journal BEGIN
+                    INSERT INTO journal_index (journal_index, rowid, terms)
+                    VALUES ('delete', old.id, owner_terms(old.user_id, old.text));
+                END;
+                """
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _close_connection(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _write_entries(self, entries) -> None:
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                "INSERT INTO journal (user_id, guild_id, logged_at, text) VALUES (?, ?, ?, ?)", entries
+            )
+
+    def _read_history(self, user_id: int, limit: int, offset: int) -> List[Entry]:
+        cursor = self._connect().execute(
+            "SELECT id, logged_at, text FROM journal WHERE user_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (user_id, limit, offset),
+        )
+        return cursor.fetchall()
+
+    def _read_search(self, query: str, limit: int, offset: int) -> List[Entry]:
+        cursor = self._connect().execute(
+            """SELECT journal.id, journal.logged_at, journal.text
+            FROM journal_index JOIN journal ON journal.id = journal_index.rowid
+            WHERE journal_index MATCH ?
+            ORDER BY bm25(journal_index), journal.id DESC
+            LIMIT ? OFFSET ?""",
+            (query, limit, offset),
+        )
+        return cursor.fetchall()
+
+    def _delete_before(self, cutoff: int) -> int:
+        connection = self._connect()
+        deleted = 0
+        while True:
+            with connection:
+                cursor = connection.execute(
+                    "DELETE FROM journal WHERE id IN (SELECT id FROM journal WHERE logged_at < ? LIMIT ?)",
+                    (cutoff, COMPACT_BATCH),
+                )
+            deleted += cursor.rowcount
+            if cursor.rowcount < COMPACT_BATCH:
+                break
+        if deleted:
+            with connection:
+                # Merge the index's segments and hand freed pages back
+                connection.execute("INSERT INTO journal_index (journal_index) VALUES ('optimize')")
+            connection.execute("PRAGMA incremental_vacuum")
+        return deleted
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def add(self, user_id: int, guild_id: Optional[int], text: str, logged_at: Optional[int] = None) -> None:
+        """Append an entry; it is written with the next flush"""
+        self._pending.append((user_id, guild_id, logged_at or int(time.time()), text))
+
+    async def history(self, user_id: int, limit: int = 10, offset: int = 0) -> List[Entry]:
+        """A user's entries, newest first, as (id, logged_at, text)"""
+        await self.flush()
+        return await self._run(self._read_history, user_id, limit, offset)
+
+    async def search(self, user_id: int, terms: str, limit: int = 10, offset: int = 0) -> List[Entry]:
+        """A user's entries containing every word of ``terms``, best match first"""
+        query = match_query(user_id, terms)
+        if query is None:
+            return []
+        await self.flush()
+        return await self._run(self._read_search, query, limit, offset)
+
+    async def compact(self, retention_days: float) -> int:
+        """Delete entries older than ``retention_days``; returns how many were deleted"""
+        await self.flush()
+        cutoff = int(time.time() - retention_days * 86400)
+        deleted = await self._run(self._delete_before, cutoff)
+        if deleted:
+            log.info(f"Compacted distraction journal, deleted {deleted} entries")
+        return deleted
+
+    def start(self) -> None:
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error(f"Failed to flush distraction journal: {e}")
+
+    async def flush(self) -> None:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            entries, self._pending = self._pending, []
+            try:
+                await self._run(self._write_entries, entries)
+            except Exception:
+                self._pending[:0] = entries
+                raise
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        try:
+            await self.flush()
+        finally:
+            await self._run(self._close_connection)
+            self._executor.shutdown(wait=True)
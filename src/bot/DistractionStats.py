@@ -0,0 +1,446 @@
+import os
+import re
+import sys
+import json
+import asyncio
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from LogPipeline import get_logger
+
+log = get_logger(__name__)
+
+# Days of history kept per user and guild
+HISTORY_DAYS = 30
+# Days kept at a daily resolution; older days are rolled up into weeks
+DAILY_DAYS = 7
+# Themes tracked per day by the space-saving summaries
+USER_THEMES = 8
+GUILD_THEMES = 32
+# Parts of the day, split at the heart reset times
+PERIODS = ("🌌 Night", "🌅 Morning", "☀️ Afternoon", "🌙 Evening")
+
+STOPWORDS = frozenset(
+    "a an the my our your his her their about of to for on in at and or with from by is are was am im i me "
+    "it its that this these those be being been so too very just really again some any".split()
+)
+
+
+def normalize(text: str) -> str:
+    """
+    The theme of a distraction: its first few meaningful words, lower cased.
+
+    "Worried about the work meeting!" and "worried about work meeting" both
+    become "worried work meeting".
+    """
+    words = [word.replace("'", "") for word in re.findall(r"[^\W_]+(?:'[^\W_]+)*", text.casefold())]
+    themes = [word for word in words if word and word not in STOPWORDS] or words
+    return " ".join(themes[:4])[:48]
+
+
+class SpaceSaving:
+    """
+    Approximate counts of the most frequent items in at most ``capacity`` slots.
+
+    When an unseen item arrives and every slot is taken, it replaces the
+    least counted item and inherits that count as its possible error, so
+    counts are never underestimated and any item with more than
+    total / capacity occurrences is kept.
+    """
+
+    __slots__ = ("capacity", "counts", "errors")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        # Only items that took over a slot have an error
+        self.errors: Optional[Dict[str, int]] = None
+
+    def add(self, item: str, amount: int = 1, error: int = 0) -> None:
+        count = self.counts.get(item, 0)
+        if not count and len(self.counts) >= self.capacity:
+            smallest = min(self.counts, key=self.counts.__getitem__)
+            count = self.counts.pop(smallest)
+            error += count
+            if self.errors:
+                self.errors.pop(smallest, None)
+        self.counts[item] = count + amount
+        if error:
+            if self.errors is None:
+                self.errors = {}
+            self.errors[item] = self.errors.get(item, 0) + error
+
+    def merge(self, other: "SpaceSaving") -> None:
+        errors = other.errors or {}
+        for item, count in other.counts.items():
+            self.add(item, count, errors.get(item, 0))
+
+    def top(self, limit: int) -> List[Tuple[str, int]]:
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+class Bucket:
+    """Top themes and counts per part of the day for ``span`` days from ``start``"""
+
+    __slots__ = ("start", "span", "themes", "periods")
+
+    def __init__(self, start: int, span: int, capacity: int):
+        self.start = start
+        self.span = span
+        self.themes = SpaceSaving(capacity)
+        self.periods = [0] * len(PERIODS)
+
+    def merge(self, other: "Bucket") -> None:
+        self.themes.merge(other.themes)
+        self.periods = [total + count for total, count in zip(self.periods, other.periods)]
+
+
+class DistractionStats:
+    """
+    One user's or guild's distractions over the last HISTORY_DAYS days.
+
+    The last DAILY_DAYS days each get a fixed-size summary of their top
+    themes and a count per part of the day; older days are rolled up into
+    weekly summaries. Memory is bounded however much is logged.
+    """
+
+    __slots__ = ("capacity", "buckets")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        # Ordered by start day
+        self.buckets: List[Bucket] = []
+
+    def _bucket(self, day: int) -> Optional[Bucket]:
+        newest = max(day, self.buckets[-1].start) if self.buckets else day
+        if day > newest - DAILY_DAYS:
+            start, span = day, 1
+        else:
+            start, span = day - day % 7, 7
+        if start + span <= newest - HISTORY_DAYS + 1:
+            return None
+
+        # Almost always today's, the newest
+        index = len(self.buckets)
+        while index and self.buckets[index - 1].start > start:
+            index -= 1
+        if index and self.buckets[index - 1].start == start and self.buckets[index - 1].span == span:
+            return self.buckets[index - 1]
+        bucket = Bucket(start, span, self.capacity)
+        self.buckets.insert(index, bucket)
+        if index == len(self.buckets) - 1:
+            # A new day: roll up and expire the older ones
+            self.roll(newest)
+        return bucket
+
+    def add(self, theme: str, when: datetime) -> None:
+        bucket = self._bucket(when.date().toordinal())
+        if bucket is None:
+            return
+        bucket.themes.add(theme)
+        bucket.periods[when.hour * len(PERIODS) // 24] += 1
+
+    def roll(self, today: int) -> bool:
+        """
+        Roll days older than DAILY_DAYS into weeks and drop what fell out of
+        the history; True if nothing is left
+        """
+        kept: List[Bucket] = []
+        for bucket in self.buckets:
+            if bucket.start + bucket.span <= today - HISTORY_DAYS + 1:
+                continue
+            if bucket.span == 7 or bucket.start <= today - DAILY_DAYS:
+                week_start = bucket.start - bucket.start % 7
+                if kept and kept[-1].span == 7 and kept[-1].start == week_start:
+                    kept[-1].merge(bucket)
+                    continue
+                if bucket.span == 1:
+                    week = Bucket(week_start, 7, self.capacity)
+                    week.merge(bucket)
+                    bucket = week
+            kept.append(bucket)
+        self.buckets = kept
+        return not kept
+
+    def merge(self, other: "DistractionStats") -> None:
+        """Add another summary of the same user or guild, e.g. one logged by another worker"""
+        # Newest first, so older days land in the weeks they'd have been rolled into
+        for bucket in reversed(other.buckets):
+            target = self._bucket(bucket.start)
+            if target is not None:
+                target.merge(bucket)
+
+    def window(self, days: int, today: int) -> Tuple[List[Tuple[str, int]], List[int]]:
+        """Top themes and counts per part of the day over the last ``days`` days"""
+        total = Bucket(today, days, self.capacity * 2)
+        for bucket in self.buckets:
+            if bucket.start > today - days:
+                total.merge(bucket)
+        return total.themes.top(5), total.periods
+
+    def to_list(self) -> list:
+        data = []
+        for bucket in self.buckets:
+            errors = bucket.themes.errors or {}
+            themes = [[item, count, errors.get(item, 0)] for item, count in bucket.themes.counts.items()]
+            data.append([bucket.start, bucket.span, themes, bucket.periods])
+        return data
+
+    @classmethod
+    def from_list(cls, data: list, capacity: int) -> "DistractionStats":
+        stats = cls(capacity)
+        for start, span, themes, periods in data:
+            bucket = Bucket(start, span, capacity)
+            for item, count, error in themes:
+                bucket.themes.add(sys.intern(item), count, error)
+            bucket.periods = list(periods)
+            stats.buckets.append(bucket)
+        return stats
+
+
+class DistractionStatsStore:
+    """
+    Distraction stats for every user and guild, persisted in SQLite.
+
+    Every summary is held in memory and stored as a row of its own. ``flush``
+    writes, on a worker thread, only the rows of users and guilds that logged
+    something or expired since the last flush, so its cost follows what
+    changed rather than how many users there are.
+    """
+
+    # Seconds between flushes the owner should aim for
+    flush_interval = 60
+    # Theme capacity of the summaries in each table
+    SCOPES = {"users": USER_THEMES, "guilds": GUILD_THEMES}
+
+    def __init__(self, path: str):
+        self.path = path
+        self.users: Dict[int, DistractionStats] = {}
+        self.guilds: Dict[int, DistractionStats] = {}
+        # (scope, id) of the summaries changed since the last flush
+        self._changed: Set[Tuple[str, int]] = set()
+        # Summaries only fall out of the history when the day changes
+        self._expired_on = 0
+        # Created on first use so it binds to the bot's running loop
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    def __len__(self):
+        return len(self.users) + len(self.guilds)
+
+    def record(self, user_id: int, guild_id: Optional[int], text: str, when: Optional[datetime] = None) -> None:
+        when = when or datetime.now()
+        # Interned so every summary holding a theme shares one string
+        theme = sys.intern(normalize(text))
+        if not theme:
+            return
+        self._stats(self.users, user_id, USER_THEMES).add(theme, when)
+        self._changed.add(("users", user_id))
+        if guild_id is not None:
+            self._stats(self.guilds, guild_id, GUILD_THEMES).add(theme, when)
+            self._changed.add(("guilds", guild_id))
+
+    @staticmethod
+    def _stats(table: Dict[int, DistractionStats], key: int, capacity: int) -> DistractionStats:
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = DistractionStats(capacity)
+        return stats
+
+    def user(self, user_id: int) -> Optional[DistractionStats]:
+        return self.users.get(user_id)
+
+    def guild(self, guild_id: int) -> Optional[DistractionStats]:
+        return self.guilds.get(guild_id)
+
+    async def fetch_user(self, user_id: int) -> Optional[DistractionStats]:
+        """A user's stats, wherever the store keeps them"""
+        return self.user(user_id)
+
+    async def fetch_guild(self, guild_id: int) -> Optional[DistractionStats]:
+        """A guild's stats, wherever the store keeps them"""
+        return self.guild(guild_id)
+
+    def expire(self, today: Optional[int] = None) -> None:
+        """Forget users and guilds with nothing logged in the history"""
+        today = today or datetime.now().date().toordinal()
+        for scope in self.SCOPES:
+            table = getattr(self, scope)
+            for key in [key for key, stats in table.items() if stats.roll(today)]:
+                del table[key]
+                self._changed.add((scope, key))
+        self._expired_on = today
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # last_day is the last day the newest bucket covers, to expire rows by
+        connection.execute(
+            """CREATE TABLE IF NOT EXISTS distraction_stats (
+                scope TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                last_day INTEGER NOT NULL,
+                buckets TEXT NOT NULL,
+                PRIMARY KEY (scope, id)
+            )"""
+        )
+        return connection
+
+    @staticmethod
+    def _row(scope: str, key: int, data: list):
+        start, span = data[-1][:2]
+        return (scope, key, start + span - 1, json.dumps(data, separators=(",", ":")))
+
+    def _prepare(self) -> None:
+        """Create the table if the database is new"""
+        self._connect().close()
+
+    def _read(self) -> list:
+        with closing(self._connect()) as connection:
+            return connection.execute("SELECT scope, id, buckets FROM distraction_stats").fetchall()
+
+    def _write_rows(self, rows: list, deleted: list) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.executemany("DELETE FROM distraction_stats WHERE scope = ? AND id = ?", deleted)
+            connection.executemany(
+                "INSERT OR REPLACE INTO distraction_stats (scope, id, last_day, buckets) VALUES (?, ?, ?, ?)", rows
+            )
+
+    async def load(self) -> None:
+        try:
+            rows = await asyncio.to_thread(self._read)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            log.error(f"Failed to load distraction stats from {self.path}: {e}")
+            return
+        self.users, self.guilds = {}, {}
+        for scope, key, buckets in rows:
+            if scope in self.SCOPES:
+                getattr(self, scope)[key] = DistractionStats.from_list(json.loads(buckets), self.SCOPES[scope])
+        self.expire()
+
+    async def flush(self) -> None:
+        """Write the summaries that changed since the last flush"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            today = datetime.now().date().toordinal()
+            if today != self._expired_on:
+                self.expire(today)
+            if not self._changed:
+                return
+            changed, self._changed = self._changed, set()
+            # Serialized on the loop so the worker never sees a summary mid-update
+            rows, deleted = [], []
+            for scope, key in changed:
+                stats = getattr(self, scope).get(key)
+                if stats is None or not stats.buckets:
+                    deleted.append((scope, key))
+                else:
+                    rows.append(self._row(scope, key, stats.to_list()))
+            try:
+                await asyncio.to_thread(self._write_rows, rows, deleted)
+            except (OSError, sqlite3.Error) as e:
+                self._changed |= changed
+                log.error(f"Failed to save distraction stats to {self.path}: {e}")
+
+
+class SharedDistractionStatsStore(DistractionStatsStore):
+    """
+    Distraction stats in an SQLite database shared by the workers of a
+    sharded bot.
+
+    ``users`` and ``guilds`` only hold what was logged here since the last
+    flush. Flushing merges that into the stored summaries in one
+    transaction, so what every worker logs adds up, and lookups merge the
+    stored summary with what's still to be flushed.
+    """
+
+    flush_interval = 5
+
+    def _read_stats(self, scope: str, key: int) -> Optional[list]:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT buckets FROM distraction_stats WHERE scope = ? AND id = ?", (scope, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _merge(self, changes: list, today: int) -> None:
+        with closing(self._connect()) as connection, connection:
+            # Read and rewrite each summary without another worker doing the same in between
+            connection.execute("BEGIN IMMEDIATE")
+            for scope, key, data in changes:
+                capacity = self.SCOPES[scope]
+                row = connection.execute(
+                    "SELECT buckets FROM distraction_stats WHERE scope = ? AND id = ?", (scope, key)
+                ).fetchone()
+                stats = DistractionStats.from_list(json.loads(row[0]), capacity) if row else DistractionStats(capacity)
+                stats.merge(DistractionStats.from_list(data, capacity))
+                if not stats.roll(today):
+                    connection.execute(
+                        "INSERT OR REPLACE INTO distraction_stats (scope, id, last_day, buckets) VALUES (?, ?, ?, ?)",
+                        self._row(scope, key, stats.to_list()),
+                    )
+            connection.execute("DELETE FROM distraction_stats WHERE last_day <= ?", (today - HISTORY_DAYS,))
+
+    async def load(self) -> None:
+        try:
+            await asyncio.to_thread(self._prepare)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            log.error(f"Failed to open distraction stats in {self.path}: {e}")
+
+    async def _fetch(self, scope: str, key: int) -> Optional[DistractionStats]:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        # A flush in progress has taken its changes out of memory but not yet stored them
+        async with self._flush_lock:
+            data = await asyncio.to_thread(self._read_stats, scope, key)
+        capacity = self.SCOPES[scope]
+        stats = DistractionStats.from_list(data or [], capacity)
+        pending = getattr(self, scope).get(key)
+        if pending is not None:
+            stats.merge(pending)
+        return None if stats.roll(datetime.now().date().toordinal()) else stats
+
+    async def fetch_user(self, user_id: int) -> Optional[DistractionStats]:
+        return await self._fetch("users", user_id)
+
+    async def fetch_guild(self, guild_id: int) -> Optional[DistractionStats]:
+        return await self._fetch("guilds", guild_id)
+
+    async def flush(self) -> None:
+        """Merge what was logged here into the stored stats"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._changed:
+                return
+            # Serialized on the loop so the worker never sees a summary mid-update
+            changes = [
+                (scope, key, stats.to_list())
+                for scope in self.SCOPES
+                for key, stats in getattr(self, scope).items()
+                if stats.buckets
+            ]
+            users, guilds, changed = self.users, self.guilds, self._changed
+            self.users, self.guilds, self._changed = {}, {}, set()
+            try:
+                await asyncio.to_thread(self._merge, changes, datetime.now().date().toordinal())
+            except (OSError, sqlite3.Error) as e:
+                log.error(f"Failed to save distraction stats to {self.path}: {e}")
+                # Keep them, with anything logged meanwhile, for the next flush
+                for key, stats in self.users.items():
+                    self._stats(users, key, USER_THEMES).merge(stats)
+                for key, stats in self.guilds.items():
+                    self._stats(guilds, key, GUILD_THEMES).merge(stats)
+                self.users, self.guilds, self._changed = users, guilds, changed | self._changed
+
+
+def create_distraction_stats(data_dir: str, shared: bool = False) -> DistractionStatsStore:
+    """Stats in SQLite, shared by the workers of a sharded bot if ``shared``"""
+    path = os.path.join(data_dir, "distraction_stats.sqlite3")
+    if shared:
+        return SharedDistractionStatsStore(path)
+    return DistractionStatsStore(path)
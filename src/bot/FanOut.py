@@ -0,0 +1,98 @@
+import time
+import random
+import asyncio
+import discord
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+
+class DeliveryReport:
+    """Outcome of one fan-out run"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.sent = 0
+        self.retries = 0
+        self.failures: Dict[Any, BaseException] = {}
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return (
+            f"{self.sent}/{self.total} delivered in {self.elapsed:.2f}s "
+            f"({self.retries} retries, {len(self.failures)} failed)"
+        )
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` calls per second with bursts up to ``burst``"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def is_transient(error: BaseException) -> bool:
+    """Check if a failed send is worth retrying"""
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (asyncio.TimeoutError, OSError))
+
+
+class FanOutSender:
+    """
+    Sends one message to many targets concurrently.
+
+    At most ``concurrency`` sends are in flight and new sends start at no more
+    than ``rate`` per second (no limit when falsy), keeping well under
+    Discord's global limit.
+    discord.py already waits out per-route buckets, each channel being its own
+    route; transient failures are retried with exponential backoff and jitter.
+    """
+
+    def __init__(self, concurrency: int = 10, rate: Optional[float] = 40, retries: int = 3, backoff: float = 1.0):
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = RateLimiter(rate) if rate else None
+
+    async def _deliver(self, target, send, semaphore: asyncio.Semaphore, report: DeliveryReport) -> None:
+        key = getattr(target, "id", target)
+        for attempt in range(self.retries + 1):
+            # Don't hold a slot while backing off
+            async with semaphore:
+                if self.limiter is not None:
+                    await self.limiter.acquire()
+                try:
+                    await send(target)
+                    report.sent += 1
+                    return
+                except Exception as e:
+                    if attempt == self.retries or not is_transient(e):
+                        report.failures[key] = e
+                        return
+                    report.retries += 1
+            delay = self.backoff * 2**attempt
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+    async def send_all(self, targets: Iterable, send: Callable[[Any], Awaitable]) -> DeliveryReport:
+        """Call ``send(target)`` for every target and report how it went"""
+        targets = list(targets)
+        report = DeliveryReport(len(targets))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = time.perf_counter()
+        await asyncio.gather(*(self._deliver(target, send, semaphore, report) for target in targets))
+        report.elapsed = time.perf_counter() - start
+        return report
@@ -0,0 +1,179 @@
+import os
+import json
+import asyncio
+import sqlite3
+from contextlib import closing
+from typing import Any, Dict, Optional
+from LogPipeline import get_logger
+
+log = get_logger(__name__)
+
+
+class GuildConfig:
+    """
+    Per-guild settings persisted as a JSON file.
+
+    Reads are served from memory. Every change rewrites the file on a worker
+    thread through a temporary file and an atomic rename, so a crash never
+    leaves a half-written config behind.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._guilds: Dict[int, Dict[str, Any]] = {}
+        # Created on first use so it binds to the bot's running loop
+        self._save_lock: Optional[asyncio.Lock] = None
+
+    def _read(self) -> Dict[int, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return {}
+        return {int(guild_id): settings for guild_id, settings in data.items()}
+
+    def _write(self, data: Dict[str, Dict[str, Any]]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(temp_path, self.path)
+
+    async def load(self) -> None:
+        """Load the settings from disk"""
+        try:
+            self._guilds = await asyncio.to_thread(self._read)
+        except Exception as e:
+            log.error(f"Failed to load guild config from {self.path}: {e}")
+
+    async def save(self) -> None:
+        """Write the settings to disk"""
+        if self._save_lock is None:
+            self._save_lock = asyncio.Lock()
+        async with self._save_lock:
+            data = {str(guild_id): dict(settings) for guild_id, settings in self._guilds.items()}
+            await asyncio.to_thread(self._write, data)
+
+    async def refresh(self) -> None:
+        """Pick up changes other processes made; nothing else writes the file"""
+
+    def get(self, guild_id: int, key: str, default=None):
+        return self._guilds.get(guild_id, {}).get(key, default)
+
+    def all(self, key: str) -> Dict[int, Any]:
+        """Get a setting for every guild that has it"""
+        return {guild_id: settings[key] for guild_id, settings in self._guilds.items() if key in settings}
+
+    async def set(self, guild_id: int, key: str, value) -> None:
+        self._guilds.setdefault(guild_id, {})[key] = value
+        await self.save()
+
+    async def unset(self, guild_id: int, key: str) -> None:
+        settings = self._guilds.get(guild_id)
+        if settings and settings.pop(key, None) is not None:
+            if not settings:
+                del self._guilds[guild_id]
+            await self.save()
+
+
+class SharedGuildConfig(GuildConfig):
+    """
+    Per-guild settings in an SQLite database shared by the workers of a
+    sharded bot.
+
+    Each setting is its own row, so workers changing settings at the same
+    time never overwrite each other's. Reads are still served from memory,
+    which ``refresh`` brings up to date with every worker's changes. The
+    first worker to start imports the JSON file at ``import_path``, from
+    before the bot was split; it's never read again after that.
+    """
+
+    def __init__(self, path: str, import_path: Optional[str] = None):
+        super().__init__(path)
+        self.import_path = import_path
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            """CREATE TABLE IF NOT EXISTS guild_config (
+                guild_id INTEGER NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (guild_id, key)
+            )"""
+        )
+        # Files already imported
+        connection.execute("CREATE TABLE IF NOT EXISTS imports (source TEXT PRIMARY KEY)")
+        return connection
+
+    def _import(self, connection: sqlite3.Connection) -> None:
+        if connection.execute("SELECT 1 FROM imports WHERE source = 'json'").fetchone():
+            return
+        with connection:
+            # Taking the write lock first means only one worker imports
+            connection.execute("BEGIN IMMEDIATE")
+            if connection.execute("SELECT 1 FROM imports WHERE source = 'json'").fetchone():
+                return
+            # Recorded even without a file, so settings cleared since never come back from it
+            connection.execute("INSERT INTO imports (source) VALUES ('json')")
+            if not self.import_path or not os.path.exists(self.import_path):
+                return
+            if connection.execute("SELECT 1 FROM guild_config LIMIT 1").fetchone():
+                return
+            guilds = GuildConfig(self.import_path)._read()
+            connection.executemany(
+                "INSERT INTO guild_config (guild_id, key, value) VALUES (?, ?, ?)",
+                [
+                    (guild_id, key, json.dumps(value))
+                    for guild_id, settings in guilds.items()
+                    for key, value in settings.items()
+                ],
+            )
+            log.info(f"Imported settings for {len(guilds)} guilds from {self.import_path}")
+
+    def _read(self) -> Dict[int, Dict[str, Any]]:
+        guilds: Dict[int, Dict[str, Any]] = {}
+        with closing(self._connect()) as connection:
+            self._import(connection)
+            for guild_id, key, value in connection.execute("SELECT guild_id, key, value FROM guild_config"):
+                guilds.setdefault(guild_id, {})[key] = json.loads(value)
+        return guilds
+
+    def _write_setting(self, guild_id: int, key: str, value) -> None:
+        with closing(self._connect()) as connection, connection:
+            if value is None:
+                connection.execute("DELETE FROM guild_config WHERE guild_id = ? AND key = ?", (guild_id, key))
+            else:
+                connection.execute(
+                    "INSERT OR REPLACE INTO guild_config (guild_id, key, value) VALUES (?, ?, ?)",
+                    (guild_id, key, json.dumps(value)),
+                )
+
+    async def refresh(self) -> None:
+        """Re-read every worker's settings"""
+        await self.load()
+
+    async def set(self, guild_id: int, key: str, value) -> None:
+        self._guilds.setdefault(guild_id, {})[key] = value
+        await asyncio.to_thread(self._write_setting, guild_id, key, value)
+
+    async def unset(self, guild_id: int, key: str) -> None:
+        settings = self._guilds.get(guild_id)
+        if settings and settings.pop(key, None) is not None and not settings:
+            del self._guilds[guild_id]
+        # Another worker may have set it, so delete it either way
+        await asyncio.to_thread(self._write_setting, guild_id, key, None)
+
+
+def create_guild_config(data_dir: str, shared: bool = False) -> GuildConfig:
+    """The JSON guild config, or for the workers of a sharded bot one in SQLite they share"""
+    path = os.path.join(data_dir, "guild_config.json")
+    if shared:
+        return SharedGuildConfig(os.path.join(data_dir, "guild_config.sqlite3"), import_path=path)
+    return GuildConfig(path)
@@ -0,0 +1,83 @@
+import heapq
+from datetime import datetime, time, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class ResetSchedule:
+    """
+    Daily reset boundaries for hearts.
+
+    A heart is due for a reset once a boundary has passed since its last
+    reset. As before, the start of a new day also counts as a boundary.
+    """
+
+    def __init__(self, reset_times: List[time]):
+        self.reset_times = sorted(set([time(0, 0)] + list(reset_times)))
+
+    def window(self, now: datetime) -> Tuple[datetime, datetime]:
+        """Return the last boundary at or before ``now`` and the next one after it"""
+        today = now.date()
+        start = datetime.combine(today, self.reset_times[0])
+        for reset_time in self.reset_times:
+            boundary = datetime.combine(today, reset_time)
+            if boundary > now:
+                return start, boundary
+            start = boundary
+        return start, datetime.combine(today + timedelta(days=1), self.reset_times[0])
+
+    def next_boundary(self, after: datetime) -> datetime:
+        """Return the first boundary strictly after ``after``"""
+        return self.window(after)[1]
+
+    def is_due(self, last_reset: Optional[datetime], now: datetime) -> bool:
+        """Check if a heart last reset at ``last_reset`` should be reset at ``now``"""
+        return last_reset is None or last_reset < self.window(now)[0]
+
+
+class ResetIndex:
+    """
+    Hearts bucketed by the boundary at which they become due.
+
+    Only hearts that changed since their last reset are tracked, so popping
+    the due buckets touches exactly the hearts that need work.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[datetime, Set[int]] = {}
+        self._boundaries: List[datetime] = []
+        self._bucket_of: Dict[int, datetime] = {}
+
+    def __len__(self):
+        return len(self._bucket_of)
+
+    def add(self, user_id: int, boundary: datetime) -> None:
+        current = self._bucket_of.get(user_id)
+        if current == boundary:
+            return
+        if current is not None:
+            self._buckets[current].discard(user_id)
+
+        bucket = self._buckets.get(boundary)
+        if bucket is None:
+            bucket = self._buckets[boundary] = set()
+            heapq.heappush(self._boundaries, boundary)
+        bucket.add(user_id)
+        self._bucket_of[user_id] = boundary
+
+    def discard(self, user_id: int) -> None:
+        current = self._bucket_of.pop(user_id, None)
+        if current is not None:
+            self._buckets[current].discard(user_id)
+
+    def next_boundary(self) -> Optional[datetime]:
+        return self._boundaries[0] if self._boundaries else None
+
+    def pop_due(self, now: datetime) -> List[int]:
+        """Remove and return every user whose boundary is at or before ``now``"""
+        due = []
+        while self._boundaries and self._boundaries[0] <= now:
+            boundary = heapq.heappop(self._boundaries)
+            for user_id in self._buckets.pop(boundary):
+                del self._bucket_of[user_id]
+                due.append(user_id)
+        return due
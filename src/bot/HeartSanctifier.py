@@ -1,18 +1,48 @@
-from datetime import datetime
+import time
+from collections import deque
+
+DEFAULT_DISTRACTIONS = ("Worldly Distractions",)
+# Oldest distractions fall off the end once a heart holds this many
+MAX_DISTRACTIONS = 100
 
 
 class HeartSanctifier:
+    # Hearts exist for every user, so keep them small: no __dict__, the
+    # default distractions are a shared tuple until the user logs one, and
+    # last_reset is epoch seconds (0 means never reset)
+    __slots__ = ("_distractions", "presence_of_god", "last_reset")
+
     def __init__(self):
-        self.heart = ["Worldly Distractions"]
+        self._distractions = DEFAULT_DISTRACTIONS
         self.presence_of_god = False
-        self.last_reset = None
+        self.last_reset = 0
+
+    @property
+    def heart(self):
+        """Distractions in the heart, newest first"""
+        return self._distractions
+
+    @heart.setter
+    def heart(self, distractions):
+        self._distractions = deque(distractions, MAX_DISTRACTIONS) if distractions else ()
+
+    def add_distraction(self, distraction: str):
+        if not isinstance(self._distractions, deque):
+            self._distractions = deque(self._distractions, MAX_DISTRACTIONS)
+        self._distractions.appendleft(distraction)
+
+    def is_default(self) -> bool:
+        """Check if the heart is in the state reset_heart leaves it in"""
+        return not self.presence_of_god and (
+            self._distractions is DEFAULT_DISTRACTIONS or tuple(self._distractions) == DEFAULT_DISTRACTIONS
+        )
 
     def empty_heart(self):
-        self.heart.clear()
+        self._distractions = ()
         return "🧹 Heart emptied of distractions."
 
     def invite_god(self):
-        if not self.heart:
+        if not self._distractions:
             self.presence_of_god = True
             return "🕊️ God invited into the heart."
         else:
@@ -29,6 +59,6 @@ class HeartSanctifier:
 
     def reset_heart(self):
         """Reset the heart to its initial state"""
-        self.heart = ["Worldly Distractions"]
+        self._distractions = DEFAULT_DISTRACTIONS
         self.presence_of_god = False
-        self.last_reset = datetime.now()
+        self.last_reset = int(time.time())
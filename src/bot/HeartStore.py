@@ -0,0 +1,457 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from HeartSanctifier import HeartSanctifier
+from HeartReset import ResetIndex, ResetSchedule
+from LogPipeline import get_logger
+
+log = get_logger(__name__)
+
+
+class HeartStore:
+    """
+    In-memory heart store.
+
+    Every cog goes through a heart store to look up a user's HeartSanctifier.
+    This base class keeps hearts in a plain dict, the way the bot always has;
+    subclasses add persistence on top of the same interface.
+
+    When a ``reset_schedule`` is set, hearts are reset lazily the next time
+    they are looked up after a boundary, and changed hearts are indexed by
+    the boundary at which they fall due so ``reset_due`` only visits those.
+
+    Hearts back in their default state carry no information, so they are
+    evicted and rebuilt on demand rather than kept for every user ever seen.
+    """
+
+    def __init__(self):
+        self._hearts: Dict[int, HeartSanctifier] = {}
+        self._reset_schedule: Optional[ResetSchedule] = None
+        self._reset_index = ResetIndex()
+        self._window_start = 0
+        self._window_end = 0
+        self._evictable: Set[int] = set()
+
+    def __len__(self):
+        return len(self._hearts)
+
+    def __contains__(self, user_id):
+        return user_id in self._hearts
+
+    def items(self):
+        return self._hearts.items()
+
+    def values(self):
+        return self._hearts.values()
+
+    @property
+    def reset_schedule(self) -> Optional[ResetSchedule]:
+        return self._reset_schedule
+
+    @reset_schedule.setter
+    def reset_schedule(self, schedule: Optional[ResetSchedule]) -> None:
+        self._reset_schedule = schedule
+        self._reset_index = ResetIndex()
+        self._window_start = self._window_end = 0
+        if schedule is not None:
+            for user_id, heart in self._hearts.items():
+                self._track_reset(user_id, heart)
+
+    def _track_reset(self, user_id: int, heart: HeartSanctifier) -> None:
+        if heart.last_reset and not heart.is_default():
+            self._reset_index.add(user_id, self._reset_schedule.next_boundary(datetime.fromtimestamp(heart.last_reset)))
+
+    def _current_window_start(self, now: float) -> int:
+        if not self._window_start <= now < self._window_end:
+            start, end = self._reset_schedule.window(datetime.fromtimestamp(now))
+            self._window_start, self._window_end = int(start.timestamp()), int(end.timestamp())
+        return self._window_start
+
+    def _reset_if_due(self, user_id: int, heart: HeartSanctifier, now: float) -> bool:
+        if heart.last_reset >= self._current_window_start(now):
+            return False
+        was_default = heart.is_default()
+        heart.reset_heart()
+        self._reset_index.discard(user_id)
+        if not was_default:
+            self._changed(user_id)
+        return True
+
+    async def get(self, user_id: int) -> HeartSanctifier:
+        """Get or create the HeartSanctifier for a user"""
+        heart = self._hearts.get(user_id)
+        if heart is None:
+            heart = self._hearts[user_id] = HeartSanctifier()
+        if self._reset_schedule is not None:
+            self._reset_if_due(user_id, heart, time.time())
+        if heart.is_default():
+            # Evicted on the next sweep unless the caller changes it
+            self._evictable.add(user_id)
+        return heart
+
+    def reset_due(self, now: Optional[datetime] = None) -> List[int]:
+        """Reset every changed heart whose boundary has passed, returning their ids"""
+        if self._reset_schedule is None:
+            return []
+        now = (now or datetime.now()).timestamp()
+        reset = []
+        for user_id in self._reset_index.pop_due(datetime.fromtimestamp(now)):
+            heart = self._hearts.get(user_id)
+            if heart is not None and self._reset_if_due(user_id, heart, now):
+                self._evictable.add(user_id)
+                reset.append(user_id)
+        self.evict_idle()
+        return reset
+
+    def _can_evict(self, user_id: int) -> bool:
+        return True
+
+    def evict_idle(self) -> int:
+        """Drop hearts that are back in their default state, returning how many"""
+        evicted = 0
+        evictable, self._evictable = self._evictable, set()
+        for user_id in evictable:
+            heart = self._hearts.get(user_id)
+            if heart is None:
+                continue
+            if heart.is_default() and self._can_evict(user_id):
+                del self._hearts[user_id]
+                self._reset_index.discard(user_id)
+                evicted += 1
+            elif heart.is_default():
+                self._evictable.add(user_id)
+        if evicted > len(self._hearts):
+            # dicts never shrink on delete, so rebuild after a large eviction
+            self._hearts = dict(self._hearts)
+        return evicted
+
+    def next_reset(self) -> Optional[datetime]:
+        """The next boundary at which some changed heart falls due"""
+        return self._reset_index.next_boundary()
+
+    def mark_dirty(self, user_id: int) -> None:
+        """Record that a user's heart changed and needs to be saved"""
+        heart = self._hearts.get(user_id)
+        if heart is not None:
+            if heart.is_default():
+                self._evictable.add(user_id)
+            elif self._reset_schedule is not None:
+                self._track_reset(user_id, heart)
+        self._changed(user_id)
+
+    def _changed(self, user_id: int) -> None:
+        """Hook for subclasses to persist a changed heart"""
+
+    def start(self) -> None:
+        """Start any background work the store needs"""
+
+    async def reset_stored(self, now: Optional[datetime] = None) -> int:
+        """
+        Reset due hearts that aren't in memory where the store can, returning
+        how many; otherwise they're reset when next looked up
+        """
+        return 0
+
+    async def flush(self) -> None:
+        """Write pending changes to the backing storage"""
+
+    async def close(self) -> None:
+        """Flush and release the backing storage"""
+
+
+class SQLiteHeartStore(HeartStore):
+    """
+    Write-behind heart store backed by SQLite in WAL mode.
+
+    Hearts are loaded the first time a user is looked up. Changes are only
+    recorded in memory; a background task writes the dirty hearts in one
+    transaction every ``flush_interval`` seconds. All database work runs on a
+    single worker thread so the event loop never waits on disk.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 5.0):
+        super().__init__()
+        self.path = path
+        self.flush_interval = flush_interval
+        self._dirty: Set[int] = set()
+        self._writing: Set[int] = set()
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="heart-store")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        # Created on first use so it binds to the bot's running loop
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS hearts (
+                    user_id INTEGER PRIMARY KEY,
+                    distractions TEXT NOT NULL,
+                    presence_of_god INTEGER NOT NULL,
+                    last_reset INTEGER
+                )"""
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _read_row(self, user_id: int):
+        cursor = self._connect().execute(
+            "SELECT distractions, presence_of_god, last_reset FROM hearts WHERE user_id = ?", (user_id,)
+        )
+        return cursor.fetchone()
+
+    def _write_rows(self, rows, deleted) -> None:
+        connection = self._connect()
+        with connection:
+            # A copy reset less recently than the stored heart is out of date
+            connection.executemany("DELETE FROM hearts WHERE user_id = ? AND IFNULL(last_reset, 0) <= ?", deleted)
+            connection.executemany(
+                """INSERT INTO hearts (user_id, distractions, presence_of_god, last_reset)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    distractions = excluded.distractions,
+                    presence_of_god = excluded.presence_of_god,
+                    last_reset = excluded.last_reset
+                WHERE excluded.last_reset >= IFNULL(hearts.last_reset, 0)""",
+                rows,
+            )
+
+    def _close_connection(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @staticmethod
+    def _to_row(user_id: int, heart: HeartSanctifier):
+        return (user_id, json.dumps(list(heart.heart)), int(heart.presence_of_god), heart.last_reset)
+
+    @staticmethod
+    def _from_row(row) -> HeartSanctifier:
+        distractions, presence_of_god, last_reset = row
+        heart = HeartSanctifier()
+        heart.heart = json.loads(distractions)
+        heart.presence_of_god = bool(presence_of_god)
+        heart.last_reset = int(last_reset or 0)
+        return heart
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _load(self, user_id: int) -> HeartSanctifier:
+        row = await self._run(self._read_row, user_id)
+        heart = self._hearts.get(user_id)
+        if heart is None:
+            heart = self._from_row(row) if row else HeartSanctifier()
+            self._hearts[user_id] = heart
+            if row and self._reset_schedule is not None:
+                self._track_reset(user_id, heart)
+        return heart
+
+    async def get(self, user_id: int) -> HeartSanctifier:
+        """Get a user's heart, loading it from disk on first access"""
+        if user_id in self._hearts:
+            return await super().get(user_id)
+
+        # Concurrent lookups for the same user share a single read
+        loading = self._loading.get(user_id)
+        if loading is None:
+            loading = self._loading[user_id] = asyncio.ensure_future(self._load(user_id))
+            loading.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        await asyncio.shield(loading)
+        return await super().get(user_id)
+
+    def _changed(self, user_id: int) -> None:
+        self._dirty.add(user_id)
+
+    def _can_evict(self, user_id: int) -> bool:
+        # Keep the heart until its default state has reached disk
+        return user_id not in self._dirty and user_id not in self._writing
+
+    def start(self) -> None:
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                self.evict_idle()
+            except Exception as e:
+                log.error(f"Failed to flush heart store: {e}")
+
+    async def flush(self) -> None:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+            # Serialize on the loop so the worker never sees a heart mid-update.
+            # Default hearts are deleted rather than stored.
+            rows, deleted = [], []
+            for user_id in dirty:
+                heart = self._hearts.get(user_id)
+                if heart is None:
+                    continue
+                if heart.is_default():
+                    deleted.append((user_id, heart.last_reset))
+                else:
+                    rows.append(self._to_row(user_id, heart))
+            self._writing = dirty
+            try:
+                await self._run(self._write_rows, rows, deleted)
+            except Exception:
+                self._dirty |= dirty
+                raise
+            finally:
+                self._writing = set()
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        await self._run(self._close_connection)
+        self._executor.shutdown(wait=True)
+
+
+class SharedHeartStore(SQLiteHeartStore):
+    """
+    Heart store for bot processes sharing one SQLite database, like the
+    workers of a sharded bot.
+
+    A user's commands reach whichever worker runs their server's shard, so
+    no worker can trust a copy it kept: every lookup reads the heart from the
+    database, and changes are written as soon as the event loop gets to them
+    rather than every ``flush_interval`` seconds. Only hearts with changes
+    still to write stay in memory. If two workers change the same heart at
+    the same moment, the later write wins, unless the stored heart was reset
+    more recently than the one being written.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path, flush_interval=0)
+        # Created in start() so it binds to the bot's running loop
+        self._changes: Optional[asyncio.Event] = None
+
+    async def get(self, user_id: int) -> HeartSanctifier:
+        """Get a user's heart as the database has it, or as it is here if it has changes to write"""
+        if user_id not in self._dirty and user_id not in self._writing:
+            row = await self._run(self._read_row, user_id)
+            # Changed here while it was being read, so ours is the newer one
+            if user_id not in self._dirty and user_id not in self._writing:
+                self._drop(user_id)
+                heart = self._hearts[user_id] = self._from_row(row) if row else HeartSanctifier()
+                if row and self._reset_schedule is not None:
+                    self._track_reset(user_id, heart)
+        # Nothing in here awaits, so the caller changes this heart before a flush can drop it
+        return await HeartStore.get(self, user_id)
+
+    async def flush(self) -> None:
+        # A heart changed here before a boundary and written after it would
+        # undo the reset another worker made in the database at that boundary,
+        # so write it reset. It keeps the time it was last reset here, so it
+        # doesn't delete a heart another worker reset and changed since.
+        if self._reset_schedule is not None:
+            window_start = self._current_window_start(time.time())
+            for user_id in list(self._dirty):
+                heart = self._hearts.get(user_id)
+                if heart is not None and heart.last_reset < window_start:
+                    last_reset = heart.last_reset
+                    heart.reset_heart()
+                    heart.last_reset = last_reset
+                    self._reset_index.discard(user_id)
+        await super().flush()
+
+    def _drop(self, user_id: int) -> None:
+        self._hearts.pop(user_id, None)
+        self._reset_index.discard(user_id)
+        self._evictable.discard(user_id)
+
+    def _changed(self, user_id: int) -> None:
+        super()._changed(user_id)
+        if self._changes is not None:
+            self._changes.set()
+
+    def evict_idle(self) -> int:
+        """Drop every heart whose changes are written, returning how many; the database has them now"""
+        written = [user_id for user_id in self._hearts if self._can_evict(user_id)]
+        for user_id in written:
+            self._drop(user_id)
+        if len(written) > len(self._hearts):
+            self._hearts = dict(self._hearts)
+        return len(written)
+
+    def start(self) -> None:
+        if self._flush_task is None:
+            self._changes = asyncio.Event()
+            if self._dirty:
+                self._changes.set()
+            self._flush_task = asyncio.ensure_future(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._changes.wait()
+            self._changes.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error(f"Failed to flush heart store: {e}")
+                # Try the failed hearts again shortly
+                await asyncio.sleep(1)
+                self._changes.set()
+            self.evict_idle()
+
+    def _delete_due(self, window_start: int) -> int:
+        connection = self._connect()
+        with connection:
+            return connection.execute(
+                "DELETE FROM hearts WHERE last_reset IS NULL OR last_reset < ?", (window_start,)
+            ).rowcount
+
+    async def reset_stored(self, now: Optional[datetime] = None) -> int:
+        """Reset every stored heart last reset before the current window, for all workers at once"""
+        if self._reset_schedule is None:
+            return 0
+        window_start = self._current_window_start((now or datetime.now()).timestamp())
+        # A reset heart is a default one, and default hearts aren't stored
+        return await self._run(self._delete_due, window_start)
+
+
+def create_heart_store(shared: bool = False) -> HeartStore:
+    """
+    Build the heart store selected by the environment.
+
+    HEART_STORE=sqlite (default) persists hearts to HEART_DB_PATH,
+    HEART_STORE=memory keeps them in memory only, and HEART_STORE=shared
+    (the default when ``shared``, for workers of a sharded bot) keeps them
+    in HEART_DB_PATH for every worker to read and write.
+    """
+    backend = os.getenv("HEART_STORE", "shared" if shared else "sqlite").lower()
+    if shared and backend != "shared":
+        log.warning(f"HEART_STORE={backend} keeps hearts per worker, so users' hearts depend on the server")
+    if backend == "memory":
+        return HeartStore()
+    if backend not in ("sqlite", "shared"):
+        raise ValueError(f"Unknown HEART_STORE backend: {backend}")
+
+    data_dir = os.getenv("DATA_DIR", "data")
+    path = os.getenv("HEART_DB_PATH", os.path.join(data_dir, "hearts.sqlite3"))
+    if backend == "shared":
+        return SharedHeartStore(path)
+    flush_interval = float(os.getenv("HEART_FLUSH_INTERVAL", 5.0))
+    return SQLiteHeartStore(path, flush_interval)
@@ -0,0 +1,166 @@
+import sys
+import json
+import queue
+import random
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# Every logger in the bot is a child of this one
+ROOT_LOGGER = "bro-larry-bot"
+# Attributes every LogRecord has; anything else on a record came from ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def get_logger(name: Optional[str] = None) -> logging.Logger:
+    """The bot's logger, or its child ``name``, e.g. get_logger("cogs.HeartCog")"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}" if name else ROOT_LOGGER)
+
+
+def parse_level(value) -> int:
+    """A log level from a number or a name like "INFO"; INFO if not set"""
+    if not value:
+        return logging.INFO
+    if str(value).isdigit():
+        return int(value) or logging.INFO
+    level = logging.getLevelName(str(value).upper())
+    if not isinstance(level, int):
+        raise ValueError(f"unknown log level {value!r}")
+    return level
+
+
+def parse_sample_rates(value: Optional[str]) -> Dict[str, float]:
+    """Per-event sampling rates from "event=rate" pairs, e.g. "command=0.1,dispatch=0.01" """
+    rates = {}
+    for pair in (value or "").split(","):
+        if pair.strip():
+            event, rate = pair.split("=", 1)
+            rates[event.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger and message, plus whatever
+    was passed in ``extra`` such as guild_id, user_id, command and latency_ms.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a share of the records for each sampled event.
+
+    A record's event is its ``event`` extra; events without a rate, and
+    anything at WARNING or above, are always kept. Kept records of a sampled
+    event carry its ``sample_rate`` so counts can be scaled back up.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None or rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        if random.random() >= rate:
+            self.sampled_out += 1
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Puts records on a bounded queue for the listener thread to write.
+
+    The message is rendered here so the record holds no references to live
+    objects, but nothing is written: a slow stdout never blocks the caller.
+    When the queue is full the record is dropped and counted instead.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """
+    The bot's logging: every logger feeds a queue, drained to stdout by one thread.
+
+    Call ``stop`` on shutdown to write out what's still queued.
+    """
+
+    def __init__(
+        self,
+        level: int = logging.INFO,
+        json_output: bool = True,
+        sample_rates: Optional[Dict[str, float]] = None,
+        queue_size: int = 10000,
+        stream=None,
+    ):
+        self.handler = DroppingQueueHandler(queue.Queue(queue_size))
+        self.sampler = SamplingFilter(sample_rates or {})
+        self.handler.addFilter(self.sampler)
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(
+            JsonFormatter() if json_output else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+        self.listener = QueueListener(self.handler.queue, output)
+        self.started = False
+
+        # discord.py's loggers propagate here too
+        root = logging.getLogger()
+        root.handlers = [self.handler]
+        root.setLevel(level)
+
+    def start(self) -> None:
+        self.listener.start()
+        self.started = True
+
+    def stop(self) -> None:
+        """Write out queued records and stop the listener thread"""
+        if self.started:
+            self.listener.stop()
+            self.started = False
+
+    def counts(self) -> Dict[tuple, float]:
+        """Records dropped by sampling and by a full queue, for the metrics endpoint"""
+        return {
+            (("reason", "sampled"),): self.sampler.sampled_out,
+            (("reason", "queue_full"),): self.handler.dropped,
+        }
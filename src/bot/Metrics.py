@@ -0,0 +1,236 @@
+import time
+import asyncio
+from aiohttp import web
+from typing import Callable, Dict, Optional, Tuple
+from LogPipeline import get_logger
+
+log = get_logger(__name__)
+
+# Command latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Event loop lag buckets in seconds
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(**labels) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set"""
+
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(**labels)
+        series = self._series.get(key)
+        if series is None:
+            # One count per bucket plus +Inf, then the sum
+            series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_labels(**labels))
+        return sum(series[:-1]) if series else 0
+
+    def quantile(self, fraction: float, **labels) -> Optional[float]:
+        """Estimate a quantile by interpolating within its bucket"""
+        series = self._series.get(_labels(**labels))
+        if not series:
+            return None
+        total = sum(series[:-1])
+        target = fraction * total
+        seen = 0
+        lower = 0.0
+        for index, bound in enumerate(self.buckets):
+            if seen + series[index] >= target and series[index]:
+                return lower + (bound - lower) * (target - seen) / series[index]
+            seen += series[index]
+            lower = bound
+        return self.buckets[-1]
+
+    def label_sets(self):
+        return [dict(key) for key in self._series]
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, series in self._series.items():
+            cumulative = 0
+            for index, bound in enumerate(self.buckets):
+                cumulative += series[index]
+                yield f"{self.name}_bucket{_format_labels(key, ('le', repr(bound)))} {cumulative}"
+            cumulative += series[len(self.buckets)]
+            yield f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(key)} {series[-1]}"
+            yield f"{self.name}_count{_format_labels(key)} {cumulative}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels(**labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_labels(**labels), 0)
+
+    def items(self):
+        return [(dict(key), value) for key, value in self._values.items()]
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(key)} {value}"
+
+
+class Gauge:
+    """
+    A gauge read from a callback when metrics are collected.
+
+    The callback returns a number, or a dict mapping label dicts (as tuples of
+    pairs) to numbers for labelled gauges.
+    """
+
+    def __init__(self, name: str, help: str, read: Callable):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def values(self):
+        try:
+            value = self.read()
+        except Exception as e:
+            log.error(f"Failed to read gauge {self.name}: {e}")
+            return []
+        if isinstance(value, dict):
+            return [(tuple(sorted(labels)), item) for labels, item in value.items() if item is not None]
+        return [((), value)] if value is not None else []
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for key, value in self.values():
+            yield f"{self.name}{_format_labels(key)} {value}"
+
+
+class Metrics:
+    """
+    In-process metrics for the bot.
+
+    Holds command latency histograms, outcome counters, gauges registered by
+    the cogs and an event loop lag sampler. Everything is rendered in the
+    Prometheus text format, served on a local port when one is configured.
+    """
+
+    def __init__(self, lag_interval: float = 1.0):
+        self.started = time.time()
+        self.command_latency = Histogram("bot_command_latency_seconds", "Command latency from invoke to completion")
+        self.commands = Counter("bot_commands_total", "Commands by outcome")
+        self.loop_lag = Histogram("bot_event_loop_lag_seconds", "Event loop scheduling lag", LAG_BUCKETS)
+        self.last_loop_lag = 0.0
+        self.gauges: Dict[str, Gauge] = {}
+        # Counters and histograms registered by other components
+        self.instruments: Dict[str, object] = {}
+        self.lag_interval = lag_interval
+        self._lag_task: Optional[asyncio.Task] = None
+        self._runner: Optional[web.AppRunner] = None
+        self.gauge("bot_uptime_seconds", "Seconds since the bot started", lambda: time.time() - self.started)
+        self.gauge("bot_event_loop_lag_last_seconds", "Most recent event loop lag sample", lambda: self.last_loop_lag)
+
+    def gauge(self, name: str, help: str, read: Callable) -> None:
+        """Register or replace a gauge"""
+        self.gauges[name] = Gauge(name, help, read)
+
+    def remove_gauge(self, name: str) -> None:
+        self.gauges.pop(name, None)
+
+    def counter(self, name: str, help: str) -> Counter:
+        """Register a counter, or get the one already registered under ``name``"""
+        counter = self.instruments.get(name)
+        if counter is None:
+            counter = self.instruments[name] = Counter(name, help)
+        return counter
+
+    def histogram(self, name: str, help: str, buckets=LATENCY_BUCKETS) -> Histogram:
+        """Register a histogram, or get the one already registered under ``name``"""
+        histogram = self.instruments.get(name)
+        if histogram is None:
+            histogram = self.instruments[name] = Histogram(name, help, buckets)
+        return histogram
+
+    def observe_command(self, command: str, seconds: Optional[float], outcome: str) -> None:
+        if seconds is not None:
+            self.command_latency.observe(seconds, command=command)
+        self.commands.inc(command=command, outcome=outcome)
+
+    def render(self) -> str:
+        lines = []
+        metrics = (
+            self.command_latency,
+            self.commands,
+            self.loop_lag,
+            *self.instruments.values(),
+            *self.gauges.values(),
+        )
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    async def _sample_loop_lag(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            self.last_loop_lag = max(0.0, time.perf_counter() - expected)
+            self.loop_lag.observe(self.last_loop_lag)
+
+    async def _handle_metrics(self, request) -> web.Response:
+        return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self, port: int = 0, host: str = "127.0.0.1") -> None:
+        """Start sampling loop lag and, if a port is given, serve /metrics"""
+        if self._lag_task is None:
+            self._lag_task = asyncio.ensure_future(self._sample_loop_lag())
+        if port and self._runner is None:
+            app = web.Application()
+            app.router.add_get("/metrics", self._handle_metrics)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, host, port).start()
+            log.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+    async def stop(self) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,45 @@
+import discord
+from typing import Awaitable, Callable, Tuple
+
+# Renders a page (0-based) as an embed, and whether there's a page after it
+PageRenderer = Callable[[int], Awaitable[Tuple[discord.Embed, bool]]]
+
+
+class PageView(discord.ui.View):
+    """
+    Previous and next buttons under a paged embed.
+
+    Pages are rendered when turned to, so only the page on screen is ever
+    fetched. Only the user who asked can turn the pages.
+    """
+
+    def __init__(self, render: PageRenderer, author_id: int, has_next: bool, timeout: float = 180):
+        super().__init__(timeout=timeout)
+        self.render = render
+        self.author_id = author_id
+        self.page = 0
+        self._update_buttons(has_next)
+
+    def _update_buttons(self, has_next: bool) -> None:
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = not has_next
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("📝 These pages belong to someone else.", ephemeral=True)
+            return False
+        return True
+
+    async def _turn(self, interaction: discord.Interaction, step: int) -> None:
+        self.page = max(0, self.page + step)
+        embed, has_next = await self.render(self.page)
+        self._update_buttons(has_next)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        await self._turn(interaction, -1)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        await self._turn(interaction, 1)
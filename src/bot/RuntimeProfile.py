@@ -0,0 +1,163 @@
+import os
+import ast
+import yarl
+import discord
+from typing import List, Optional
+from discord.gateway import DiscordWebSocket
+from LogPipeline import get_logger
+
+"""
+https://discordpy.readthedocs.io/en/latest/intents.html
+https://discordpy.readthedocs.io/en/latest/intents.html#privileged-intents
+"""
+
+log = get_logger(__name__)
+
+PROFILES = ("default", "lean")
+
+
+def prefix_intents() -> discord.Intents:
+    """What prefix commands need: every message event, with its content"""
+    return discord.Intents(messages=True, message_content=True)
+
+
+def default_intents(prefix_commands: bool = True) -> discord.Intents:
+    """The intents the bot has always connected with, less prefix commands' if they're off"""
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.messages = prefix_commands
+    intents.message_content = prefix_commands
+    return intents
+
+
+def _is_cog(node: ast.ClassDef) -> bool:
+    return any(
+        (isinstance(base, ast.Attribute) and base.attr == "Cog") or (isinstance(base, ast.Name) and base.id == "Cog")
+        for base in node.bases
+    )
+
+
+def _declared_intents(node: ast.ClassDef) -> Optional[discord.Intents]:
+    """
+    A cog's ``required_intents``, which has to be written as
+    ``discord.Intents(name=True, ...)``; None if it has none
+    """
+    for statement in node.body:
+        if not isinstance(statement, ast.Assign):
+            continue
+        if not any(isinstance(target, ast.Name) and target.id == "required_intents" for target in statement.targets):
+            continue
+        value = statement.value
+        if not (
+            isinstance(value, ast.Call)
+            and isinstance(value.func, ast.Attribute)
+            and value.func.attr == "Intents"
+            and not value.args
+        ):
+            raise ValueError("required_intents has to be discord.Intents(name=True, ...)")
+        return discord.Intents(**{keyword.arg: ast.literal_eval(keyword.value) for keyword in value.keywords})
+    return None
+
+
+def cog_intents(cogs_dir: str) -> discord.Intents:
+    """
+    Union of the ``required_intents`` declared by every cog in ``cogs_dir``.
+
+    The declarations are read from the source rather than by importing the
+    cogs, which load_extension would only import a second time. Cogs without
+    a declaration are assumed to need the default intents.
+    """
+    intents = discord.Intents.none()
+    for file in sorted(os.listdir(cogs_dir)):
+        if not file.endswith(".py"):
+            continue
+        try:
+            with open(os.path.join(cogs_dir, file), "r", encoding="utf-8") as source:
+                tree = ast.parse(source.read(), filename=file)
+            for node in ast.walk(tree):
+                if isinstance(node, ast.ClassDef) and _is_cog(node):
+                    declared = _declared_intents(node)
+                    intents |= declared if declared is not None else default_intents()
+        except Exception as e:
+            log.error(f"Failed to read intents from cog {file}: {e}")
+    return intents
+
+
+def client_options(profile: str, cogs_dir: str, prefix_commands: bool = False) -> dict:
+    """
+    Gateway and cache options for a runtime profile.
+
+    "default" keeps discord.py's caches and the members intent. "lean" skips
+    member caching and chunking at startup, turns the message cache off and
+    only asks for the intents the cogs declare. Message events and their
+    content are only requested when ``prefix_commands`` is on. MAX_MESSAGES
+    overrides the message cache size for either profile (0 disables it).
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown BOT_PROFILE: {profile}")
+
+    if profile == "lean":
+        # Cogs declare what their slash commands need, which is usually just
+        # guilds for the channel cache replies go through; the message
+        # intents prefix commands need are only added here, when they're on
+        intents = cog_intents(cogs_dir)
+        if prefix_commands:
+            intents |= prefix_intents()
+        options = {
+            "intents": intents,
+            "member_cache_flags": discord.MemberCacheFlags.none(),
+            "chunk_guilds_at_startup": False,
+            "max_messages": None,
+        }
+    else:
+        options = {"intents": default_intents(prefix_commands), "max_messages": 1000}
+
+    max_messages = os.getenv("MAX_MESSAGES")
+    if max_messages is not None:
+        options["max_messages"] = int(max_messages) or None
+    return options
+
+
+def use_endpoints(api_base: Optional[str] = None, gateway_url: Optional[str] = None) -> None:
+    """
+    Send REST requests to ``api_base`` and connect to the gateway at
+    ``gateway_url`` instead of Discord's, e.g. to load test against the
+    stand-in in benchmarks.fake_discord. Unset ones keep Discord's.
+    """
+    if api_base:
+        discord.http.Route.BASE = api_base.rstrip("/")
+        log.warning(f"Using Discord API at {discord.http.Route.BASE}")
+    if gateway_url:
+        DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(gateway_url)
+        log.warning(f"Using Discord gateway at {gateway_url}")
+
+
+def parse_shard_ids(value: Optional[str]) -> Optional[List[int]]:
+    """Shard IDs from IDs and ranges such as "0-3,8"; None if not set"""
+    if not value or not value.strip():
+        return None
+    shard_ids = set()
+    for part in value.split(","):
+        if part.strip():
+            first, _, last = part.strip().partition("-")
+            shard_ids.update(range(int(first), int(last or first) + 1))
+    return sorted(shard_ids)
+
+
+def shard_options(shard_ids: Optional[str] = None, shard_count: Optional[str] = None) -> dict:
+    """
+    Which shards this process runs.
+
+    With neither set the bot asks Discord how many shards it needs and runs
+    them all. ``shard_ids`` (SHARD_IDS), e.g. "0-3" on one worker and "4-7"
+    on the next, splits them across processes and needs ``shard_count``
+    (SHARD_COUNT), the number of shards across every worker.
+    """
+    count = int(shard_count) if shard_count else None
+    ids = parse_shard_ids(shard_ids)
+    if ids is not None:
+        if count is None:
+            raise ValueError("SHARD_IDS needs SHARD_COUNT, the number of shards across all workers")
+        if ids[-1] >= count:
+            raise ValueError(f"SHARD_IDS has shard {ids[-1]}, but SHARD_COUNT is {count}")
+    return {"shard_ids": ids, "shard_count": count}
@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import heapq
+import socket
+import asyncio
+import sqlite3
+import itertools
+from contextlib import closing
+from datetime import datetime, timedelta, tzinfo
+from datetime import time as dt_time
+from typing import Awaitable, Callable, Dict, List, Optional
+from LogPipeline import get_logger
+
+log = get_logger(__name__)
+
+# Re-check the wall clock at least this often in case the system clock jumps
+MAX_SLEEP = 3600
+
+
+def localize(naive: datetime, tz: Optional[tzinfo]) -> datetime:
+    """Attach a time zone to a wall-clock time; None means the process's local zone (TZ)"""
+    if tz is None:
+        return naive.astimezone()
+    return naive.replace(tzinfo=tz)
+
+
+class RecurringJob:
+    """
+    A job that runs every day at fixed wall-clock times.
+
+    If ``catch_up`` is set and the bot was down for the most recent run, the
+    job runs once on start as long as that run is no older than ``catch_up``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        times: List[dt_time],
+        callback: Callable[[], Awaitable],
+        tz: Optional[tzinfo] = None,
+        catch_up: Optional[timedelta] = None,
+    ):
+        self.name = name
+        self.times = sorted(times)
+        self.callback = callback
+        self.tz = tz
+        self.catch_up = catch_up
+        self.last_duration: Optional[float] = None
+
+    def next_run(self, after: datetime) -> datetime:
+        """First run strictly after ``after``"""
+        day = after.astimezone(self.tz).date()
+        for offset in range(3):
+            for run_time in self.times:
+                run = localize(datetime.combine(day + timedelta(days=offset), run_time), self.tz)
+                if run > after:
+                    return run
+        raise ValueError(f"Job {self.name} has no run times")
+
+    def previous_run(self, before: datetime) -> datetime:
+        """Last run at or before ``before``"""
+        day = before.astimezone(self.tz).date()
+        for offset in range(3):
+            for run_time in reversed(self.times):
+                run = localize(datetime.combine(day - timedelta(days=offset), run_time), self.tz)
+                if run <= before:
+                    return run
+        raise ValueError(f"Job {self.name} has no run times")
+
+
+class JobClaims:
+    """
+    Scheduled runs claimed by the workers of a sharded bot, in an SQLite
+    database they share.
+
+    Every worker schedules every job, but a run is only made by the worker
+    that claims it first: claiming inserts the job and run time, which only
+    one worker can do. The latest claim of each job doubles as its last run.
+    """
+
+    # Claims older than this are deleted as new ones are made
+    RETENTION = 30 * 86400
+
+    def __init__(self, path: str, owner: Optional[str] = None):
+        self.path = path
+        # Recorded with each claim, to tell which worker made a run
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            """CREATE TABLE IF NOT EXISTS job_runs (
+                job TEXT NOT NULL,
+                run_at INTEGER NOT NULL,
+                owner TEXT NOT NULL,
+                claimed_at REAL NOT NULL,
+                PRIMARY KEY (job, run_at)
+            )"""
+        )
+        return connection
+
+    def _claim(self, job: str, run_at: int) -> bool:
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO job_runs (job, run_at, owner, claimed_at) VALUES (?, ?, ?, ?)",
+                (job, run_at, self.owner, now),
+            )
+            connection.execute("DELETE FROM job_runs WHERE claimed_at < ?", (now - self.RETENTION,))
+            return cursor.rowcount == 1
+
+    def _read_last_runs(self) -> Dict[str, float]:
+        with closing(self._connect()) as connection:
+            return dict(connection.execute("SELECT job, MAX(run_at) FROM job_runs GROUP BY job").fetchall())
+
+    async def claim(self, job: str, run: datetime) -> bool:
+        """True if this worker gets to make ``job``'s run at ``run``, False if another already has"""
+        return await asyncio.to_thread(self._claim, job, int(run.timestamp()))
+
+    async def last_runs(self) -> Dict[str, float]:
+        """The time of each job's latest claimed run, by any worker"""
+        return await asyncio.to_thread(self._read_last_runs)
+
+
+class Scheduler:
+    """
+    Runs recurring jobs for every cog from a single timer.
+
+    Jobs are kept in a heap ordered by their next run, and one task sleeps
+    until the earliest is due. The time of each job's last run is persisted
+    so runs missed while the bot was down can be caught up on start.
+
+    With ``claims``, for a bot split across worker processes, each run is
+    claimed before it's made so only one worker makes it, and the claims
+    take the place of the state file.
+    """
+
+    def __init__(self, state_path: str, claims: Optional[JobClaims] = None):
+        self.state_path = state_path
+        self.claims = claims
+        self.jobs: Dict[str, RecurringJob] = {}
+        self._heap = []
+        self._last_runs: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._running = set()
+        self._counter = itertools.count()
+        # Created in start() so they bind to the bot's running loop
+        self._wake: Optional[asyncio.Event] = None
+        self._save_lock: Optional[asyncio.Lock] = None
+
+    def _read_state(self) -> Dict[str, float]:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def _write_state(self, state: Dict[str, float]) -> None:
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file)
+        os.replace(temp_path, self.state_path)
+
+    async def load(self) -> None:
+        """Load the last run times from disk"""
+        try:
+            if self.claims is not None:
+                self._last_runs = await self.claims.last_runs()
+            else:
+                self._last_runs = await asyncio.to_thread(self._read_state)
+        except Exception as e:
+            source = self.claims.path if self.claims is not None else self.state_path
+            log.error(f"Failed to load scheduler state from {source}: {e}")
+
+    def add_job(self, job: RecurringJob) -> None:
+        """Register a job, catching up on a missed run if the job allows it"""
+        now = datetime.now().astimezone()
+        self.jobs[job.name] = job
+
+        last_run = self._last_runs.get(job.name)
+        previous = job.previous_run(now)
+        if last_run is None:
+            # First time we've seen this job, nothing to catch up on
+            self._last_runs[job.name] = previous.timestamp()
+            next_run = job.next_run(now)
+        elif job.catch_up and last_run < previous.timestamp() and now - previous <= job.catch_up:
+            log.info(f"Catching up on missed {job.name} run from {previous.isoformat()}")
+            next_run = previous
+        else:
+            next_run = job.next_run(now)
+
+        self._push(job, next_run)
+        if self._wake is not None:
+            self._wake.set()
+
+    def _push(self, job: RecurringJob, run: datetime) -> None:
+        heapq.heappush(self._heap, (run.timestamp(), next(self._counter), job, run))
+
+    def remove_job(self, name: str) -> None:
+        # Stale heap entries are skipped when they come up
+        self.jobs.pop(name, None)
+
+    def next_run(self, name: str) -> Optional[datetime]:
+        job = self.jobs.get(name)
+        runs = [run for _, _, heap_job, run in self._heap if heap_job is job]
+        return min(runs) if runs else None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._save_lock = asyncio.Lock()
+            self._task = asyncio.ensure_future(self._loop())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            self._wake.clear()
+            delay = MAX_SLEEP
+            if self._heap:
+                delay = min(delay, max(0.0, self._heap[0][0] - time.time()))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                continue
+            except asyncio.TimeoutError:
+                pass
+
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, job, run = heapq.heappop(self._heap)
+                if self.jobs.get(job.name) is not job:
+                    continue
+                self._push(job, job.next_run(max(run, datetime.now().astimezone())))
+                task = asyncio.ensure_future(self._run(job, run))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+    async def _run(self, job: RecurringJob, run: datetime) -> None:
+        if self.claims is not None:
+            await self._run_claimed(job, run)
+            return
+
+        start = time.perf_counter()
+        try:
+            await job.callback()
+        except Exception as e:
+            log.error(f"Scheduled job {job.name} failed: {e}")
+        finally:
+            job.last_duration = time.perf_counter() - start
+
+        self._last_runs[job.name] = run.timestamp()
+        try:
+            async with self._save_lock:
+                await asyncio.to_thread(self._write_state, dict(self._last_runs))
+        except Exception as e:
+            log.error(f"Failed to save scheduler state: {e}")
+
+    async def _run_claimed(self, job: RecurringJob, run: datetime) -> None:
+        try:
+            claimed = await self.claims.claim(job.name, run)
+        except Exception as e:
+            # Without a claim another worker may be making it too
+            log.error(f"Failed to claim the {job.name} run at {run.isoformat()}, skipping it: {e}")
+            return
+        self._last_runs[job.name] = run.timestamp()
+        if not claimed:
+            log.info(f"Skipping the {job.name} run at {run.isoformat()}, another worker made it")
+            return
+
+        start = time.perf_counter()
+        try:
+            await job.callback()
+        except Exception as e:
+            log.error(f"Scheduled job {job.name} failed: {e}")
+        finally:
+            job.last_duration = time.perf_counter() - start
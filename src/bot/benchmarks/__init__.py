@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for bro-larry-bot.
+
+Run from src/bot, e.g. ``python -m benchmarks.heart_store``.
+"""
@@ -0,0 +1,73 @@
+"""
+The burst of ``!devotional`` requests that follows the daily post.
+
+The daily devotional is posted to one channel, then ``--users`` users run
+``!devotional`` there, ``--concurrent`` at a time, against a fake channel that
+takes ``--latency`` seconds per send. Reported with no coalescing window and
+with ``--window``: full embeds sent, link replies and how long the burst took
+to answer. Concurrent requests share one send either way.
+
+    python -m benchmarks.devotional_burst --users 50 --concurrent 10
+"""
+
+import time
+import asyncio
+import argparse
+import logging
+import tempfile
+from cogs.DailyDevotional import DailyDevotional
+from benchmarks.fakes import FakeBot, FakeChannel, FakeContext, FakeGuild, FakeUser
+
+
+class SlowChannel(FakeChannel):
+    def __init__(self, channel_id, guild, latency):
+        super().__init__(channel_id, guild)
+        self.latency = latency
+        self.embeds = 0
+
+    async def send(self, content=None, *, embed=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        if embed is not None:
+            self.embeds += 1
+        return await super().send(content, embed=embed, **kwargs)
+
+
+async def bench(args, window, data_dir):
+    bot = FakeBot(data_dir)
+    guild = FakeGuild(1)
+    channel = bot.channels[1] = SlowChannel(1, guild, args.latency)
+    bot.guild_config._guilds[guild.id] = {"devotional_channel": channel.id}
+    cog = DailyDevotional(bot)
+    cog.coalesce_window = window
+    await cog.cog_load()
+
+    await cog.daily_devotional_task()
+    start = time.perf_counter()
+    for first in range(0, args.users, args.concurrent):
+        users = range(first, min(first + args.concurrent, args.users))
+        await asyncio.gather(
+            *(cog.manual_devotional.callback(cog, FakeContext(FakeUser(user_id), channel, guild)) for user_id in users)
+        )
+    elapsed = time.perf_counter() - start
+
+    label = f"window {window:g}s"
+    print(
+        f"{label:<16} {channel.embeds:>5} embeds sent  {channel.sent - channel.embeds:>5} link replies  "
+        f"{args.users} requests answered in {elapsed:.2f} s"
+    )
+
+
+async def main(args):
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as data_dir:
+        for window in (0, args.window):
+            await bench(args, window, data_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrent", type=int, default=10, help="requests arriving together")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per fake send")
+    parser.add_argument("--window", type=float, default=300, help="DEVOTIONAL_COALESCE_WINDOW to compare")
+    asyncio.run(main(parser.parse_args()))
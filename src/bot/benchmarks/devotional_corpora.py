@@ -0,0 +1,109 @@
+"""
+First-hit and warm lookups of devotional corpora in the registry.
+
+``--corpora`` copies of ``devotional_prompts.json`` stand in for translations
+and other years. Reported per ``--capacity``: the latency of a lookup that has
+to read a corpus from disk against one already in memory, the memory the
+resident corpora hold, and for ``--lookups`` lookups spread over the corpora
+like servers choosing languages (a few popular, many rare), how often a
+corpus had to be read.
+
+    python -m benchmarks.devotional_corpora --corpora 20 --capacity 1 3 20
+"""
+
+import os
+import gc
+import time
+import json
+import random
+import asyncio
+import argparse
+import logging
+import tempfile
+import tracemalloc
+from CorpusRegistry import CorpusRegistry
+from benchmarks.suite import percentile
+
+RESOURCE = os.path.join(os.path.dirname(__file__), "..", "resource", "devotional_prompts.json")
+
+
+def write_corpora(directory, count):
+    with open(RESOURCE, "r", encoding="utf-8") as file:
+        entries = json.load(file)
+    for index in range(count):
+        # Different text per corpus, so nothing is shared between them
+        corpus = [{**entry, "reflection": f"{entry.get('reflection', '')} ({index})"} for entry in entries]
+        with open(os.path.join(directory, f"devotional_prompts.c{index}.json"), "w", encoding="utf-8") as file:
+            json.dump(corpus, file)
+    return [f"c{index}" for index in range(count)]
+
+
+def popularity(names):
+    # Zipf-like: the first few corpora get most lookups
+    weights = [1 / (rank + 1) for rank in range(len(names))]
+    return lambda: random.choices(names, weights)[0]
+
+
+async def timed(registry, name):
+    start = time.perf_counter()
+    corpus = await registry.get(name)
+    corpus.get(random.randint(1, 365))
+    return time.perf_counter() - start
+
+
+async def bench(args, capacity, names, directory):
+    registry = CorpusRegistry(directory, capacity)
+    await registry.discover()
+
+    cold, warm = [], []
+    for name in names[: max(1, capacity)]:
+        cold.append(await timed(registry, name))
+        for _ in range(args.warm):
+            warm.append(await timed(registry, name))
+    cold.sort()
+    warm.sort()
+
+    gc.collect()
+    tracemalloc.start()
+    fresh = CorpusRegistry(directory, capacity)
+    await fresh.discover()
+    for name in names:
+        await fresh.get(name)
+    resident = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del fresh
+
+    pick = popularity(names)
+    registry.clear()
+    loads = registry.loads
+    start = time.perf_counter()
+    for _ in range(args.lookups):
+        await timed(registry, pick())
+    elapsed = time.perf_counter() - start
+    misses = registry.loads - loads
+
+    print(
+        f"capacity {capacity:>3}  first hit p50 {percentile(cold, 0.5) * 1e3:>7.2f} ms  "
+        f"warm p50 {percentile(warm, 0.5) * 1e6:>5.1f} us p99 {percentile(warm, 0.99) * 1e6:>5.1f} us  "
+        f"resident {resident / 1e6:>6.1f} MB  {args.lookups:,} lookups: {misses:>5,} reads "
+        f"({misses / args.lookups:>6.1%}) in {elapsed:.2f} s"
+    )
+
+
+async def main(args):
+    random.seed(args.seed)
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        names = write_corpora(directory, args.corpora)
+        for capacity in args.capacity:
+            await bench(args, capacity, names, directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpora", type=int, default=20)
+    parser.add_argument("--capacity", type=int, nargs="+", default=[1, 3, 20])
+    parser.add_argument("--warm", type=int, default=1000, help="warm lookups timed per corpus")
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=54)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,47 @@
+"""
+``!devotional`` lookup and embed cost: the old linear scan and fresh embed
+versus the day index and cached embed payload.
+
+    python -m benchmarks.devotional_embed --iterations 100000
+"""
+
+import timeit
+import asyncio
+import argparse
+from datetime import datetime
+from unittest.mock import MagicMock
+from cogs.DailyDevotional import DailyDevotional
+
+
+def legacy_todays_devotional(devotional_data, current_day):
+    """The linear scan get_todays_devotional used to do"""
+    for devotional in devotional_data:
+        if devotional.get("day") == current_day:
+            return devotional
+    return None
+
+
+def main(args):
+    cog = DailyDevotional(MagicMock())
+    asyncio.run(cog.load_devotional_data())
+    devotional_data = list(cog.devotional_data)
+    day = args.day or datetime.now().timetuple().tm_yday
+
+    def legacy():
+        return cog.create_devotional_embed(legacy_todays_devotional(devotional_data, day))
+
+    def cached():
+        return cog.get_devotional_embed(cog.corpus.get(day))
+
+    assert legacy().to_dict()["fields"] == cached().to_dict()["fields"]
+
+    for name, func in (("scan + build", legacy), ("index + cache", cached)):
+        seconds = min(timeit.repeat(func, number=args.iterations, repeat=3))
+        print(f"{name:<14} {seconds / args.iterations * 1e6:>8.2f} us/call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100_000)
+    parser.add_argument("--day", type=int, default=0, help="day of year to look up (default: today)")
+    main(parser.parse_args())
@@ -0,0 +1,63 @@
+"""
+Daily devotional fan-out time against local fake channels.
+
+Each fake channel takes ``--latency`` seconds per send and fails a
+``--failure-rate`` fraction of first attempts with a retryable 500.
+
+    python -m benchmarks.devotional_fanout --channels 1000 --concurrency 1 10 50
+"""
+
+import random
+import asyncio
+import argparse
+from unittest.mock import MagicMock
+import discord
+from FanOut import FanOutSender
+
+
+class FakeChannel:
+    def __init__(self, channel_id, latency, fail):
+        self.id = channel_id
+        self.latency = latency
+        self.fail = fail
+        self.messages = 0
+
+    async def send(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            self.fail = False
+            raise discord.HTTPException(MagicMock(status=500, reason="Internal Server Error"), "fake failure")
+        self.messages += 1
+
+
+async def bench(args, concurrency, rate):
+    channels = [
+        FakeChannel(channel_id, args.latency, random.random() < args.failure_rate)
+        for channel_id in range(args.channels)
+    ]
+    sender = FanOutSender(concurrency=concurrency, rate=rate, backoff=args.backoff)
+    report = await sender.send_all(channels, lambda channel: channel.send(embed=None))
+    label = f"{rate:g}/s" if rate else "unlimited"
+    print(f"concurrency {concurrency:>4}  rate {label:>9}   {report}")
+
+
+async def main(args):
+    random.seed(args.seed)
+    for concurrency in args.concurrency:
+        await bench(args, concurrency, args.rate)
+    if args.rate:
+        # Show what concurrency alone buys with the global limit lifted
+        for concurrency in args.concurrency:
+            await bench(args, concurrency, 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--channels", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--rate", type=float, default=40, help="sends per second across all channels, 0 for unlimited")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per fake send")
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    parser.add_argument("--backoff", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=54)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,133 @@
+"""
+Scheduling and delivering devotional DMs for many subscribers.
+
+``--subscribers`` users subscribe at random times on a five minute grid across
+``--zones`` time zones. Reported: how long loading them takes and the memory
+they hold, the timer wakeups and work to get through a simulated day compared
+with polling every subscription once a minute, and one batch of ``--batch``
+DMs sent through the cog to fake DM channels taking ``--latency`` seconds per
+send, ``--closed`` of them with DMs closed.
+
+    python -m benchmarks.devotional_subscriptions --subscribers 10000 50000
+"""
+
+import os
+import gc
+import time
+import random
+import asyncio
+import argparse
+import logging
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+import discord
+from zoneinfo import available_timezones
+from DevotionalSubscriptions import DevotionalSubscriptions
+from cogs.DailyDevotional import DailyDevotional
+from benchmarks.fakes import FakeBot, FakeChannel
+
+
+class DMChannel(FakeChannel):
+    def __init__(self, channel_id, latency, closed):
+        super().__init__(channel_id)
+        self.latency = latency
+        self.closed = closed
+
+    async def send(self, content=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        if self.closed:
+            response = SimpleNamespace(status=403, reason="Forbidden")
+            raise discord.Forbidden(response, {"code": 50007, "message": "Cannot send messages to this user"})
+        return await super().send(content, **kwargs)
+
+
+def write_subscriptions(path, count, zones):
+    rows = []
+    for user_id in range(count):
+        minutes = random.randrange(0, 24 * 60, 5)
+        rows.append((user_id, user_id, f"{minutes // 60:02}:{minutes % 60:02}", random.choice(zones), None))
+    DevotionalSubscriptions(path)._write_rows(rows, [])
+
+
+async def bench_schedule(args, count, zones, data_dir):
+    path = os.path.join(data_dir, f"subscriptions-{count}.sqlite3")
+    write_subscriptions(path, count, zones)
+    subscriptions = DevotionalSubscriptions(path)
+    start = time.perf_counter()
+    await subscriptions.load()
+    load = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    await DevotionalSubscriptions(path).load()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # A day of the heap timer: wake at each due time, take what's due
+    end = time.time() + 86400
+    wakeups = delivered = 0
+    start = time.perf_counter()
+    while subscriptions._heap[0][0] <= end:
+        now = datetime.fromtimestamp(subscriptions._heap[0][0]).astimezone()
+        delivered += len(subscriptions.pop_due(now))
+        wakeups += 1
+    heap_day = time.perf_counter() - start
+
+    # The same day polled every minute, checking every subscription
+    dues = [subscription.due.timestamp() for subscription in subscriptions.subscriptions.values()]
+    start = time.perf_counter()
+    minute = time.time()
+    for _ in range(24 * 60):
+        minute += 60
+        sum(1 for due in dues if due <= minute)
+    polling_day = time.perf_counter() - start
+
+    print(
+        f"{count:>7,} subscribers  load {load:>5.2f} s  {memory / count:>5.0f} B each  "
+        f"heap: {wakeups:>4} wakeups {delivered:>7,} due {heap_day:>5.2f} s/day  "
+        f"polling: 1440 wakeups {polling_day:>5.2f} s/day"
+    )
+
+
+async def bench_delivery(args, data_dir):
+    bot = FakeBot(data_dir)
+    cog = DailyDevotional(bot)
+    await cog.load_devotional_data()
+
+    for user_id in range(args.batch):
+        channel = bot.channels[user_id] = DMChannel(user_id, args.latency, random.random() < args.closed)
+        await cog.subscriptions.subscribe(user_id, channel.id, datetime.now().time())
+    due = cog.subscriptions.pop_due(datetime.now().astimezone() + timedelta(days=1))
+
+    start = time.perf_counter()
+    await cog.deliver_subscriptions(due)
+    elapsed = time.perf_counter() - start
+    sent = int(cog.dm_deliveries.value(outcome="sent"))
+    unsubscribed = int(cog.dm_deliveries.value(outcome="unsubscribed"))
+    print(
+        f"delivery: {len(due):,} due  {sent:,} sent  {unsubscribed:,} unsubscribed  "
+        f"{len(cog.subscriptions):,} still subscribed  in {elapsed:.2f} s"
+    )
+
+
+async def main(args):
+    random.seed(args.seed)
+    logging.disable(logging.WARNING)
+    zones = random.sample(sorted(available_timezones()), args.zones)
+    with tempfile.TemporaryDirectory() as data_dir:
+        for count in args.subscribers:
+            await bench_schedule(args, count, zones, data_dir)
+        await bench_delivery(args, data_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--zones", type=int, default=40, help="distinct time zones subscribers are in")
+    parser.add_argument("--batch", type=int, default=500, help="subscribers in the delivery batch")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per fake DM")
+    parser.add_argument("--closed", type=float, default=0.05, help="share of subscribers with DMs closed")
+    parser.add_argument("--seed", type=int, default=54)
+    asyncio.run(main(parser.parse_args()))
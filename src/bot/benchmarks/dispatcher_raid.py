@@ -0,0 +1,156 @@
+"""
+Command spam against the outbound dispatcher, compared with replying directly.
+
+``--users`` users each fire ``!heart surrender`` and ``!d add`` at
+``--spam-rate`` per second for ``--duration`` seconds, spread over
+``--channels`` channels. Each fake channel waits out a bucket of ``--limit``
+sends per ``--window`` seconds like discord.py does for a channel's route, so
+replies that can't go out pile up behind it. Reported per mode: replies sent,
+refused and merged, reply latency and how long the backlog took to clear once
+the spam stopped.
+
+    python -m benchmarks.dispatcher_raid --users 50 --channels 2 --duration 3
+"""
+
+import time
+import random
+import asyncio
+import argparse
+import logging
+import tempfile
+from collections import deque
+from types import SimpleNamespace
+from discord.ext import commands
+from Dispatcher import Dispatcher
+from cogs.HeartCog import HeartSanctifierCog
+from cogs.DistractionCog import DistractionCog
+from benchmarks.fakes import FakeBot, FakeChannel, FakeContext, FakeGuild, FakeUser
+from benchmarks.suite import percentile
+
+SURRENDER = SimpleNamespace(qualified_name="heart surrender")
+ADD = SimpleNamespace(qualified_name="distraction add")
+
+
+class BucketedChannel(FakeChannel):
+    """A fake channel that holds sends back to ``limit`` per ``window`` seconds"""
+
+    def __init__(self, channel_id, guild, limit, window, latency):
+        super().__init__(channel_id, guild)
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.sent_at = deque()
+        self.waiting = 0
+        self.max_waiting = 0
+        self._lock = asyncio.Lock()
+
+    async def send(self, content=None, **kwargs):
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        async with self._lock:
+            while len(self.sent_at) >= self.limit:
+                wait = self.sent_at[0] + self.window - time.monotonic()
+                if wait <= 0:
+                    self.sent_at.popleft()
+                else:
+                    await asyncio.sleep(wait)
+            self.sent_at.append(time.monotonic())
+        await asyncio.sleep(self.latency)
+        self.waiting -= 1
+        return await super().send(content, **kwargs)
+
+
+class DirectReplies:
+    """What the cogs did before the dispatcher: every reply is sent right away"""
+
+    def check_cooldown(self, ctx):
+        return
+
+    async def reply(self, ctx, content=None, **kwargs):
+        return await ctx.send(content, **kwargs)
+
+
+async def bench(mode, args, data_dir):
+    bot = FakeBot(data_dir)
+    if mode == "direct":
+        bot.dispatcher = DirectReplies()
+    else:
+        bot.dispatcher = Dispatcher(
+            bot.metrics,
+            user_rate=args.user_rate,
+            user_burst=args.user_burst,
+            command_rate=args.command_rate,
+            command_burst=args.command_burst,
+            queue_size=args.queue_size,
+        )
+    heart_cog = HeartSanctifierCog(bot)
+    distraction_cog = DistractionCog(bot)
+
+    guild = FakeGuild(1)
+    channels = [BucketedChannel(index, guild, args.limit, args.window, args.latency) for index in range(args.channels)]
+    latencies = []
+
+    async def run(user_id):
+        ctx = FakeContext(FakeUser(user_id), channels[user_id % len(channels)], guild)
+        began = time.perf_counter()
+        ctx.command = SURRENDER if random.random() < 0.5 else ADD
+        try:
+            # What the bot's before_invoke hook does
+            bot.dispatcher.check_cooldown(ctx)
+        except commands.CommandOnCooldown:
+            latencies.append(time.perf_counter() - began)
+            return
+        if ctx.command is SURRENDER:
+            await heart_cog.surrender.callback(heart_cog, ctx)
+        else:
+            await distraction_cog.add_distraction.callback(distraction_cog, ctx, distraction="spam")
+        latencies.append(time.perf_counter() - began)
+
+    tasks = []
+    interval = 1 / (args.users * args.spam_rate)
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.duration:
+        tasks.append(asyncio.ensure_future(run(random.randrange(args.users))))
+        await asyncio.sleep(interval)
+    spam_stopped = time.perf_counter()
+    await asyncio.gather(*tasks)
+    drained = time.perf_counter() - spam_stopped
+
+    latencies.sort()
+    sent = sum(channel.sent for channel in channels)
+    outcomes = {}
+    if mode == "dispatcher":
+        outcomes = {labels["outcome"]: int(value) for labels, value in bot.dispatcher.messages.items()}
+    refused = outcomes.get("cooldown", 0) + outcomes.get("overflow", 0)
+    print(
+        f"{mode:<10} {len(tasks):>6,} commands  {sent:>6,} sent  {refused:>6,} refused  "
+        f"{outcomes.get('coalesced', 0):>6,} merged  p50 {percentile(latencies, 0.5):>7.2f} s  "
+        f"p99 {percentile(latencies, 0.99):>7.2f} s  backlog {max(c.max_waiting for c in channels):>5,}  "
+        f"drained in {drained:>6.2f} s"
+    )
+
+
+async def main(args):
+    random.seed(args.seed)
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as data_dir:
+        for mode in ("direct", "dispatcher"):
+            await bench(mode, args, data_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds of spam")
+    parser.add_argument("--spam-rate", type=float, default=2.0, help="commands per second per user")
+    parser.add_argument("--limit", type=int, default=5, help="sends per window per channel")
+    parser.add_argument("--window", type=float, default=5.0, help="channel bucket window in seconds")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per fake send")
+    parser.add_argument("--user-rate", type=float, default=1.0)
+    parser.add_argument("--user-burst", type=int, default=5)
+    parser.add_argument("--command-rate", type=float, default=0.5)
+    parser.add_argument("--command-burst", type=int, default=3)
+    parser.add_argument("--queue-size", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=54)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""
+Search latency over the distraction journal as it grows.
+
+``--users`` users log ``--entries`` distractions in total, built from a skewed
+vocabulary. Compares scanning an in-memory log of every entry for the user's
+entries with the search words against ``!d search``'s FTS5 index, and times
+``!d history`` pages and one compaction of the older half.
+
+    python -m benchmarks.distraction_search --users 1000 --entries 10000 100000 1000000
+"""
+
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from DistractionJournal import DistractionJournal
+from benchmarks.suite import percentile
+
+WORDS = [f"word{index}" for index in range(2000)]
+
+
+def word():
+    # Zipf-like: a few words dominate
+    return WORDS[min(len(WORDS) - 1, int(random.paretovariate(1.1)) - 1)]
+
+
+def timed(samples, run):
+    latencies = []
+    for sample in samples:
+        start = time.perf_counter()
+        run(sample)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies
+
+
+async def timed_async(samples, run):
+    latencies = []
+    for sample in samples:
+        start = time.perf_counter()
+        await run(sample)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies
+
+
+async def bench(args, entries, data_dir):
+    now = int(time.time())
+    log = []
+    journal = DistractionJournal(os.path.join(data_dir, f"journal-{entries}.sqlite3"))
+    start = time.perf_counter()
+    for _ in range(entries):
+        user_id = random.randrange(args.users)
+        text = " ".join(word() for _ in range(random.randint(2, 6)))
+        logged_at = now - random.randrange(args.days * 86400)
+        log.append((user_id, logged_at, text))
+        journal.add(user_id, 1, text, logged_at)
+        if len(journal._pending) >= 10000:
+            await journal.flush()
+    await journal.flush()
+    insert = (time.perf_counter() - start) / entries
+
+    queries = [(random.randrange(args.users), f"{word()} {word()}") for _ in range(args.queries)]
+
+    def scan(query):
+        # Searching without an index: every entry, every word
+        user_id, terms = query
+        words = terms.split()
+        matches = [entry for entry in log if entry[0] == user_id and all(w in entry[2].split() for w in words)]
+        matches.sort(key=lambda entry: entry[1], reverse=True)
+        return matches[:10]
+
+    scan_latencies = timed(queries, scan)
+    search_latencies = await timed_async(queries, lambda query: journal.search(query[0], query[1]))
+    history_latencies = await timed_async(queries, lambda query: journal.history(query[0], 10, 10))
+
+    start = time.perf_counter()
+    deleted = await journal.compact(args.days / 2)
+    compaction = time.perf_counter() - start
+    await journal.close()
+
+    print(
+        f"{entries:>9,} entries  insert {insert * 1e6:>5.1f} us  "
+        f"scan p50 {percentile(scan_latencies, 0.5) * 1e3:>7.3f} ms p99 "
+        f"{percentile(scan_latencies, 0.99) * 1e3:>7.3f} ms  "
+        f"search p50 {percentile(search_latencies, 0.5) * 1e3:>7.3f} ms p99 "
+        f"{percentile(search_latencies, 0.99) * 1e3:>7.3f} ms  "
+        f"history page p50 {percentile(history_latencies, 0.5) * 1e3:>6.3f} ms  "
+        f"compacted {deleted:,} in {compaction:.2f} s"
+    )
+
+
+async def main(args):
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as data_dir:
+        for entries in args.entries:
+            await bench(args, entries, data_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--entries", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365, help="days the entries are spread over")
+    parser.add_argument("--seed", type=int, default=54)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,78 @@
+"""
+Memory of the distraction stats as users log more, measured with tracemalloc.
+
+``--users`` users each log ``--per-user`` distractions spread over the last
+``--days`` days, drawn from a skewed vocabulary. Compares keeping every logged
+distraction with a timestamp against the streaming summaries behind
+``!d stats``, and times one stats lookup.
+
+    python -m benchmarks.distraction_stats --users 1000 --per-user 10 100 1000
+"""
+
+import gc
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+from DistractionStats import DistractionStatsStore
+
+THEMES = [f"theme {index}" for index in range(200)]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return kept, after - before
+
+
+def logs(args, per_user):
+    now = datetime.now()
+    for user_id in range(args.users):
+        for _ in range(per_user):
+            # Zipf-like: a few themes dominate
+            theme = THEMES[min(len(THEMES) - 1, int(random.paretovariate(1.2)) - 1)]
+            yield user_id, theme, now - timedelta(seconds=random.uniform(0, args.days * 86400))
+
+
+def main(args):
+    random.seed(args.seed)
+    for per_user in args.per_user:
+        entries = list(logs(args, per_user))
+
+        def raw():
+            history = {}
+            for user_id, theme, when in entries:
+                history.setdefault(user_id, []).append((theme, when))
+            return history
+
+        def streaming():
+            store = DistractionStatsStore("unused.sqlite3")
+            for user_id, theme, when in entries:
+                store.record(user_id, 1, theme, when)
+            return store
+
+        _, raw_bytes = measure(raw)
+        store, streaming_bytes = measure(streaming)
+        today = datetime.now().date().toordinal()
+        start = time.perf_counter()
+        store.user(0).window(30, today)
+        lookup = time.perf_counter() - start
+        print(
+            f"{per_user:>6,} logged per user   full history {raw_bytes / args.users:>10,.0f} B/user   "
+            f"summaries {streaming_bytes / args.users:>8,.0f} B/user   30 day lookup {lookup * 1e6:>7.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--per-user", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--days", type=int, default=30, help="days the logs are spread over")
+    parser.add_argument("--seed", type=int, default=54)
+    main(parser.parse_args())
@@ -0,0 +1,566 @@
+"""
+End-to-end load test of the whole bot.py process against a stand-in Discord.
+
+A local server plays Discord's REST API and gateway, as far as the bot uses
+them: it answers the calls bot.py makes to log in and start up, hands each
+connection its share of ``--guilds`` synthetic guilds, then replays scripted
+``!heart``, ``!d`` and ``!devotional`` messages from ``--users`` users at
+``--rate`` messages per second for ``--duration`` seconds. Messages sent to a
+channel are limited like Discord's, to ``--channel-limit`` per
+``--channel-window`` seconds with a 429 for the rest, and ``--random-429`` of
+all requests get a 429 regardless.
+
+Reported: messages replayed, replies and their throughput, the latency from a
+message going out on the gateway to its reply reaching the REST API (replies
+are matched to messages in order, per channel), messages left unanswered and
+the 429s handed out. Intents, command parsing, the cogs, the dispatcher's
+queues and discord.py's rate limit handling are all inside the measurement.
+
+bot.py is started with PREFIX_COMMANDS=true and a throwaway DATA_DIR; other
+settings such as BOT_PROFILE or LOG_SAMPLE_RATES are passed through from the
+environment. ``--shards`` is the shard count the server recommends, and
+``--workers`` splits those shards across that many bot.py processes sharing
+the DATA_DIR, through SHARD_COUNT and SHARD_IDS. With ``--no-spawn`` only the
+server runs, for a bot.py started by hand, e.g. under a profiler.
+
+    python -m benchmarks.fake_discord --guilds 200 --rate 1000 --duration 20 --output e2e.json
+    python -m benchmarks.fake_discord --shards 4 --workers 2
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import signal
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import itertools
+import subprocess
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+import discord
+from aiohttp import WSMsgType, web
+from benchmarks.gateway_profiles import BOT_ID, guild_payload, message_payload, user_payload
+from benchmarks.suite import percentile
+
+BOT_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+API = "/api/v10"
+# Without this intent Discord sends messages with their content blanked
+MESSAGE_CONTENT = 1 << 15
+# What the replayed users type, and how often relative to each other
+SCRIPT = {
+    "!heart surrender": 3,
+    "!heart status": 3,
+    "!heart empty": 1,
+    "!d add phone notifications": 3,
+    "!d add worried about work": 2,
+    "!d stats": 1,
+    "!d": 1,
+    "!devotional": 2,
+}
+
+
+def json_response(data, status=200, headers=None):
+    # discord.py only decodes bodies typed exactly application/json, without a charset
+    body = json.dumps(data).encode("utf-8")
+    return web.Response(body=body, status=status, headers=headers, content_type="application/json")
+
+
+class GatewayConnection:
+    """One client's gateway websocket, compressed the way it asked for"""
+
+    def __init__(self, ws, compress):
+        self.ws = ws
+        # zstd-stream clients get plain text frames, which discord.py also reads
+        self.compressor = zlib.compressobj() if compress == "zlib-stream" else None
+        self.lock = asyncio.Lock()
+        self.sequence = 0
+        self.intents = 0
+        self.guilds = []
+
+    async def send(self, op, data, event=None):
+        async with self.lock:
+            payload = {"op": op, "d": data}
+            if op == 0:
+                self.sequence += 1
+                payload.update(s=self.sequence, t=event)
+            text = json.dumps(payload, separators=(",", ":"))
+            if self.compressor is None:
+                await self.ws.send_str(text)
+            else:
+                data = self.compressor.compress(text.encode("utf-8")) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+                await self.ws.send_bytes(data)
+
+
+class FakeDiscord:
+    """
+    Discord's REST API and gateway for load tests.
+
+    Replies are matched to replayed messages first in, first out per channel;
+    a message without a reply within ``timeout`` seconds counts as unanswered.
+    """
+
+    def __init__(
+        self, guilds, channel_limit=5, channel_window=5.0, random_429=0.0, retry_after=1.0, timeout=30.0, shards=1
+    ):
+        # Snowflake-like IDs, so guilds spread over shards as Discord's do
+        self.guilds = [guild_payload((index + 1) << 22, 1, 0) for index in range(guilds)]
+        self.shards = shards
+        self.channel_limit = channel_limit
+        self.channel_window = channel_window
+        self.random_429 = random_429
+        self.retry_after = retry_after
+        self.timeout = timeout
+        self.url = None
+        self.connections = []
+        self.ids = itertools.count(1 << 40)
+        self.windows = {}
+        self.pending = defaultdict(deque)
+        self.latencies = []
+        self.replayed = 0
+        self.unanswered = 0
+        self.unprompted = 0
+        self.last_reply = None
+        self.requests = 0
+        self.rate_limited = Counter()
+        self._runner = None
+
+    @property
+    def api_base(self):
+        return f"{self.url}{API}"
+
+    @property
+    def gateway_url(self):
+        return f"{self.url.replace('http', 'ws', 1)}/gateway"
+
+    def bot_user(self):
+        return {**user_payload(BOT_ID), "username": "Bro Larry", "bot": True}
+
+    async def start(self, host="127.0.0.1", port=0):
+        app = web.Application(middlewares=[self._count_and_limit])
+        app.router.add_get(f"{API}/users/@me", self.current_user)
+        app.router.add_patch(f"{API}/users/@me", self.current_user)
+        app.router.add_get(f"{API}/oauth2/applications/@me", self.application)
+        app.router.add_get(f"{API}/gateway/bot", self.gateway_info)
+        app.router.add_put(f"{API}/applications/{{application_id}}/commands", self.sync_commands)
+        app.router.add_post(f"{API}/users/@me/channels", self.create_dm)
+        app.router.add_post(f"{API}/channels/{{channel_id}}/messages", self.create_message)
+        app.router.add_get("/gateway", self.gateway)
+
+        sock = socket.socket()
+        sock.bind((host, port))
+        self.url = f"http://{host}:{sock.getsockname()[1]}"
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.SockSite(self._runner, sock).start()
+
+    async def stop(self):
+        for connection in list(self.connections):
+            await connection.ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def connected_guilds(self):
+        return sum(len(connection.guilds) for connection in self.connections)
+
+    # REST
+
+    def _too_many_requests(self, kind, retry_after):
+        self.rate_limited[kind] += 1
+        return json_response(
+            {"message": "You are being rate limited.", "retry_after": round(retry_after, 3), "global": False},
+            status=429,
+            # discord.py takes a 429 without Via as a Cloudflare ban
+            headers={"Via": "1.1 google", "X-RateLimit-Scope": "shared" if kind == "random" else "user"},
+        )
+
+    @web.middleware
+    async def _count_and_limit(self, request, handler):
+        if request.path.startswith(API):
+            self.requests += 1
+            if self.random_429 and random.random() < self.random_429:
+                return self._too_many_requests("random", self.retry_after)
+        return await handler(request)
+
+    async def current_user(self, request):
+        await request.read()
+        return json_response(self.bot_user())
+
+    async def application(self, request):
+        return json_response(
+            {
+                "id": str(BOT_ID),
+                "name": "Bro Larry",
+                "description": "",
+                "icon": None,
+                "bot_public": False,
+                "bot_require_code_grant": False,
+                "owner": user_payload(2),
+                "verify_key": "",
+                "flags": 0,
+            }
+        )
+
+    async def gateway_info(self, request):
+        return json_response(
+            {
+                "url": self.gateway_url,
+                "shards": self.shards,
+                "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 16},
+            }
+        )
+
+    async def sync_commands(self, request):
+        await request.read()
+        return json_response([])
+
+    async def create_dm(self, request):
+        body = await request.json()
+        return json_response(
+            {"id": str(next(self.ids)), "type": 1, "recipients": [user_payload(int(body["recipient_id"]))]}
+        )
+
+    def _answer(self, channel_id, now):
+        pending = self.pending.get(channel_id)
+        while pending:
+            sent = pending.popleft()
+            if now - sent <= self.timeout:
+                self.latencies.append(now - sent)
+                self.last_reply = now
+                return
+            self.unanswered += 1
+        # Not a reply to anything replayed, e.g. a scheduled post
+        self.unprompted += 1
+
+    async def create_message(self, request):
+        channel_id = int(request.match_info["channel_id"])
+        now = time.perf_counter()
+        headers = {}
+        if self.channel_limit:
+            window = self.windows.get(channel_id)
+            if window is None or now - window[0] >= self.channel_window:
+                window = self.windows[channel_id] = [now, 0]
+            reset_after = self.channel_window - (now - window[0])
+            if window[1] >= self.channel_limit:
+                return self._too_many_requests("channel", reset_after)
+            window[1] += 1
+            headers = {
+                "X-RateLimit-Bucket": "channel-messages",
+                "X-RateLimit-Limit": str(self.channel_limit),
+                "X-RateLimit-Remaining": str(self.channel_limit - window[1]),
+                "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+                "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            }
+        self._answer(channel_id, now)
+
+        body = await request.json() if request.content_type == "application/json" else {}
+        message = message_payload(0, next(self.ids), BOT_ID)
+        del message["guild_id"], message["member"]
+        message.update(
+            channel_id=str(channel_id),
+            author=self.bot_user(),
+            content=body.get("content") or "",
+            embeds=body.get("embeds") or [],
+        )
+        return json_response(message, headers=headers)
+
+    # Gateway
+
+    async def gateway(self, request):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        connection = GatewayConnection(ws, request.query.get("compress"))
+        await connection.send(10, {"heartbeat_interval": 41250})
+        try:
+            async for message in ws:
+                if message.type == WSMsgType.TEXT:
+                    await self._receive(connection, json.loads(message.data))
+        finally:
+            if connection in self.connections:
+                self.connections.remove(connection)
+        return ws
+
+    async def _receive(self, connection, payload):
+        op, data = payload["op"], payload.get("d")
+        if op == 1:
+            # An ack faster than discord.py's heartbeat thread notes its send reads as a 40 s lag
+            asyncio.get_running_loop().call_later(0.05, asyncio.ensure_future, connection.send(11, None))
+        elif op == 2:
+            await self._identify(connection, data)
+        elif op == 6:
+            await connection.send(0, {}, "RESUMED")
+        elif op == 8:
+            # Every member is already in GUILD_CREATE, so chunks are empty
+            chunk = {"guild_id": data["guild_id"], "members": [], "chunk_index": 0, "chunk_count": 1}
+            await connection.send(0, {**chunk, "nonce": data.get("nonce")}, "GUILD_MEMBERS_CHUNK")
+
+    async def _identify(self, connection, data):
+        shard_id, shard_count = data.get("shard") or (0, 1)
+        guilds = [guild for guild in self.guilds if (int(guild["id"]) >> 22) % shard_count == shard_id]
+        connection.intents = data.get("intents", 0)
+        ready = {
+            "v": 10,
+            "user": self.bot_user(),
+            "guilds": [{"id": guild["id"], "unavailable": True} for guild in guilds],
+            "session_id": f"session-{shard_id}",
+            "resume_gateway_url": self.gateway_url,
+            "shard": [shard_id, shard_count],
+            "application": {"id": str(BOT_ID), "flags": 0},
+        }
+        await connection.send(0, ready, "READY")
+        for guild in guilds:
+            await connection.send(0, guild, "GUILD_CREATE")
+        connection.guilds = guilds
+        self.connections.append(connection)
+
+    # Replay
+
+    async def _send_message(self, connection, guild, author_id, content):
+        channel = random.choice(guild["channels"])
+        message = message_payload(int(guild["id"]), next(self.ids), author_id)
+        message.update(channel_id=channel["id"], content=content if connection.intents & MESSAGE_CONTENT else "")
+        self.pending[int(channel["id"])].append(time.perf_counter())
+        self.replayed += 1
+        await connection.send(0, message, "MESSAGE_CREATE")
+
+    async def replay(self, rate, duration, users, script):
+        """Send ``rate`` messages a second for ``duration`` seconds; returns the seconds taken"""
+        targets = [(connection, guild) for connection in self.connections for guild in connection.guilds]
+        contents, weights = list(script), list(script.values())
+        start = time.perf_counter()
+        sent = 0
+        while True:
+            elapsed = time.perf_counter() - start
+            if elapsed >= duration:
+                return elapsed
+            due = int(elapsed * rate) - sent
+            for content in random.choices(contents, weights, k=due):
+                connection, guild = random.choice(targets)
+                await self._send_message(connection, guild, 1_000_000 + random.randrange(users), content)
+            sent += due
+            await asyncio.sleep(0.005)
+
+    async def drain(self):
+        """Wait for the replies still due, then count what's left unanswered"""
+        deadline = time.perf_counter() + self.timeout
+        while any(self.pending.values()) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.1)
+        self.unanswered += sum(len(pending) for pending in self.pending.values())
+        self.pending.clear()
+
+
+def bot_environment(server, data_dir):
+    return {
+        **os.environ,
+        "DISCORD_TOKEN": "fake-token",
+        "DISCORD_API_BASE": server.api_base,
+        "DISCORD_GATEWAY_URL": server.gateway_url,
+        "DATA_DIR": data_dir,
+        "PREFIX_COMMANDS": "true",
+    }
+
+
+def worker_environments(server, data_dir, shards, workers):
+    """The environment of each bot.py, with an equal share of the shards when there's more than one"""
+    environment = bot_environment(server, data_dir)
+    if workers == 1:
+        return [environment]
+    environments = []
+    for worker in range(workers):
+        first, last = worker * shards // workers, (worker + 1) * shards // workers - 1
+        worker_environment = {**environment, "SHARD_COUNT": str(shards), "SHARD_IDS": f"{first}-{last}"}
+        if environment.get("METRICS_PORT"):
+            worker_environment["METRICS_PORT"] = str(int(environment["METRICS_PORT"]) + worker)
+        environments.append(worker_environment)
+    return environments
+
+
+async def wait_connected(server, processes, timeout):
+    deadline = time.perf_counter() + timeout if timeout else None
+    while server.connected_guilds() < len(server.guilds):
+        for process in processes:
+            if process.returncode is not None:
+                raise RuntimeError(f"bot.py exited with code {process.returncode}")
+        if deadline is not None and time.perf_counter() > deadline:
+            raise RuntimeError(f"bot.py didn't connect within {timeout:.0f} s")
+        await asyncio.sleep(0.1)
+
+
+async def stop_bot(process):
+    if process.returncode is not None:
+        return
+    # bot.py closes cleanly on Ctrl+C, flushing its state as it would in production
+    process.send_signal(signal.SIGINT)
+    try:
+        await asyncio.wait_for(process.wait(), 30)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+
+
+def print_log_tail(path, lines=20):
+    with open(path, "r", encoding="utf-8", errors="replace") as file:
+        tail = file.readlines()[-lines:]
+    print(f"Last lines of {path}:", *tail, sep="\n", end="", file=sys.stderr)
+
+
+def summarize(server, args, replay_elapsed, replay_started):
+    latencies = sorted(server.latencies)
+    replied = (server.last_reply - replay_started) if server.last_reply else 0.0
+    return {
+        "scenario": "end_to_end",
+        "guilds": len(server.guilds),
+        "shards": len(server.connections),
+        "workers": args.workers if args.spawn else 1,
+        "replayed": server.replayed,
+        "replay_rate": server.replayed / replay_elapsed if replay_elapsed else 0.0,
+        "replies": len(latencies),
+        "throughput_replies": len(latencies) / replied if replied else 0.0,
+        "unanswered": server.unanswered,
+        "unprompted": server.unprompted,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p90_ms": percentile(latencies, 0.90) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+        "max_ms": latencies[-1] * 1e3 if latencies else 0.0,
+        "rest_requests": server.requests,
+        "rate_limited": dict(server.rate_limited),
+    }
+
+
+async def run(args, server, data_dir):
+    processes = []
+    log_path = args.bot_log or os.path.join(data_dir, "bot.log")
+    log_paths = [log_path] if args.workers == 1 else [f"{log_path}.{worker}" for worker in range(args.workers)]
+    if args.spawn:
+        environments = worker_environments(server, data_dir, args.shards, args.workers)
+        for environment, path in zip(environments, log_paths):
+            with open(path, "wb") as log_file:
+                processes.append(
+                    await asyncio.create_subprocess_exec(
+                        sys.executable,
+                        "bot.py",
+                        cwd=BOT_DIR,
+                        env=environment,
+                        stdout=log_file,
+                        stderr=subprocess.STDOUT,
+                    )
+                )
+    else:
+        print("Start bot.py with:", file=sys.stderr)
+        for name in ("DISCORD_TOKEN", "DISCORD_API_BASE", "DISCORD_GATEWAY_URL", "PREFIX_COMMANDS"):
+            print(f"  {name}={bot_environment(server, data_dir)[name]}", file=sys.stderr)
+
+    try:
+        started = time.perf_counter()
+        await wait_connected(server, processes, args.connect_timeout if args.spawn else None)
+        print(
+            f"Connected in {time.perf_counter() - started:.1f} s with {len(server.connections)} shard(s) "
+            f"in {len(processes) or 1} process(es), "
+            f"replaying {args.rate:,} messages/s for {args.duration:.0f} s",
+            file=sys.stderr,
+        )
+        # Let the bot finish starting up, e.g. its command sync and avatar upload
+        await asyncio.sleep(args.warmup)
+        server.unprompted = 0
+        replay_started = time.perf_counter()
+        replay_elapsed = await server.replay(args.rate, args.duration, args.users, args.script)
+        await server.drain()
+        return summarize(server, args, replay_elapsed, replay_started)
+    except RuntimeError:
+        await asyncio.gather(*(stop_bot(process) for process in processes))
+        for path in log_paths[: len(processes)]:
+            print_log_tail(path)
+        raise
+    finally:
+        await asyncio.gather(*(stop_bot(process) for process in processes))
+
+
+async def main(args):
+    random.seed(args.seed)
+    server = FakeDiscord(
+        args.guilds,
+        args.channel_limit,
+        args.channel_window,
+        args.random_429,
+        args.retry_after,
+        args.timeout,
+        args.shards,
+    )
+    await server.start(port=args.port)
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            result = await run(args, server, data_dir)
+    finally:
+        await server.stop()
+
+    print(
+        f"{result['replayed']:,} replayed ({result['replay_rate']:,.0f}/s)  {result['replies']:,} replies "
+        f"({result['throughput_replies']:,.0f}/s)  {result['unanswered']:,} unanswered  "
+        f"p50 {result['p50_ms']:.1f} ms  p90 {result['p90_ms']:.1f} ms  p99 {result['p99_ms']:.1f} ms  "
+        f"max {result['max_ms']:.1f} ms  {result['rest_requests']:,} REST requests  "
+        f"429s: {', '.join(f'{kind} {count:,}' for kind, count in result['rate_limited'].items()) or 'none'}",
+        file=sys.stderr,
+    )
+    if args.output:
+        report = {
+            "version": os.getenv("VERSION", "development"),
+            "timestamp": datetime.now().astimezone().isoformat(),
+            "python": platform.python_version(),
+            "discord_py": discord.__version__,
+            "platform": f"{platform.system()} {platform.release()}",
+            "parameters": {
+                "rate": args.rate,
+                "duration": args.duration,
+                "users": args.users,
+                "shards": args.shards,
+                "workers": args.workers,
+                "channel_limit": args.channel_limit,
+                "channel_window": args.channel_window,
+                "random_429": args.random_429,
+                "bot_profile": os.getenv("BOT_PROFILE", "default"),
+                "dispatch_rate": float(os.getenv("DISPATCH_RATE", 40)),
+                "seed": args.seed,
+            },
+            "results": [result],
+        }
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Wrote {args.output}", file=sys.stderr)
+
+
+def load_script(path):
+    """A JSON object of message contents to their relative weights"""
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guilds", type=int, default=200)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--rate", type=int, default=1000, help="messages replayed per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to replay for")
+    parser.add_argument("--script", type=load_script, default=SCRIPT, help="JSON file of message contents to weights")
+    parser.add_argument("--channel-limit", type=int, default=5, help="messages per channel per window; 0 for no limit")
+    parser.add_argument("--channel-window", type=float, default=5.0, help="seconds")
+    parser.add_argument("--random-429", type=float, default=0.01, help="share of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="seconds, for the random 429s")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds before a message counts as unanswered")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds between connecting and replaying")
+    parser.add_argument("--connect-timeout", type=float, default=60.0)
+    parser.add_argument("--port", type=int, default=0, help="port to serve on; 0 picks a free one")
+    parser.add_argument("--shards", type=int, default=1, help="shard count the server recommends")
+    parser.add_argument("--workers", type=int, default=1, help="bot.py processes to split the shards across")
+    parser.add_argument("--no-spawn", dest="spawn", action="store_false", help="don't start bot.py, wait for one")
+    parser.add_argument("--bot-log", help="file for bot.py's output (default: a temporary file)")
+    parser.add_argument("--output", help="JSON output path")
+    parser.add_argument("--seed", type=int, default=54)
+    arguments = parser.parse_args()
+    if arguments.workers > arguments.shards:
+        parser.error("--workers can't be more than --shards")
+    asyncio.run(main(arguments))
@@ -0,0 +1,99 @@
+"""
+Stand-ins for the discord.py objects the cogs touch, so command callbacks can
+be driven directly without a gateway connection.
+"""
+
+import os
+import itertools
+from GuildConfig import GuildConfig
+from HeartStore import HeartStore
+from Metrics import Metrics
+from Dispatcher import Dispatcher
+from Scheduler import Scheduler
+
+_ids = itertools.count(1)
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.bot = False
+
+    def __str__(self):
+        return self.name
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+
+class FakeMessage:
+    def __init__(self, channel, content=None, embed=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.jump_url = f"https://discord.com/channels/0/{channel.id}/{self.id}"
+
+
+class FakeChannel:
+    """Records messages instead of sending them"""
+
+    def __init__(self, channel_id, guild=None):
+        self.id = channel_id
+        self.guild = guild
+        self.mention = f"<#{channel_id}>"
+        self.sent = 0
+        self.last_message = None
+
+    async def send(self, content=None, *, embed=None, **kwargs):
+        self.sent += 1
+        self.last_message = FakeMessage(self, content, embed)
+        return self.last_message
+
+
+class FakeContext:
+    def __init__(self, author, channel, guild=None):
+        self.author = author
+        self.channel = channel
+        self.guild = guild
+        self.command = None
+        self.invoked_subcommand = None
+        self.interaction = None
+        self.prefix = self.clean_prefix = "!"
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeBot:
+    """Just the parts of BroLarryBot the cogs rely on"""
+
+    def __init__(self, data_dir, user_hearts=None):
+        self.data_dir = data_dir
+        self.user_hearts = user_hearts if user_hearts is not None else HeartStore()
+        self.guild_config = GuildConfig(os.path.join(data_dir, "guild_config.json"))
+        self.scheduler = Scheduler(os.path.join(data_dir, "scheduler.json"))
+        self.metrics = Metrics()
+        # No cooldowns or pacing, so the benchmarks measure the commands
+        self.dispatcher = Dispatcher(self.metrics, user_rate=None, command_rate=None, rate=None)
+        self.channels = {}
+        # One process running every shard
+        self.shared_state = False
+
+    def runs_guild(self, guild_id):
+        return True
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_partial_messageable(self, channel_id, *, guild_id=None, type=None):
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            channel = self.channels[channel_id] = FakeChannel(channel_id)
+        return channel
+
+    async def wait_until_ready(self):
+        return
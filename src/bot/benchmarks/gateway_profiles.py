@@ -0,0 +1,140 @@
+"""
+Memory and startup cost of the "default" and "lean" runtime profiles.
+
+A local stand-in gateway feeds discord.py's connection state the payloads a
+real connection would deliver for large synthetic guilds: GUILD_CREATE with
+the initial member list, the member chunks requested at startup when the
+profile chunks guilds, and a burst of MESSAGE_CREATE traffic when the intents
+ask for it. Time to process and memory retained (tracemalloc) are reported for
+each profile.
+
+    python -m benchmarks.gateway_profiles --guilds 20 --members 20000 --messages 5000
+"""
+
+import gc
+import time
+import asyncio
+import argparse
+import tracemalloc
+import discord
+from discord.member import Member
+from RuntimeProfile import PROFILES, client_options
+
+BOT_ID = 1
+
+
+def user_payload(user_id):
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "avatar": None, "global_name": None}
+
+
+def member_payload(user_id=None):
+    payload = {"roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0}
+    if user_id is not None:
+        payload["user"] = user_payload(user_id)
+    return payload
+
+
+def guild_payload(guild_id, members, initial_members):
+    first_member = guild_id * 10_000_000
+    return {
+        "id": str(guild_id),
+        "name": f"guild{guild_id}",
+        "owner_id": str(first_member),
+        "member_count": members,
+        "large": True,
+        "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0}],
+        "channels": [
+            {"id": str(guild_id * 100 + index), "type": 0, "name": f"channel{index}", "position": index}
+            for index in range(5)
+        ],
+        "members": [member_payload(BOT_ID)]
+        + [member_payload(first_member + index) for index in range(initial_members)],
+        "presences": [],
+        "voice_states": [],
+        "threads": [],
+        "stage_instances": [],
+        "guild_scheduled_events": [],
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+    }
+
+
+def message_payload(guild_id, message_id, author_id):
+    return {
+        "id": str(message_id),
+        "channel_id": str(guild_id * 100),
+        "guild_id": str(guild_id),
+        "author": user_payload(author_id),
+        "member": member_payload(),
+        "content": "!heart status",
+        "timestamp": "2024-01-01T00:00:00+00:00",
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+
+def replay(state, args):
+    """Replay the startup traffic for every synthetic guild into ``state``"""
+    # Message events are only sent to clients that asked for them
+    messages = args.messages if state._intents.guild_messages else 0
+    message_id = 1
+    for guild_id in range(1, args.guilds + 1):
+        guild = state._get_create_guild(guild_payload(guild_id, args.members, args.initial_members))
+
+        # What the chunk request at startup would add to the cache
+        if state._guild_needs_chunking(guild):
+            first_member = guild_id * 10_000_000
+            for index in range(args.members):
+                guild._add_member(Member(data=member_payload(first_member + index), guild=guild, state=state))
+
+        for _ in range(messages):
+            state.parse_message_create(message_payload(guild_id, message_id, guild_id * 10_000_000 + message_id % 500))
+            message_id += 1
+
+
+async def bench(profile, args):
+    options = client_options(profile, "cogs", args.prefix_commands)
+    client = discord.Client(**options)
+    state = client._connection
+    state.user = discord.ClientUser(state=state, data=user_payload(BOT_ID))
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    replay(state, args)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    members = sum(len(guild.members) for guild in state.guilds)
+    print(
+        f"{profile:<8} intents {options['intents'].value:>9}  members cached {members:>10,}  "
+        f"messages cached {len(state._messages or []):>6,}  "
+        f"{elapsed:>7.2f} s  {retained / 2**20:>8.1f} MiB"
+    )
+    await client.close()
+
+
+async def main(args):
+    for profile in PROFILES:
+        await bench(profile, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--members", type=int, default=20_000, help="members per guild")
+    parser.add_argument("--initial-members", type=int, default=100, help="members sent in GUILD_CREATE")
+    parser.add_argument("--messages", type=int, default=5_000, help="messages per guild")
+    parser.add_argument("--prefix-commands", action="store_true", help="request the intents prefix commands need")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""
+Memory per user for the heart store, measured with tracemalloc.
+
+Compares the old ``HeartSanctifier`` (``__dict__``, a list and a datetime per
+user, never evicted) against the slotted heart with idle eviction. Only the
+``--active`` fraction of users hold a non-default heart at sweep time.
+
+    python -m benchmarks.heart_memory --users 1000000 --active 0.05
+"""
+
+import gc
+import random
+import asyncio
+import argparse
+import tracemalloc
+from datetime import datetime, time
+from HeartStore import HeartStore
+from HeartReset import ResetSchedule
+
+
+class LegacyHeartSanctifier:
+    """HeartSanctifier as it was before the compact representation"""
+
+    def __init__(self):
+        self.heart = ["Worldly Distractions"]
+        self.presence_of_god = False
+        self.last_reset = None
+
+    def reset_heart(self):
+        self.heart = ["Worldly Distractions"]
+        self.presence_of_god = False
+        self.last_reset = datetime.now()
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return kept, after - before
+
+
+def build_legacy(users, active_users):
+    hearts = {}
+    for user_id in range(users):
+        heart = hearts[user_id] = LegacyHeartSanctifier()
+        heart.reset_heart()
+    for user_id in active_users:
+        hearts[user_id].heart.insert(0, "phone notifications")
+    return hearts
+
+
+def build_store(users, active_users, evict):
+    async def build():
+        store = HeartStore()
+        store.reset_schedule = ResetSchedule([time(6, 0), time(12, 0), time(18, 0)])
+        for user_id in range(users):
+            await store.get(user_id)
+        for user_id in active_users:
+            heart = await store.get(user_id)
+            heart.add_distraction("phone notifications")
+            store.mark_dirty(user_id)
+        if evict:
+            store.evict_idle()
+        return store
+
+    return asyncio.run(build())
+
+
+def report(name, users, kept, size):
+    print(f"{name:<24} {len(kept):>10,} resident   {size / 2**20:>9.1f} MiB   {size / users:>7.1f} B/user")
+
+
+def main(args):
+    random.seed(args.seed)
+    active_users = random.sample(range(args.users), int(args.users * args.active))
+
+    kept, size = measure(lambda: build_legacy(args.users, active_users))
+    report("legacy dict", args.users, kept, size)
+    del kept
+
+    kept, size = measure(lambda: build_store(args.users, active_users, evict=False))
+    report("slotted, no eviction", args.users, kept, size)
+    del kept
+
+    kept, size = measure(lambda: build_store(args.users, active_users, evict=True))
+    report("slotted + eviction", args.users, kept, size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--active", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=54)
+    main(parser.parse_args())
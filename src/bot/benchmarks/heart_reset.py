@@ -0,0 +1,94 @@
+"""
+Heart reset sweep: the old 30-minute full scan versus the boundary index.
+
+The old task called ``should_reset_heart`` on every heart each tick. The
+store now only visits hearts that changed since their last reset, so the
+cost of a tick follows activity rather than the number of users.
+
+    python -m benchmarks.heart_reset --users 10000 100000 1000000 --active 0.01
+"""
+
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, time as dt_time, timedelta
+from HeartStore import HeartStore
+from HeartReset import ResetSchedule
+
+RESET_TIMES = [dt_time(6, 0), dt_time(12, 0), dt_time(18, 0)]
+
+
+def legacy_should_reset_heart(heart, reset_times):
+    """The check heart_reset_task used to run for every heart"""
+    now = datetime.now()
+    current_time = now.time()
+
+    if not heart.last_reset:
+        return True
+
+    # Hearts kept a datetime then; they keep epoch seconds now
+    last_reset = datetime.fromtimestamp(heart.last_reset)
+    if now.date() > last_reset.date():
+        return True
+
+    last_reset_time = last_reset.time()
+    for reset_time in reset_times:
+        if current_time >= reset_time and last_reset_time < reset_time:
+            return True
+
+    return False
+
+
+async def populate(users, active):
+    store = HeartStore()
+    store.reset_schedule = ResetSchedule(RESET_TIMES)
+    for user_id in range(users):
+        await store.get(user_id)
+    for user_id in random.sample(range(users), int(users * active)):
+        heart = await store.get(user_id)
+        heart.surrender()
+        store.mark_dirty(user_id)
+    return store
+
+
+async def bench(users, active):
+    store = await populate(users, active)
+
+    start = time.perf_counter()
+    for user_id, heart in store.items():
+        legacy_should_reset_heart(heart, RESET_TIMES)
+    legacy = time.perf_counter() - start
+
+    # The untouched hearts populate created are dropped by the first sweep;
+    # time that apart so the indexed figure is the steady state tick
+    start = time.perf_counter()
+    evicted = store.evict_idle()
+    eviction = time.perf_counter() - start
+
+    # Sweep as the task does when it wakes just after the next boundary
+    boundary = store.reset_schedule.next_boundary(datetime.now())
+    start = time.perf_counter()
+    reset = store.reset_due(boundary + timedelta(microseconds=1))
+    indexed = time.perf_counter() - start
+
+    print(
+        f"{users:>9,} hearts ({len(reset):>7,} due)   "
+        f"full scan {legacy * 1e3:>9.2f} ms   indexed {indexed * 1e3:>8.2f} ms   "
+        f"{legacy / max(indexed, 1e-9):>8.1f}x   "
+        f"(first sweep also evicts {evicted:,} idle in {eviction * 1e3:.2f} ms)"
+    )
+
+
+async def main(args):
+    random.seed(args.seed)
+    for users in args.users:
+        await bench(users, args.active)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--active", type=float, default=0.01, help="fraction of hearts changed since the last reset")
+    parser.add_argument("--seed", type=int, default=54)
+    asyncio.run(main(parser.parse_args()))
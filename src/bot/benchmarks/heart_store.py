@@ -0,0 +1,69 @@
+"""
+Command latency with the SQLite heart store versus the in-memory dict.
+
+Each simulated command looks up a heart, surrenders it and marks it dirty,
+which is what ``!heart surrender`` does minus the Discord round trip.
+
+    python -m benchmarks.heart_store --users 10000 --commands 100000
+"""
+
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+import os
+from HeartStore import HeartStore, SQLiteHeartStore
+
+
+async def run_commands(store, users, commands):
+    latencies = []
+    for _ in range(commands):
+        user_id = random.randrange(users)
+        start = time.perf_counter()
+        heart = await store.get(user_id)
+        heart.surrender()
+        store.mark_dirty(user_id)
+        latencies.append(time.perf_counter() - start)
+        # Yield like a real command would, letting the flush task run
+        await asyncio.sleep(0)
+    return latencies
+
+
+def report(name, latencies, elapsed):
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    print(f"{name:<16} {len(latencies) / elapsed:>12,.0f} cmd/s   p50 {p50:>8.1f} us   p99 {p99:>8.1f} us")
+
+
+async def bench(store, name, users, commands):
+    store.start()
+    start = time.perf_counter()
+    latencies = await run_commands(store, users, commands)
+    elapsed = time.perf_counter() - start
+    await store.close()
+    report(name, latencies, elapsed)
+
+
+async def main(args):
+    random.seed(args.seed)
+    await bench(HeartStore(), "dict", args.users, args.commands)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "hearts.sqlite3")
+        random.seed(args.seed)
+        await bench(SQLiteHeartStore(path, args.flush_interval), "sqlite (cold)", args.users, args.commands)
+        # Second pass reads every heart back from disk on first access
+        random.seed(args.seed)
+        await bench(SQLiteHeartStore(path, args.flush_interval), "sqlite (reload)", args.users, args.commands)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--commands", type=int, default=100_000)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=54)
+    asyncio.run(main(parser.parse_args()))
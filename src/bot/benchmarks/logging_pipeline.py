@@ -0,0 +1,120 @@
+"""
+Event loop time spent logging, writing directly to a stream against the queue pipeline.
+
+``--commands`` command completions are logged from the event loop, ``--concurrent``
+at a time, to a stream that blocks for ``--write-latency`` seconds per write
+like a busy pipe or container log driver. Reported per mode: time each log
+call held the loop, the loop's scheduling lag meanwhile, and how many records
+were written, sampled out (``--sample``) or dropped.
+
+    python -m benchmarks.logging_pipeline --commands 5000 --write-latency 0.0005
+"""
+
+import io
+import time
+import random
+import asyncio
+import argparse
+import logging
+from types import SimpleNamespace
+from LogPipeline import JsonFormatter, LogPipeline, get_logger
+from benchmarks.suite import percentile
+
+
+class SlowStream(io.StringIO):
+    """A stream whose writes block, as stdout does when its reader falls behind"""
+
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+        self.lines = 0
+
+    def write(self, text):
+        time.sleep(self.latency)
+        self.lines += text.count("\n")
+        return len(text)
+
+
+def command_fields():
+    return {
+        "event": "command",
+        "command": random.choice(["heart surrender", "distraction add", "devotional today"]),
+        "guild_id": random.randrange(1000),
+        "user_id": random.randrange(100000),
+        "latency_ms": round(random.uniform(1, 20), 2),
+        "outcome": "success",
+        "slash": True,
+    }
+
+
+async def measure_lag(stop, lags):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def bench(mode, args):
+    stream = SlowStream(args.write_latency)
+    root = logging.getLogger()
+    pipeline = None
+    if mode == "direct":
+        # What the bot did before: a StreamHandler writing on the caller's thread
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        root.handlers = [handler]
+        root.setLevel(logging.INFO)
+    else:
+        rates = {"command": args.sample} if mode == "sampled" else {}
+        pipeline = LogPipeline(logging.INFO, sample_rates=rates, queue_size=args.queue_size, stream=stream)
+        pipeline.start()
+
+    logger = get_logger("benchmarks")
+    calls = []
+    lags = []
+    stop = asyncio.Event()
+    lag_task = asyncio.ensure_future(measure_lag(stop, lags))
+    semaphore = asyncio.Semaphore(args.concurrent)
+
+    async def command(index):
+        async with semaphore:
+            await asyncio.sleep(0)
+            author = SimpleNamespace(id=index, name=f"user{index}")
+            start = time.perf_counter()
+            logger.info(f"Executed command by {author.name} ({author.id})", extra=command_fields())
+            calls.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(command(index) for index in range(args.commands)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await lag_task
+
+    sampled = dropped = 0
+    if pipeline is not None:
+        pipeline.stop()
+        sampled, dropped = pipeline.sampler.sampled_out, pipeline.handler.dropped
+    calls.sort()
+    lags.sort()
+    print(
+        f"{mode:<8} log call p50 {percentile(calls, 0.5) * 1e6:>7.1f} us p99 {percentile(calls, 0.99) * 1e6:>7.1f} us  "
+        f"loop lag p99 {percentile(lags, 0.99) * 1e3:>7.2f} ms max {lags[-1] * 1e3:>7.2f} ms  "
+        f"{stream.lines:>6,} written {sampled:>6,} sampled {dropped:>6,} dropped  in {elapsed:.2f} s"
+    )
+
+
+async def main(args):
+    random.seed(args.seed)
+    for mode in ("direct", "queued", "sampled"):
+        await bench(mode, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", type=int, default=5000)
+    parser.add_argument("--concurrent", type=int, default=50)
+    parser.add_argument("--write-latency", type=float, default=0.0005, help="seconds each write blocks")
+    parser.add_argument("--sample", type=float, default=0.1, help="share of command records kept when sampled")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=54)
+    asyncio.run(main(parser.parse_args()))
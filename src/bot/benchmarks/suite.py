@@ -0,0 +1,191 @@
+"""
+Offline load benchmarks for the cogs.
+
+Drives the command callbacks of HeartSanctifierCog, DistractionCog and
+DailyDevotional with fake ctx/bot objects (no network) and records throughput
+and latency percentiles. Results are written as JSON so runs from different
+releases can be compared.
+
+    python -m benchmarks.suite --users 1000 100000 --iterations 20000 --output bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timedelta
+import discord
+from HeartStore import HeartStore, SQLiteHeartStore
+from cogs.HeartCog import HeartSanctifierCog
+from cogs.DistractionCog import DistractionCog
+from cogs.DailyDevotional import DailyDevotional
+from benchmarks.fakes import FakeBot, FakeChannel, FakeContext, FakeGuild, FakeUser
+
+DISTRACTIONS = ["phone notifications", "worried about work", "email", "news", "what's for dinner"]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(name, users, latencies, elapsed):
+    latencies.sort()
+    return {
+        "scenario": name,
+        "users": users,
+        "operations": len(latencies),
+        "elapsed_s": elapsed,
+        "throughput_ops": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_us": sum(latencies) / len(latencies) * 1e6 if latencies else 0.0,
+        "p50_us": percentile(latencies, 0.50) * 1e6,
+        "p99_us": percentile(latencies, 0.99) * 1e6,
+        "max_us": latencies[-1] * 1e6 if latencies else 0.0,
+    }
+
+
+async def drive(name, users, iterations, make_call, finish=None):
+    """
+    Run ``iterations`` commands from random users and time each one; ``finish``
+    is awaited before the clock stops, so saving what they wrote is counted too
+    """
+    guild = FakeGuild(1)
+    contexts = {}
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        user_id = random.randrange(users)
+        ctx = contexts.get(user_id)
+        if ctx is None:
+            # A channel each, so replies in one don't affect another's
+            ctx = contexts[user_id] = FakeContext(FakeUser(user_id), FakeChannel(user_id, guild), guild)
+        call = make_call(ctx)
+        began = time.perf_counter()
+        await call
+        latencies.append(time.perf_counter() - began)
+    if finish is not None:
+        await finish()
+    return summarize(name, users, latencies, time.perf_counter() - start)
+
+
+async def bench_reset_sweep(store, users, active):
+    """Time one reset sweep with ``active`` of the users changed since the last boundary"""
+    for user_id in random.sample(range(users), int(users * active)):
+        heart = await store.get(user_id)
+        heart.add_distraction("email")
+        store.mark_dirty(user_id)
+    boundary = store.reset_schedule.next_boundary(datetime.now())
+    began = time.perf_counter()
+    reset = store.reset_due(boundary + timedelta(microseconds=1))
+    elapsed = time.perf_counter() - began
+    result = summarize("reset_sweep", users, [elapsed], elapsed)
+    result["hearts_reset"] = len(reset)
+    return result
+
+
+async def run_for_users(args, users, data_dir):
+    if args.store == "sqlite":
+        store = SQLiteHeartStore(os.path.join(data_dir, f"hearts-{users}.sqlite3"), args.flush_interval)
+    else:
+        store = HeartStore()
+    store.start()
+
+    # The cogs' own databases start empty for each user count
+    bot_dir = os.path.join(data_dir, f"bot-{users}")
+    os.makedirs(bot_dir)
+    bot = FakeBot(bot_dir, store)
+    heart_cog = HeartSanctifierCog(bot)
+    distraction_cog = DistractionCog(bot)
+    await distraction_cog.cog_load()
+    devotional_cog = DailyDevotional(bot)
+    await devotional_cog.cog_load()
+    # Measure building and sending the devotional, not linking to the last post
+    devotional_cog.coalesce_window = 0
+
+    results = [
+        await drive(
+            "heart_surrender", users, args.iterations, lambda ctx: heart_cog.surrender.callback(heart_cog, ctx)
+        ),
+        await drive(
+            "heart_status", users, args.iterations, lambda ctx: heart_cog.heart_status.callback(heart_cog, ctx)
+        ),
+        await drive(
+            "distraction_add",
+            users,
+            args.iterations,
+            lambda ctx: distraction_cog.add_distraction.callback(
+                distraction_cog, ctx, distraction=random.choice(DISTRACTIONS)
+            ),
+            # Write out the journal and stats the way an unload or shutdown does
+            finish=distraction_cog.cog_unload,
+        ),
+        await drive(
+            "devotional",
+            users,
+            args.iterations,
+            lambda ctx: devotional_cog.manual_devotional.callback(devotional_cog, ctx),
+        ),
+        await bench_reset_sweep(store, users, args.active),
+    ]
+
+    await store.close()
+    return results
+
+
+async def main(args):
+    random.seed(args.seed)
+    # The cogs log on load; keep the output to the results
+    logging.disable(logging.WARNING)
+
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        for users in args.users:
+            for result in await run_for_users(args, users, data_dir):
+                result["store"] = args.store
+                results.append(result)
+                print(
+                    f"{result['scenario']:<16} {users:>9,} users  {result['throughput_ops']:>12,.0f} ops/s  "
+                    f"p50 {result['p50_us']:>9.1f} us  p99 {result['p99_us']:>9.1f} us",
+                    file=sys.stderr,
+                )
+
+    report = {
+        "version": os.getenv("VERSION", "development"),
+        "timestamp": datetime.now().astimezone().isoformat(),
+        "python": platform.python_version(),
+        "discord_py": discord.__version__,
+        "platform": f"{platform.system()} {platform.release()}",
+        "parameters": {
+            "iterations": args.iterations,
+            "store": args.store,
+            "active": args.active,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--iterations", type=int, default=20_000, help="commands per scenario")
+    parser.add_argument("--store", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--flush-interval", type=float, default=1.0)
+    parser.add_argument("--active", type=float, default=0.01, help="fraction of users changed before the reset sweep")
+    parser.add_argument("--seed", type=int, default=54)
+    parser.add_argument("--output", default="-", help="JSON output path, - for stdout")
+    asyncio.run(main(parser.parse_args()))
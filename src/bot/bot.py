@@ -1,63 +1,149 @@
-import os
-import discord
-import logging
-import platform
-from typing import Dict
-from HeartSanctifier import HeartSanctifier
-from discord.ext import commands
+import time
+
+# Taken first so the startup report covers importing discord.py too
+process_started = time.perf_counter()
+
+import os  # noqa: E402
+import json  # noqa: E402
+import asyncio  # noqa: E402
+import hashlib  # noqa: E402
+import math  # noqa: E402
+import discord  # noqa: E402
+import platform  # noqa: E402
+from typing import Optional  # noqa: E402
+from HeartStore import HeartStore, create_heart_store  # noqa: E402
+from GuildConfig import GuildConfig, create_guild_config  # noqa: E402
+from Scheduler import JobClaims, Scheduler  # noqa: E402
+from Metrics import Metrics  # noqa: E402
+from Dispatcher import Dispatcher, create_dispatcher  # noqa: E402
+from RuntimeProfile import client_options, shard_options, use_endpoints  # noqa: E402
+from LogPipeline import LogPipeline, get_logger, parse_level, parse_sample_rates  # noqa: E402
+from discord.ext import commands  # noqa: E402
 
 bot_token = os.getenv("DISCORD_TOKEN")
-log_level = os.getenv("LOG_LEVEL", logging.NOTSET)
+log_level = parse_level(os.getenv("LOG_LEVEL"))
+# "json" for one JSON object per line, "text" for plain lines
+log_format = os.getenv("LOG_FORMAT", "json").lower()
+# Share of records to keep per event, e.g. "command=0.1" for successful commands
+log_sample_rates = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES"))
 version = os.getenv("VERSION", "development")
-
-"""
-https://discordpy.readthedocs.io/en/latest/intents.html
-https://discordpy.readthedocs.io/en/latest/intents.html#privileged-intents
-"""
-intents = discord.Intents.default()
-intents.members = True
-intents.messages = True
-intents.message_content = True
+data_dir = os.getenv("DATA_DIR", "data")
+metrics_port = int(os.getenv("METRICS_PORT", 0))
+metrics_host = os.getenv("METRICS_HOST", "127.0.0.1")
+bot_profile = os.getenv("BOT_PROFILE", "default")
+# "!" commands need the message_content intent, so they are opt-in
+prefix_commands = os.getenv("PREFIX_COMMANDS", "false").lower() in ("1", "true", "yes")
+# Shards this process runs, e.g. "0-3", out of SHARD_COUNT across every worker;
+# unset runs every shard Discord recommends in this one process
+shard_ids = os.getenv("SHARD_IDS")
+shard_count = os.getenv("SHARD_COUNT")
+# Only for load tests against a stand-in Discord such as benchmarks.fake_discord
+discord_api_base = os.getenv("DISCORD_API_BASE")
+discord_gateway_url = os.getenv("DISCORD_GATEWAY_URL")
+cogs_dir = os.path.join(os.path.realpath(os.path.dirname(__file__)), "cogs")
 
 
-class BroLarryBot(commands.Bot):
+class BroLarryBot(commands.AutoShardedBot):
     def _setupLogger(self, level):
         """
-        logging.NOTSET=0
-        logging.DEBUG=10
-        logging.INFO=20
-        logging.WARNING=30
-        logging.ERROR=40
-        logging.CRITICAL=50
-        logging.FATAL=50
+        Route every logger, discord.py's included, through a queue to a
+        thread that writes them, so a slow stdout never stalls the event loop
         """
-        self.logger = logging.getLogger("bro-larry-bot")
-        self.logger.setLevel(int(level))
-        console_handler = logging.StreamHandler()
-        self.logger.addHandler(console_handler)
+        self.log_pipeline = LogPipeline(level, json_output=log_format != "text", sample_rates=log_sample_rates)
+        self.log_pipeline.start()
+        self.logger = get_logger()
 
     def __init__(self, logLevel, verison, *args, **kwargs) -> None:
-        super().__init__(command_prefix="!", intents=intents)
+        # With "!" commands off the bot doesn't receive message events at all,
+        # so there is no prefix to match and commands are slash commands only
+        super().__init__(
+            command_prefix="!" if prefix_commands else [],
+            **client_options(bot_profile, cogs_dir, prefix_commands),
+            **shard_options(shard_ids, shard_count),
+        )
         self._setupLogger(logLevel)
+        use_endpoints(discord_api_base, discord_gateway_url)
         self.version = version
+        # Where the bot and its cogs keep everything they save
+        self.data_dir = data_dir
+        # Workers running the other shards share DATA_DIR, so whatever they
+        # all read or write lives in SQLite databases there
+        self.shared_state = self.shard_ids is not None
         # Store individual HeartSanctifier instances for each user
-        self.user_hearts: Dict[int, HeartSanctifier] = {}
+        self.user_hearts: HeartStore = create_heart_store(shared=self.shared_state)
+        # Per-guild settings such as the devotional channel
+        self.guild_config: GuildConfig = create_guild_config(self.data_dir, shared=self.shared_state)
+        # Shared timer for the cogs' recurring jobs; each run is made by one worker
+        claims = JobClaims(os.path.join(self.data_dir, "job_runs.sqlite3")) if self.shared_state else None
+        self.scheduler = Scheduler(os.path.join(self.data_dir, "scheduler.json"), claims)
+        self.metrics = Metrics()
+        self.metrics.gauge("bot_user_hearts", "Hearts held in memory", lambda: len(self.user_hearts))
+        self.metrics.gauge("bot_log_records_dropped", "Log records not written, by reason", self.log_pipeline.counts)
+        self.metrics.gauge(
+            "bot_scheduled_job_duration_seconds",
+            "Duration of the last run of each scheduled job",
+            lambda: {(("job", job.name),): job.last_duration for job in self.scheduler.jobs.values()},
+        )
+        # Every message the bot sends goes through here
+        self.dispatcher: Dispatcher = create_dispatcher(self.metrics)
+        self.before_invoke(self._before_command)
+        # Seconds from process start at which each startup phase finished
+        self.startup_phases = {"init": time.perf_counter() - process_started}
+        self._startup_reported = False
+        self._avatar_task = None
+        self._sync_task = None
+
+    def _mark_phase(self, phase: str) -> None:
+        self.startup_phases[phase] = time.perf_counter() - process_started
+
+    def runs_guild(self, guild_id: Optional[int]) -> bool:
+        """Whether this process runs the shard a server is on"""
+        if self.shard_ids is None:
+            return True
+        return guild_id is not None and (guild_id >> 22) % self.shard_count in self.shard_ids
+
+    @staticmethod
+    def _read_avatar(avatar_path, hash_path):
+        with open(avatar_path, "rb") as avatar_file:
+            avatar_data = avatar_file.read()
+        return avatar_data, hashlib.sha256(avatar_data).hexdigest(), BroLarryBot._read_hash(hash_path)
+
+    @staticmethod
+    def _read_hash(hash_path):
+        try:
+            with open(hash_path, "r", encoding="utf-8") as hash_file:
+                return hash_file.read().strip()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_hash(hash_path, value):
+        os.makedirs(os.path.dirname(hash_path) or ".", exist_ok=True)
+        with open(hash_path, "w", encoding="utf-8") as hash_file:
+            hash_file.write(value)
 
     async def _set_default_avatar(self) -> None:
         """
-        Set the bot's avatar to bro_larry.JPG if it exists
+        Set the bot's avatar to bro_larry.JPG if it exists and changed since the last upload
         """
         try:
             # Get the directory where the bot.py file is located
             bot_dir = os.path.dirname(os.path.realpath(__file__))
             avatar_path = os.path.join(bot_dir, "bro_larry.JPG")
-            
+            hash_path = os.path.join(self.data_dir, "avatar.sha256")
+
             # Check if the avatar file exists
             if os.path.exists(avatar_path):
-                with open(avatar_path, 'rb') as avatar_file:
-                    avatar_data = avatar_file.read()
-                    await self.user.edit(avatar=avatar_data)
-                    self.logger.info("Successfully set bot avatar to bro_larry.JPG")
+                avatar_data, avatar_hash, uploaded_hash = await asyncio.to_thread(
+                    self._read_avatar, avatar_path, hash_path
+                )
+                # Uploading is rate limited, so skip it when nothing changed
+                if avatar_hash == uploaded_hash:
+                    self.logger.info("Bot avatar already up to date")
+                    return
+                await self.user.edit(avatar=avatar_data)
+                await asyncio.to_thread(self._write_hash, hash_path, avatar_hash)
+                self.logger.info("Successfully set bot avatar to bro_larry.JPG")
             else:
                 self.logger.warning(f"Avatar file not found at: {avatar_path}")
         except discord.HTTPException as e:
@@ -65,16 +151,46 @@ class BroLarryBot(commands.Bot):
         except Exception as e:
             self.logger.error(f"Failed to set bot avatar: {e}")
 
+    def _command_tree_hash(self) -> str:
+        """Hash of the application command definitions Discord would be sent"""
+        definitions = sorted(
+            (command.to_dict(self.tree) for command in self.tree.get_commands()), key=lambda command: command["name"]
+        )
+        return hashlib.sha256(json.dumps(definitions, sort_keys=True).encode("utf-8")).hexdigest()
+
+    async def _sync_commands(self) -> None:
+        """
+        Sync the slash commands with Discord if their definitions changed since the last sync
+        """
+        try:
+            hash_path = os.path.join(self.data_dir, "command_tree.sha256")
+            tree_hash = self._command_tree_hash()
+            # Syncing is heavily rate limited and every restart would otherwise
+            # resend the same definitions
+            if tree_hash == await asyncio.to_thread(self._read_hash, hash_path):
+                self.logger.info("Slash commands already up to date")
+                return
+            synced = await self.tree.sync()
+            await asyncio.to_thread(self._write_hash, hash_path, tree_hash)
+            self.logger.info(f"Synced {len(synced)} slash commands")
+        except discord.HTTPException as e:
+            self.logger.error(f"Failed to sync slash commands due to Discord API error: {e}")
+        except Exception as e:
+            self.logger.error(f"Failed to sync slash commands: {e}")
+
+    async def _load_cog(self, extension: str) -> None:
+        started = time.perf_counter()
+        try:
+            await self.load_extension(f"cogs.{extension}")
+            self.logger.info(f"Loaded extension '{extension}' in {(time.perf_counter() - started) * 1000:.0f} ms")
+        except Exception as e:
+            exception = f"{type(e).__name__}: {e}"
+            self.logger.error(f"Failed to load extension {extension}\n{exception}")
+
     async def load_cogs(self) -> None:
-        for file in os.listdir(f"{os.path.realpath(os.path.dirname(__file__))}/cogs"):
-            if file.endswith(".py"):
-                extension = file[:-3]
-                try:
-                    await self.load_extension(f"cogs.{extension}")
-                    self.logger.info(f"Loaded extension '{extension}")
-                except Exception as e:
-                    exception = f"{type(e).__name__}: {e}"
-                    self.logger.error(f"Failed to load extension {extension}\n{exception}")
+        # The cogs don't depend on each other, so load them concurrently
+        files = os.listdir(cogs_dir)
+        await asyncio.gather(*(self._load_cog(file[:-3]) for file in sorted(files) if file.endswith(".py")))
 
     async def setup_hook(self) -> None:
         """
@@ -85,34 +201,135 @@ class BroLarryBot(commands.Bot):
         self.logger.info(f"Python version: {platform.python_version()}")
         self.logger.info(f"bro-larry-bot version {self.version}")
         self.logger.info(f"Running on: {platform.system()} {platform.release()} ({os.name})")
+        if self.shared_state:
+            self.logger.info(f"Running shards {shard_ids} of {self.shard_count}")
         self.logger.info("-------------------")
-        
-        # Set the default avatar
-        await self._set_default_avatar()
-        
-        # Load cogs
+        self._mark_phase("login")
+
+        await self.metrics.start(metrics_port, metrics_host)
+        await asyncio.gather(self.guild_config.load(), self.scheduler.load())
+        self.scheduler.start()
+
+        # Start writing heart changes in the background
+        self.user_hearts.start()
+        self._mark_phase("state")
+
+        # Set the default avatar in the background so it never holds up the
+        # gateway connection
+        self._avatar_task = asyncio.ensure_future(self._set_default_avatar())
+        self._avatar_task.add_done_callback(lambda _: self._mark_phase("avatar"))
+
         await self.load_cogs()
+        self._mark_phase("cogs")
+
+        self._sync_task = asyncio.ensure_future(self._sync_commands())
+
+    async def on_shard_ready(self, shard_id: int) -> None:
+        self.logger.info(f"Shard {shard_id} is ready")
+
+    async def on_ready(self) -> None:
+        """
+        Executed when every shard's gateway connection is ready; logs the startup report once
+        """
+        if self._startup_reported:
+            return
+        self._startup_reported = True
+        self._mark_phase("ready")
+
+        report = []
+        previous = 0.0
+        for phase, finished in sorted(self.startup_phases.items(), key=lambda item: item[1]):
+            report.append(f"{phase} +{finished - previous:.2f}s")
+            previous = finished
+        self.logger.info(f"Startup took {previous:.2f}s: {', '.join(report)}")
+
+    async def close(self) -> None:
+        """
+        Flush heart state before shutting down.
+        """
+        self.scheduler.stop()
+        self.dispatcher.close()
+        await self.metrics.stop()
+        try:
+            await self.user_hearts.close()
+        except Exception as e:
+            self.logger.error(f"Failed to flush heart store on shutdown: {e}")
+        await super().close()
+
+    async def _before_command(self, ctx) -> None:
+        """
+        Executed before every command; refuses it if its author is on cooldown
+        """
+        ctx.started_at = time.perf_counter()
+        self.dispatcher.check_cooldown(ctx)
+
+    def _command_latency(self, ctx):
+        started_at = getattr(ctx, "started_at", None)
+        return time.perf_counter() - started_at if started_at is not None else None
+
+    @staticmethod
+    def _command_fields(ctx, event, command, latency, outcome):
+        """Structured fields for a command's log record"""
+        return {
+            "event": event,
+            "command": command,
+            "guild_id": ctx.guild.id if ctx.guild else None,
+            "user_id": ctx.author.id,
+            "latency_ms": round(latency * 1000, 2) if latency is not None else None,
+            "outcome": outcome,
+            "slash": ctx.interaction is not None,
+        }
 
     async def on_command_completion(self, ctx) -> None:
         """
         Executed on successful command
         """
         full_name = ctx.command.qualified_name
-        split = full_name.split(" ")
-        command = str(split[0])
-        self.logger.info(f"Executed {command} command by {ctx.author} ({ctx.author.id})")
+        latency = self._command_latency(ctx)
+        self.metrics.observe_command(full_name, latency, "success")
+        self.logger.info(
+            f"Executed {full_name} command by {ctx.author} ({ctx.author.id})",
+            extra=self._command_fields(ctx, "command", full_name, latency, "success"),
+        )
 
     async def on_command_error(self, ctx, err) -> None:
         """
         Executed on error in a command
         """
+        if ctx.command is None:
+            # Unknown command, nothing was invoked
+            self.metrics.commands.inc(command="unknown", outcome="not_found")
+            return
+
         full_name = ctx.command.qualified_name
-        split = full_name.split(" ")
-        command = str(split[0])
-        self.logger.warning(f"Error on {command} by {ctx.author} ({ctx.author.id}): {err}")
-        if not isinstance(err, commands.CheckFailure):
-            await ctx.send('James 3:2 "We all stumble in many ways...", even Bro Larry makes mistakes')
+        if isinstance(err, commands.CommandOnCooldown):
+            outcome = "cooldown"
+        elif isinstance(err, commands.CheckFailure):
+            outcome = "check_failure"
+        else:
+            outcome = "error"
+        latency = self._command_latency(ctx)
+        self.metrics.observe_command(full_name, latency, outcome)
+        self.logger.warning(
+            f"Error on {full_name} by {ctx.author} ({ctx.author.id}): {err}",
+            extra=self._command_fields(ctx, "command_error", full_name, latency, outcome),
+        )
+        if outcome == "cooldown":
+            await self.dispatcher.reply(
+                ctx, f"🕊️ Be still a moment, try again in {math.ceil(err.retry_after)}s.", ephemeral=True
+            )
+        elif outcome == "error":
+            await self.dispatcher.reply(
+                ctx, 'James 3:2 "We all stumble in many ways...", even Bro Larry makes mistakes', ephemeral=True
+            )
+        elif ctx.interaction is not None:
+            # A slash command has to be answered or Discord reports it as failed
+            await self.dispatcher.reply(ctx, "🙏 You can't use this command here.", ephemeral=True)
 
 
 bot = BroLarryBot(log_level, version)
-bot.run(bot_token)
\ No newline at end of file
+try:
+    # Logging is already set up; discord.py would add a handler writing to stderr directly
+    bot.run(bot_token, log_handler=None)
+finally:
+    bot.log_pipeline.stop()
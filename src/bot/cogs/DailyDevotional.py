@@ -1,58 +1,203 @@
 import discord
+from discord import app_commands
 from discord.ext import commands, tasks
+import asyncio
 import json
 import os
+import time
 import random
-from datetime import datetime
-import logging
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+from zoneinfo import available_timezones
+from DevotionalCorpus import DevotionalCorpus
+from CorpusRegistry import DEFAULT_CORPUS, CorpusRegistry
+from DevotionalSubscriptions import create_devotional_subscriptions, resolve_timezone
+from FanOut import FanOutSender
+from Scheduler import RecurringJob
+from LogPipeline import get_logger
+
+log = get_logger(__name__)
+
+# Number of pre-built embeds kept across corpora
+EMBED_CACHE_SIZE = 32
+
+_timezone_names = None
+
+
+async def timezone_autocomplete(interaction: discord.Interaction, current: str):
+    """Time zone names containing what the user has typed so far"""
+    global _timezone_names
+    if _timezone_names is None:
+        _timezone_names = sorted(available_timezones())
+    current = current.lower()
+    matches = [name for name in _timezone_names if current in name.lower()][:25]
+    return [app_commands.Choice(name=name, value=name) for name in matches]
+
+
+async def corpus_autocomplete(interaction: discord.Interaction, current: str):
+    """Devotional corpora whose names contain what the user has typed so far"""
+    cog = interaction.client.get_cog("DailyDevotional")
+    names = cog.corpora.names() if cog else []
+    return [app_commands.Choice(name=name, value=name) for name in names if current.lower() in name.lower()][:25]
 
 
 class DailyDevotional(commands.Cog):
+    required_intents = discord.Intents(guilds=True)
+
     def __init__(self, bot):
         self.bot = bot
-        self.devotional_data = []
+        self.corpus = DevotionalCorpus([])
+        self.embed_cache = OrderedDict()
         self.channel_id = os.getenv("Devotion_Channel")
-        self.load_devotional_data()
+        resource_dir = os.path.join(os.path.dirname(__file__), "..", "resource")
+        self.resources_path = os.path.join(resource_dir, "devotional_prompts.json")
+        # Other corpora (translations, other years) are loaded when a server
+        # first uses them, and only DEVOTIONAL_CORPUS_CACHE of them kept
+        self.corpora = CorpusRegistry(resource_dir, capacity=int(os.getenv("DEVOTIONAL_CORPUS_CACHE", 3)))
+        self._file_signature = None
+        self._reload_lock = asyncio.Lock()
+        # The dispatcher paces sends across channels, so no rate limit here
+        self.sender = FanOutSender(concurrency=int(os.getenv("DEVOTIONAL_SEND_CONCURRENCY", 10)), rate=None)
+        self.last_delivery_report = None
+        self.bot.metrics.gauge("bot_devotional_corpus_size", "Devotionals loaded", lambda: len(self.corpus))
+        self.bot.metrics.gauge(
+            "bot_devotional_corpora_resident", "Devotional corpora in memory", lambda: len(self.corpora)
+        )
 
-    def load_devotional_data(self):
-        """Load devotional prompts from JSON file"""
-        try:
-            # Get the path to the resources directory
-            resources_path = os.path.join(os.path.dirname(__file__), "..", "resource", "devotional_prompts.json")
+        # Channel ID -> (day, jump URL, monotonic time) of the last devotional
+        # posted there; repeat requests within the window get a link to it
+        self.recent_posts = {}
+        self.coalesce_window = float(os.getenv("DEVOTIONAL_COALESCE_WINDOW", 300))
+        # (channel ID, day) -> the send of that devotional still in flight
+        self._inflight = {}
+        self.coalesced = self.bot.metrics.counter(
+            "bot_devotional_coalesced_total", "Devotional requests answered without posting it again"
+        )
 
-            with open(resources_path, "r", encoding="utf-8") as file:
-                self.devotional_data = json.load(file)
+        # Post every day at DEVOTIONAL_POST_TIME, catching up if the bot was
+        # down at that time but came back within DEVOTIONAL_CATCH_UP_HOURS
+        self.post_time = datetime.strptime(os.getenv("DEVOTIONAL_POST_TIME", "09:00"), "%H:%M").time()
+        catch_up = timedelta(hours=float(os.getenv("DEVOTIONAL_CATCH_UP_HOURS", 3)))
+        self.bot.scheduler.add_job(
+            RecurringJob("daily-devotional", [self.post_time], self.daily_devotional_task, catch_up=catch_up)
+        )
 
-            logging.info(f"Loaded {len(self.devotional_data)} devotional prompts")
+        # Users who get the devotional by DM at their own local time
+        self.subscriptions = create_devotional_subscriptions(
+            self.bot.data_dir, catch_up=catch_up, shared=self.bot.shared_state
+        )
+        self.bot.metrics.gauge(
+            "bot_devotional_subscriptions", "Users subscribed to the devotional by DM", lambda: len(self.subscriptions)
+        )
+        self.dm_deliveries = self.bot.metrics.counter(
+            "bot_devotional_dm_total", "Devotional DMs to subscribers by outcome"
+        )
 
-        except FileNotFoundError:
-            logging.error("devotional_prompts.json not found in resources directory")
-            self.devotional_data = []
-        except json.JSONDecodeError as e:
-            logging.error(f"Error parsing devotional_prompts.json: {e}")
-            self.devotional_data = []
-        except Exception as e:
-            logging.error(f"Unexpected error loading devotional data: {e}")
-            self.devotional_data = []
+    async def cog_load(self):
+        await self.load_devotional_data()
+        await self.corpora.discover()
+        await self.subscriptions.load()
+        self.subscriptions.start(self.deliver_subscriptions)
+
+        # Optionally poll the devotional file and reload it when it changes.
+        # Started once it's loaded, so the first check sees it unchanged.
+        watch_interval = float(os.getenv("DEVOTIONAL_WATCH_INTERVAL", 0))
+        if watch_interval > 0:
+            self.watch_devotional_file.change_interval(seconds=watch_interval)
+            self.watch_devotional_file.start()
+
+    @property
+    def devotional_data(self):
+        return self.corpus.entries
+
+    def _file_stat(self):
+        stat = os.stat(self.resources_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read_corpus(self):
+        signature = self._file_stat()
+        corpus = DevotionalCorpus.from_file(self.resources_path)
+        return signature, corpus
+
+    async def load_devotional_data(self) -> bool:
+        """
+        Load devotional prompts from JSON file.
+
+        The file is parsed and validated on a worker thread and only swapped
+        in once complete, so commands see either the old corpus or the new
+        one. If the file can't be used the current corpus is kept.
+        """
+        async with self._reload_lock:
+            try:
+                signature, corpus = await asyncio.to_thread(self._read_corpus)
+            except FileNotFoundError:
+                log.error("devotional_prompts.json not found in resources directory")
+                return False
+            except json.JSONDecodeError as e:
+                log.error(f"Error parsing devotional_prompts.json: {e}")
+                self._file_signature = await asyncio.to_thread(self._file_stat)
+                return False
+            except ValueError as e:
+                log.error(f"Invalid devotional_prompts.json: {e}")
+                self._file_signature = await asyncio.to_thread(self._file_stat)
+                return False
+            except Exception as e:
+                log.error(f"Unexpected error loading devotional data: {e}")
+                return False
+
+            # Don't retry a rejected file until it changes again
+            self._file_signature = signature
+            if not len(corpus):
+                log.error("devotional_prompts.json has no valid devotionals, keeping the current data")
+                return False
+
+            corpus.log_problems("devotional_prompts.json")
+            self.corpus, self.embed_cache = corpus, OrderedDict()
+            self.corpora.pin(DEFAULT_CORPUS, corpus)
+            log.info(f"Loaded {len(corpus)} devotional prompts")
+            return True
+
+    @tasks.loop(seconds=60)
+    async def watch_devotional_file(self):
+        """Reload the devotional file when its modification time or size changes"""
+        try:
+            signature = await asyncio.to_thread(self._file_stat)
+        except OSError:
+            return
+        if signature != self._file_signature:
+            log.info("devotional_prompts.json changed, reloading")
+            await self.load_devotional_data()
 
-    def get_todays_devotional(self):
+    def get_todays_devotional(self, corpus=None):
         """Get the devotional for the current day of the year"""
         current_day = datetime.now().timetuple().tm_yday  # Day of year (1-366)
+        return (corpus or self.corpus).get(current_day)
 
-        # Find the devotional for today
-        for devotional in self.devotional_data:
-            if devotional.get("day") == current_day:
-                return devotional
-
-        # If no exact match found, return None
-        return None
-
-    def get_random_devotional(self):
+    def get_random_devotional(self, corpus=None):
         """Get a random devotional from the available data"""
-        if not self.devotional_data:
+        entries = (corpus or self.corpus).entries
+        if not entries:
             return None
 
-        return random.choice(self.devotional_data)
+        return random.choice(entries)
+
+    async def get_guild_corpus(self, guild_id):
+        """
+        The name and corpus a server reads from, the default unless it chose another.
+
+        Falls back to the default corpus if the chosen one can't be loaded.
+        """
+        name = self.bot.guild_config.get(guild_id, "devotional_corpus") if guild_id else None
+        if not name or name == DEFAULT_CORPUS:
+            return DEFAULT_CORPUS, self.corpus
+        try:
+            return name, await self.corpora.get(name)
+        except KeyError:
+            log.warning(f"Guild {guild_id} uses devotional corpus {name}, which no longer exists")
+        except (OSError, ValueError) as e:
+            log.error(f"Failed to load devotional corpus {name}: {e}")
+        return DEFAULT_CORPUS, self.corpus
 
     def create_devotional_embed(self, devotional):
         """Create a Discord embed for the devotional"""
@@ -86,83 +231,326 @@ class DailyDevotional(commands.Cog):
 
         return embed
 
-    @tasks.loop(hours=24)
-    async def daily_devotional_task(self):
-        """Task that runs once per day to post the devotional"""
-        if not self.channel_id:
-            logging.warning("Channel ID not set for daily devotional")
-            return
-
-        channel = self.bot.get_channel(self.channel_id)
-        if not channel:
-            logging.error(f"Could not find channel with ID {self.channel_id}")
-            return
+    def get_devotional_embed(self, devotional, corpus_name=DEFAULT_CORPUS):
+        """Get the embed for a devotional, building it only on a cache miss"""
+        key = (corpus_name, devotional["day"])
+        payload = self.embed_cache.get(key)
+        if payload is None:
+            embed = self.create_devotional_embed(devotional)
+            embed.timestamp = None
+            payload = self.embed_cache[key] = embed.to_dict()
+            if len(self.embed_cache) > EMBED_CACHE_SIZE:
+                self.embed_cache.popitem(last=False)
+        else:
+            self.embed_cache.move_to_end(key)
+
+        # from_dict shares the cached field list, which is never mutated
+        embed = discord.Embed.from_dict(payload)
+        embed.timestamp = datetime.now()
+        return embed
 
-        devotional = self.get_todays_devotional()
-        if not devotional:
-            logging.warning(f"No devotional found for day {datetime.now().timetuple().tm_yday}")
+    def get_devotional_channel_ids(self):
+        """Every channel the daily devotional goes to, with the server it's in"""
+        channel_ids = {
+            channel_id: guild_id for guild_id, channel_id in self.bot.guild_config.all("devotional_channel").items()
+        }
+        # The Devotion_Channel variable still works as an extra channel
+        if self.channel_id:
+            try:
+                channel_id = int(self.channel_id)
+            except ValueError:
+                log.error(f"Devotion_Channel is not a channel ID: {self.channel_id}")
+            else:
+                channel = self.bot.get_channel(channel_id)
+                guild = getattr(channel, "guild", None)
+                channel_ids.setdefault(channel_id, guild.id if guild else None)
+        return channel_ids
+
+    def remember_post(self, channel_id, day, message):
+        if message is not None and self.coalesce_window > 0:
+            self.recent_posts[channel_id] = (day, message.jump_url, time.monotonic())
+
+    def recent_post_url(self, channel_id, day):
+        """Link to the devotional for ``day`` if it was posted in the channel within the window"""
+        recent = self.recent_posts.get(channel_id)
+        if recent is None:
+            return None
+        posted_day, jump_url, posted_at = recent
+        if time.monotonic() - posted_at > self.coalesce_window:
+            del self.recent_posts[channel_id]
+            return None
+        return jump_url if posted_day == day else None
+
+    async def post_devotional(self, ctx, devotional, corpus_name=DEFAULT_CORPUS):
+        """
+        Post a devotional in the command's channel, unless it was just posted there.
+
+        Requests within DEVOTIONAL_COALESCE_WINDOW of the devotional being
+        posted in the channel get a link to that post, and requests made
+        while it is being posted wait for that send rather than making another.
+        """
+        day = devotional["day"]
+        channel_id = ctx.channel.id
+        jump_url = self.recent_post_url(channel_id, day)
+        if jump_url is not None:
+            self.coalesced.inc(how="link")
+            await self.bot.dispatcher.reply(
+                ctx, f"📖 Day {day}'s devotional was just posted: {jump_url}", ephemeral=True
+            )
             return
 
+        key = (channel_id, day)
+        send = self._inflight.get(key)
+        while send is not None:
+            message = await asyncio.shield(send)
+            if message is not None:
+                self.coalesced.inc(how="shared")
+                # Interactions still need an answer of their own
+                if ctx.interaction is not None:
+                    await self.bot.dispatcher.reply(
+                        ctx, f"📖 Day {day}'s devotional: {message.jump_url}", ephemeral=True
+                    )
+                return
+            # Refused for whoever asked first because the channel's queue was
+            # full, so post it for this request unless another waiter already is
+            retry = self._inflight.get(key)
+            send = retry if retry is not send else None
+
+        send = self._inflight[key] = asyncio.ensure_future(
+            self.bot.dispatcher.reply(ctx, embed=self.get_devotional_embed(devotional, corpus_name))
+        )
         try:
-            embed = self.create_devotional_embed(devotional)
-            await channel.send(embed=embed)
-            logging.info(f"Posted daily devotional for day {devotional['day']}")
-
-        except discord.Forbidden:
-            logging.error("Bot doesn't have permission to send messages in the channel")
-        except discord.HTTPException as e:
-            logging.error(f"Failed to send devotional message: {e}")
-        except Exception as e:
-            logging.error(f"Unexpected error posting devotional: {e}")
-
-    @daily_devotional_task.before_loop
-    async def before_daily_devotional(self):
-        """Wait until the bot is ready before starting the task"""
+            message = await asyncio.shield(send)
+        finally:
+            if self._inflight.get(key) is send:
+                del self._inflight[key]
+        self.remember_post(channel_id, day, message)
+
+    async def daily_devotional_task(self):
+        """Job that runs once per day to post the devotional"""
         await self.bot.wait_until_ready()
 
-        # Calculate time until next 9 AM (or your preferred time)
-        now = datetime.now()
-        next_run = now.replace(hour=9, minute=0, second=0, microsecond=0)
+        # Servers on other workers' shards may have changed their channel
+        await self.bot.guild_config.refresh()
+        channel_ids = self.get_devotional_channel_ids()
+        if not channel_ids:
+            log.warning("No channels registered for the daily devotional")
+            return
 
-        # If it's already past 9 AM today, schedule for tomorrow
-        if now.hour >= 9:
-            next_run = next_run.replace(day=next_run.day + 1)
+        day = datetime.now().timetuple().tm_yday
+        # Servers reading the same corpus share one embed
+        corpus_names = {}
+        embeds = {}
+        for guild_id in set(channel_ids.values()):
+            name, corpus = await self.get_guild_corpus(guild_id)
+            corpus_names[guild_id] = name
+            if name not in embeds:
+                devotional = corpus.get(day)
+                embeds[name] = self.get_devotional_embed(devotional, name) if devotional else None
+        if not any(embeds.values()):
+            log.warning(f"No devotional found for day {day}")
+            return
 
-        # Wait until the scheduled time
-        wait_seconds = (next_run - now).total_seconds()
-        if wait_seconds > 0:
-            logging.info(f"Daily devotional will start in {wait_seconds / 3600:.1f} hours")
-            await discord.utils.sleep_until(next_run)
+        async def post(channel_id):
+            guild_id = channel_ids[channel_id]
+            channel = self.bot.get_channel(channel_id)
+            if not channel and not self.bot.runs_guild(guild_id):
+                # Its server is on another worker's shard, so it isn't cached here
+                channel = self.bot.get_partial_messageable(channel_id, guild_id=guild_id)
+            if not channel:
+                raise LookupError("channel not found")
+            embed = embeds[corpus_names[guild_id]]
+            if embed is None:
+                raise LookupError(f"no devotional for day {day}")
+            message = await self.bot.dispatcher.send(channel, embed=embed)
+            self.remember_post(channel_id, day, message)
+
+        report = await self.sender.send_all(channel_ids, post)
+        self.last_delivery_report = report
+        log.info(f"Posted daily devotional for day {day}: {report}")
+        for channel_id, error in report.failures.items():
+            if isinstance(error, discord.Forbidden):
+                log.error(f"Bot doesn't have permission to send messages in channel {channel_id}")
+            else:
+                log.error(f"Failed to send devotional to channel {channel_id}: {error}")
+
+    async def deliver_subscriptions(self, due):
+        """DM each due subscriber the devotional for their local day"""
+        await self.bot.wait_until_ready()
 
-    @commands.command(name="devotional")
+        by_day = defaultdict(dict)
+        for subscription, day in due:
+            by_day[day][subscription.user_id] = subscription
+
+        for day, subscriptions in by_day.items():
+            devotional = self.corpus.get(day.timetuple().tm_yday)
+            if not devotional:
+                log.warning(f"No devotional found for day {day.timetuple().tm_yday}")
+                continue
+            embed = self.get_devotional_embed(devotional)
+
+            async def dm(user_id):
+                channel = self.bot.get_partial_messageable(
+                    subscriptions[user_id].channel_id, type=discord.ChannelType.private
+                )
+                await self.bot.dispatcher.send(channel, embed=embed)
+                self.subscriptions.mark_sent(subscriptions[user_id], day)
+
+            report = await self.sender.send_all(subscriptions, dm)
+            log.info(f"Sent devotional for day {devotional['day']} to subscribers: {report}")
+            self.dm_deliveries.inc(report.sent, outcome="sent")
+            for user_id, error in report.failures.items():
+                if isinstance(error, (discord.Forbidden, discord.NotFound)):
+                    # DMs closed, or the user is gone: stop trying every day
+                    self.dm_deliveries.inc(outcome="unsubscribed")
+                    self.subscriptions.remove(user_id)
+                    log.info(f"Unsubscribed user {user_id} from devotional DMs: {error}")
+                else:
+                    self.dm_deliveries.inc(outcome="failed")
+                    log.error(f"Failed to DM devotional to user {user_id}: {error}")
+
+    # Slash commands can't invoke a group itself, so /devotional today runs it
+    @commands.hybrid_group(name="devotional", fallback="today", invoke_without_command=True)
     async def manual_devotional(self, ctx):
         """Manually post today's devotional"""
-        devotional = self.get_todays_devotional()
+        corpus_name, corpus = await self.get_guild_corpus(ctx.guild.id if ctx.guild else None)
+        devotional = self.get_todays_devotional(corpus)
         if not devotional:
-            await ctx.send(f"No devotional found for day {datetime.now().timetuple().tm_yday}")
+            await self.bot.dispatcher.reply(
+                ctx, f"No devotional found for day {datetime.now().timetuple().tm_yday}", ephemeral=True
+            )
+            return
+
+        await self.post_devotional(ctx, devotional, corpus_name)
+
+    @manual_devotional.command(name="reload", description="Reload the devotional file")
+    @commands.is_owner()
+    async def reload_devotional(self, ctx):
+        """Reload devotional_prompts.json without restarting the bot"""
+        # Other corpora are read again the next time they're used
+        await self.corpora.discover()
+        self.corpora.clear()
+        if await self.load_devotional_data():
+            await self.bot.dispatcher.reply(ctx, f"📖 Reloaded {len(self.corpus)} devotionals.", ephemeral=True)
+        else:
+            await self.bot.dispatcher.reply(
+                ctx, "❌ Could not reload the devotional file, keeping the current devotionals.", ephemeral=True
+            )
+
+    @manual_devotional.command(name="setchannel", description="Post the daily devotional in a channel")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @app_commands.describe(channel="Channel to post in, this one if left out")
+    async def set_devotional_channel(self, ctx, channel: discord.TextChannel = None):
+        """Choose the channel this server's daily devotional is posted in"""
+        channel = channel or ctx.channel
+        await self.bot.guild_config.set(ctx.guild.id, "devotional_channel", channel.id)
+        await self.bot.dispatcher.reply(
+            ctx, f"📖 The daily devotional will be posted in {channel.mention}.", ephemeral=True
+        )
+
+    @manual_devotional.command(name="corpus", description="Choose which devotionals this server reads")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @app_commands.describe(name="Corpus to read from; leave out to see the available ones")
+    @app_commands.autocomplete(name=corpus_autocomplete)
+    async def set_devotional_corpus(self, ctx, name: Optional[str] = None):
+        """Choose the devotional corpus, e.g. a translation, this server reads from"""
+        current = self.bot.guild_config.get(ctx.guild.id, "devotional_corpus", DEFAULT_CORPUS)
+        if name is None:
+            names = ", ".join(f"**{corpus}**" if corpus == current else corpus for corpus in self.corpora.names())
+            await self.bot.dispatcher.reply(ctx, f"📚 Available devotionals: {names}", ephemeral=True)
+            return
+        if name not in self.corpora:
+            await self.bot.dispatcher.reply(
+                ctx,
+                f"❌ There are no devotionals called '{name}'. Available: {', '.join(self.corpora.names())}",
+                ephemeral=True,
+            )
             return
 
-        embed = self.create_devotional_embed(devotional)
-        await ctx.send(embed=embed)
+        if name == DEFAULT_CORPUS:
+            await self.bot.guild_config.unset(ctx.guild.id, "devotional_corpus")
+        else:
+            await self.bot.guild_config.set(ctx.guild.id, "devotional_corpus", name)
+        await self.bot.dispatcher.reply(ctx, f"📚 This server now reads the {name} devotionals.", ephemeral=True)
+
+    @manual_devotional.command(name="clearchannel", description="Stop posting the daily devotional")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def clear_devotional_channel(self, ctx):
+        """Stop posting the daily devotional in this server"""
+        await self.bot.guild_config.unset(ctx.guild.id, "devotional_channel")
+        await self.bot.dispatcher.reply(
+            ctx, "📖 The daily devotional will no longer be posted in this server.", ephemeral=True
+        )
+
+    @manual_devotional.command(name="subscribe", description="Get the devotional by DM every day")
+    @app_commands.describe(
+        at="Time of day to get it, HH:MM (24 hour clock)", timezone="Your time zone, e.g. Europe/London"
+    )
+    @app_commands.autocomplete(timezone=timezone_autocomplete)
+    async def subscribe_devotional(self, ctx, at: Optional[str] = None, timezone: Optional[str] = None):
+        """DM the user the day's devotional at their chosen local time"""
+        try:
+            send_time = datetime.strptime(at, "%H:%M").time() if at else self.post_time
+        except ValueError:
+            await self.bot.dispatcher.reply(ctx, "❌ Please give the time as HH:MM, e.g. `07:30`.", ephemeral=True)
+            return
+        try:
+            resolve_timezone(timezone)
+        except ValueError:
+            await self.bot.dispatcher.reply(
+                ctx, f"❌ Unknown time zone '{timezone}'. Use a name like `America/Chicago`.", ephemeral=True
+            )
+            return
+
+        channel = ctx.author.dm_channel or await ctx.author.create_dm()
+        subscription = await self.subscriptions.subscribe(ctx.author.id, channel.id, send_time, timezone)
+        zone = timezone or datetime.now().astimezone().tzname()
+        await self.bot.dispatcher.reply(
+            ctx,
+            f"📬 You'll get the devotional by DM every day at {send_time.strftime('%H:%M')} ({zone}), "
+            f"starting <t:{int(subscription.due.timestamp())}:R>. Keep DMs from this server open to receive it.",
+            ephemeral=True,
+        )
+
+    @manual_devotional.command(name="unsubscribe", description="Stop getting the devotional by DM")
+    async def unsubscribe_devotional(self, ctx):
+        """Stop DMing the user the devotional"""
+        if await self.subscriptions.unsubscribe(ctx.author.id):
+            await self.bot.dispatcher.reply(ctx, "📭 You'll no longer get the devotional by DM.", ephemeral=True)
+        else:
+            await self.bot.dispatcher.reply(ctx, "📭 You aren't subscribed to the devotional.", ephemeral=True)
 
-    @commands.command(name="randomdevotional", aliases=["random_devotional", "rd"])
+    @commands.hybrid_command(name="randomdevotional", aliases=["random_devotional", "rd"])
     async def random_devotional(self, ctx):
         """Get a random devotional from the collection"""
-        if not self.devotional_data:
-            await ctx.send("❌ No devotional data available. Please check if the devotional file is loaded properly.")
+        corpus_name, corpus = await self.get_guild_corpus(ctx.guild.id if ctx.guild else None)
+        if not len(corpus):
+            await self.bot.dispatcher.reply(
+                ctx,
+                "❌ No devotional data available. Please check if the devotional file is loaded properly.",
+                ephemeral=True,
+            )
             return
 
-        devotional = self.get_random_devotional()
+        devotional = self.get_random_devotional(corpus)
         if not devotional:
-            await ctx.send("❌ Unable to retrieve a random devotional.")
+            await self.bot.dispatcher.reply(ctx, "❌ Unable to retrieve a random devotional.", ephemeral=True)
             return
 
-        embed = self.create_devotional_embed(devotional)
-        await ctx.send(embed=embed)
+        embed = self.get_devotional_embed(devotional, corpus_name)
+        await self.bot.dispatcher.reply(ctx, embed=embed)
 
     def cog_unload(self):
         """Clean up when the cog is unloaded"""
-        self.daily_devotional_task.cancel()
+        self.bot.scheduler.remove_job("daily-devotional")
+        self.subscriptions.stop()
+        self.bot.metrics.remove_gauge("bot_devotional_corpus_size")
+        self.bot.metrics.remove_gauge("bot_devotional_subscriptions")
+        self.bot.metrics.remove_gauge("bot_devotional_corpora_resident")
+        self.watch_devotional_file.cancel()
 
 
 async def setup(bot):
@@ -1,59 +1,221 @@
-from discord.ext import commands
+import os
+import discord
+from datetime import datetime, time
+from typing import Literal
+from discord import app_commands
+from discord.ext import commands, tasks
 from HeartSanctifier import HeartSanctifier
+from DistractionStats import HISTORY_DAYS, PERIODS, create_distraction_stats
+from DistractionJournal import DistractionJournal
+from Pagination import PageView
+from Scheduler import RecurringJob
+
+# Journal entries per page of history or search results
+PAGE_SIZE = 10
 
 
 class DistractionCog(commands.Cog, name="Distractions"):
+    required_intents = discord.Intents(guilds=True)
+
     def __init__(self, bot):
         self.bot = bot
+        # Streaming summaries of what users log, kept after the log is cleared
+        self.stats = create_distraction_stats(bot.data_dir, shared=bot.shared_state)
+        self.bot.metrics.gauge(
+            "bot_distraction_stats", "Users and guilds with distraction stats in memory", lambda: len(self.stats)
+        )
+        # Everything ever logged, searchable, until it's older than DISTRACTION_RETENTION_DAYS
+        self.journal = DistractionJournal(os.path.join(bot.data_dir, "journal.sqlite3"))
+        self.retention_days = float(os.getenv("DISTRACTION_RETENTION_DAYS", 365))
+        if self.retention_days > 0:
+            self.bot.scheduler.add_job(RecurringJob("journal-compaction", [time(3, 0)], self.compact_journal))
+
+    async def cog_load(self):
+        await self.stats.load()
+        self.flush_stats.change_interval(seconds=self.stats.flush_interval)
+        self.flush_stats.start()
+        self.journal.start()
+
+    @tasks.loop(seconds=60)
+    async def flush_stats(self):
+        """Save distraction stats if anything was logged since the last save"""
+        await self.stats.flush()
 
-    def get_user_heart(self, user_id: int) -> HeartSanctifier:
+    async def compact_journal(self):
+        """Delete journal entries older than the retention period"""
+        await self.journal.compact(self.retention_days)
+
+    async def get_user_heart(self, user_id: int) -> HeartSanctifier:
         """Get or create a HeartSanctifier instance for a user"""
-        if user_id not in self.bot.user_hearts:
-            self.bot.user_hearts[user_id] = HeartSanctifier()
-        return self.bot.user_hearts[user_id]
+        return await self.bot.user_hearts.get(user_id)
 
-    @commands.group(
+    @commands.hybrid_group(
         name="distraction", aliases=["d"], description="Manage your distraction log", invoke_without_command=True
     )
     async def distraction_group(self, ctx):
         if ctx.invoked_subcommand is None:
-            await ctx.send("Use `!d help` to see available distraction commands.")
+            await self.bot.dispatcher.reply(
+                ctx,
+                f"Use `{ctx.clean_prefix}distraction help` to see available distraction commands.",
+                ephemeral=True,
+            )
 
     @distraction_group.command(name="add", aliases=["log"], description="Add a distraction to your log")
+    @app_commands.describe(distraction="What pulled your attention away")
     async def add_distraction(self, ctx, *, distraction: str):
         """Add a distraction to the user's log"""
         if not distraction.strip():
-            await ctx.send("❌ Please provide a distraction to log.")
+            await self.bot.dispatcher.reply(ctx, "❌ Please provide a distraction to log.", ephemeral=True)
             return
 
-        heart = self.get_user_heart(ctx.author.id)
-        heart.heart.insert(0, distraction.strip())
-        await ctx.send(f"📝 Logging distraction: '{distraction.strip()}'")
+        heart = await self.get_user_heart(ctx.author.id)
+        heart.add_distraction(distraction.strip())
+        self.bot.user_hearts.mark_dirty(ctx.author.id)
+        guild_id = ctx.guild.id if ctx.guild else None
+        self.stats.record(ctx.author.id, guild_id, distraction)
+        self.journal.add(ctx.author.id, guild_id, distraction.strip())
+        await self.bot.dispatcher.reply(ctx, f"📝 Logging distraction: '{distraction.strip()}'")
 
     @distraction_group.command(name="clear", aliases=["release"], description="Release all distractions")
     async def clear_all_distractions(self, ctx):
         """Clear all distractions for the user"""
-        heart = self.get_user_heart(ctx.author.id)
+        heart = await self.get_user_heart(ctx.author.id)
         heart.heart = []
-        await ctx.send("💨 Releasing distractions...")
+        self.bot.user_hearts.mark_dirty(ctx.author.id)
+        await self.bot.dispatcher.reply(ctx, "💨 Releasing distractions...")
+
+    def create_stats_embed(self, title, stats):
+        """Top themes and time of day over the last 7 and 30 days"""
+        today = datetime.now().date().toordinal()
+        windows = {days: stats.window(days, today) for days in (7, HISTORY_DAYS)}
+        embed = discord.Embed(title=title, color=0x7289DA)
+
+        for days, (themes, periods) in windows.items():
+            lines = [f"{rank}. {theme} — {count}" for rank, (theme, count) in enumerate(themes, 1)]
+            embed.add_field(
+                name=f"Last {days} Days · {sum(periods)} logged",
+                value="\n".join(lines) or "Nothing logged",
+                inline=True,
+            )
+
+        week, month = windows[7][1], windows[HISTORY_DAYS][1]
+        embed.add_field(
+            name=f"Time of Day (7 / {HISTORY_DAYS} days)",
+            value="\n".join(f"{period}: {w} / {m}" for period, w, m in zip(PERIODS, week, month)),
+            inline=False,
+        )
+        embed.set_footer(text="Similar distractions are grouped by their key words • Counts are approximate")
+        return embed
+
+    @distraction_group.command(name="stats", description="See what distracts you most")
+    @app_commands.describe(scope="Your own distractions, or the whole server's")
+    async def distraction_stats(self, ctx, scope: Literal["me", "guild"] = "me"):
+        """Show top distraction themes and when they happen"""
+        if scope == "guild":
+            if ctx.guild is None:
+                await self.bot.dispatcher.reply(ctx, "❌ Server stats are only available in a server.", ephemeral=True)
+                return
+            stats = await self.stats.fetch_guild(ctx.guild.id)
+            title = f"📊 {ctx.guild.name} Distractions"
+        else:
+            stats = await self.stats.fetch_user(ctx.author.id)
+            title = "📊 Your Distractions"
+
+        if stats is None:
+            await self.bot.dispatcher.reply(
+                ctx, f"📝 No distractions logged in the last {HISTORY_DAYS} days.", ephemeral=True
+            )
+            return
+        await self.bot.dispatcher.reply(ctx, embed=self.create_stats_embed(title, stats), ephemeral=True)
+
+    def create_journal_embed(self, title, entries, page):
+        """A page of journal entries with when each was logged"""
+        lines = [f"<t:{logged_at}:R> {discord.utils.escape_markdown(text[:200])}" for _, logged_at, text in entries]
+        embed = discord.Embed(title=title, description="\n".join(lines) or "No more entries.", color=0x7289DA)
+        embed.set_footer(text=f"Page {page + 1}")
+        return embed
+
+    async def send_journal_pages(self, ctx, title, fetch, empty_message):
+        """Reply with the first page of entries and buttons to turn to the rest"""
+
+        async def render(page):
+            # One extra entry tells whether there's a page after this one
+            entries = await fetch(PAGE_SIZE + 1, page * PAGE_SIZE)
+            return self.create_journal_embed(title, entries[:PAGE_SIZE], page), len(entries) > PAGE_SIZE
+
+        entries = await fetch(PAGE_SIZE + 1, 0)
+        if not entries:
+            await self.bot.dispatcher.reply(ctx, empty_message, ephemeral=True)
+            return
+        embed = self.create_journal_embed(title, entries[:PAGE_SIZE], 0)
+        view = PageView(render, ctx.author.id, has_next=True) if len(entries) > PAGE_SIZE else None
+        await self.bot.dispatcher.reply(ctx, embed=embed, view=view, ephemeral=True)
+
+    @distraction_group.command(name="history", description="Look back over everything you've logged")
+    async def distraction_history(self, ctx):
+        """Show the user's logged distractions, newest first"""
+
+        async def fetch(limit, offset):
+            return await self.journal.history(ctx.author.id, limit, offset)
+
+        await self.send_journal_pages(ctx, "📜 Your Distraction History", fetch, "📝 You haven't logged anything yet.")
+
+    @distraction_group.command(name="search", description="Find past distractions by their words")
+    @app_commands.describe(terms="Words the distraction contained")
+    async def distraction_search(self, ctx, *, terms: str):
+        """Search the user's logged distractions, best match first"""
+
+        async def fetch(limit, offset):
+            return await self.journal.search(ctx.author.id, terms, limit, offset)
+
+        await self.send_journal_pages(
+            ctx,
+            f"🔎 Distractions matching '{terms[:100]}'",
+            fetch,
+            f"📝 Nothing you've logged matches '{terms[:100]}'.",
+        )
 
     @distraction_group.command(name="help", description="Learn about distraction commands")
     async def help_distractions(self, ctx):
         """Show help for distraction commands"""
-        message = """**📝 Distraction Management Guide**
+        # "/" for slash commands, the prefix the user typed otherwise
+        prefix = ctx.clean_prefix
+        # Aliases only exist for prefix commands
+        if ctx.interaction is None:
+            add_aliases = f" (aliases: `{prefix}d add`, `{prefix}d log`)"
+            clear_aliases = f" (aliases: `{prefix}d clear`, `{prefix}d release`)"
+        else:
+            add_aliases = clear_aliases = ""
+
+        message = f"""**📝 Distraction Management Guide**
 Track the things that distract you from spiritual focus:
 
-📝 `!distraction add <text>` - Log a new distraction (aliases: `!d add`, `!d log`)
+📝 `{prefix}distraction add <text>` - Log a new distraction{add_aliases}
+
+💨 `{prefix}distraction clear` - Release all distractions{clear_aliases}
 
-💨 `!distraction clear` - Release all distractions (aliases: `!d clear`, `!d release`)
+📊 `{prefix}distraction stats [guild]` - Your (or the server's) top distractions and when they happen
+
+📜 `{prefix}distraction history` - Everything you've logged, newest first
+
+🔎 `{prefix}distraction search <words>` - Find past distractions containing those words
 
 💡 **Examples:**
-`!d add worried about work meeting`
-`!d add phone notifications`
-`!d clear`
+`{prefix}distraction add worried about work meeting`
+`{prefix}distraction add phone notifications`
+`{prefix}distraction search meeting`
+`{prefix}distraction clear`
 
 *Track distractions to become more aware of what pulls you away from peace 🕊️*"""
-        await ctx.send(message)
+        await self.bot.dispatcher.reply(ctx, message, ephemeral=True)
+
+    async def cog_unload(self):
+        """Save stats and the journal when the cog is unloaded"""
+        self.flush_stats.cancel()
+        self.bot.scheduler.remove_job("journal-compaction")
+        self.bot.metrics.remove_gauge("bot_distraction_stats")
+        await self.stats.flush()
+        await self.journal.close()
 
 
 async def setup(bot) -> None:
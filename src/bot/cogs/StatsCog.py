@@ -0,0 +1,68 @@
+import time
+import discord
+from datetime import timedelta
+from discord.ext import commands
+
+
+class StatsCog(commands.Cog, name="Stats"):
+    required_intents = discord.Intents(guilds=True)
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @staticmethod
+    def _ms(seconds):
+        return "n/a" if seconds is None else f"{seconds * 1000:.1f} ms"
+
+    def _command_summary(self, limit=10):
+        """The busiest commands with their outcome counts and latency"""
+        metrics = self.bot.metrics
+        totals = {}
+        for labels, value in metrics.commands.items():
+            command = totals.setdefault(labels["command"], {})
+            command[labels["outcome"]] = value
+
+        lines = []
+        busiest = sorted(totals.items(), key=lambda item: sum(item[1].values()), reverse=True)
+        for command, outcomes in busiest[:limit]:
+            p50 = metrics.command_latency.quantile(0.5, command=command)
+            p99 = metrics.command_latency.quantile(0.99, command=command)
+            errors = outcomes.get("error", 0) + outcomes.get("check_failure", 0)
+            lines.append(
+                f"`{command}` {int(outcomes.get('success', 0))} ok / {int(errors)} err"
+                f" · p50 {self._ms(p50)} · p99 {self._ms(p99)}"
+            )
+        return "\n".join(lines) or "No commands yet."
+
+    @commands.hybrid_command(name="stats", description="Show bot health and command metrics")
+    @commands.is_owner()
+    async def stats(self, ctx):
+        metrics = self.bot.metrics
+        gauges = {name: dict(gauge.values()) for name, gauge in metrics.gauges.items()}
+
+        def gauge(name):
+            value = gauges.get(name, {}).get(())
+            return "n/a" if value is None else f"{int(value):,}"
+
+        embed = discord.Embed(title="📊 Bro Larry Stats", color=0x7289DA)
+        embed.add_field(name="Uptime", value=str(timedelta(seconds=int(time.time() - metrics.started))), inline=True)
+        embed.add_field(name="Hearts in Memory", value=gauge("bot_user_hearts"), inline=True)
+        embed.add_field(name="Devotionals", value=gauge("bot_devotional_corpus_size"), inline=True)
+
+        embed.add_field(
+            name="Event Loop Lag",
+            value=f"last {self._ms(metrics.last_loop_lag)} · p99 {self._ms(metrics.loop_lag.quantile(0.99))}",
+            inline=False,
+        )
+
+        jobs = gauges.get("bot_scheduled_job_duration_seconds", {})
+        if jobs:
+            value = "\n".join(f"`{dict(labels)['job']}` {self._ms(seconds)}" for labels, seconds in jobs.items())
+            embed.add_field(name="Last Scheduled Job Runs", value=value, inline=False)
+
+        embed.add_field(name="Commands", value=self._command_summary(), inline=False)
+        await self.bot.dispatcher.reply(ctx, embed=embed, ephemeral=True)
+
+
+async def setup(bot) -> None:
+    await bot.add_cog(StatsCog(bot))
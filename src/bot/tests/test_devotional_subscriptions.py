@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta
+from DevotionalSubscriptions import DevotionalSubscriptions, previous_delivery
+
+CATCH_UP = timedelta(hours=3)
+
+
+def ten_minutes_ago():
+    return (datetime.now() - timedelta(minutes=10)).time().replace(second=0, microsecond=0)
+
+
+async def restart(path):
+    subscriptions = DevotionalSubscriptions(str(path), CATCH_UP)
+    await subscriptions.load()
+    return subscriptions
+
+
+def test_delivery_missed_while_down_is_made_after_a_restart(tmp_path):
+    path = tmp_path / "subscriptions.sqlite3"
+
+    async def run():
+        subscriptions = await restart(path)
+        subscription = await subscriptions.subscribe(1, 100, ten_minutes_ago())
+        missed = previous_delivery(subscription.at, None, datetime.now().astimezone())
+        # Sent the day before, then the bot was down at today's time
+        subscriptions.mark_sent(subscription, missed.date() - timedelta(days=1))
+        await subscriptions.save()
+
+        subscriptions = await restart(path)
+        assert subscriptions.get(1).due == missed
+        due = subscriptions.pop_due(datetime.now().astimezone())
+        assert [(subscription.user_id, day) for subscription, day in due] == [(1, missed.date())]
+        subscriptions.mark_sent(due[0][0], missed.date())
+        await subscriptions.save()
+
+        # Already sent, so the next restart waits for tomorrow's
+        subscriptions = await restart(path)
+        assert subscriptions.get(1).due == missed + timedelta(days=1)
+        assert subscriptions.pop_due(datetime.now().astimezone()) == []
+
+    asyncio.run(run())
+
+
+def test_saves_only_what_changed(tmp_path, monkeypatch):
+    path = tmp_path / "subscriptions.sqlite3"
+    writes = []
+
+    async def run():
+        subscriptions = await restart(path)
+        for user_id in range(5):
+            await subscriptions.subscribe(user_id, 100 + user_id, ten_minutes_ago())
+        write_rows = subscriptions._write_rows
+
+        def record_rows(rows, deleted):
+            writes.append((rows, deleted))
+            write_rows(rows, deleted)
+
+        monkeypatch.setattr(subscriptions, "_write_rows", record_rows)
+
+        await subscriptions.save()
+        subscriptions.mark_sent(subscriptions.get(3), datetime.now().date())
+        await subscriptions.unsubscribe(4)
+        await subscriptions.save()
+        return subscriptions
+
+    subscriptions = asyncio.run(run())
+    assert [(sorted(row[0] for row in rows), deleted) for rows, deleted in writes] == [([3], [(4,)])]
+    reloaded = asyncio.run(restart(path))
+    assert sorted(reloaded.subscriptions) == [0, 1, 2, 3]
+    assert reloaded.get(3).last_day == subscriptions.get(3).last_day
@@ -0,0 +1,93 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from discord.ext import commands
+from Dispatcher import Cooldowns, Dispatcher
+from Metrics import Metrics
+
+
+def make_ctx(user_id, command="heart surrender"):
+    return SimpleNamespace(author=SimpleNamespace(id=user_id), command=SimpleNamespace(qualified_name=command))
+
+
+def test_token_bucket_refills_at_rate():
+    cooldowns = Cooldowns(rate=0.5, burst=2)
+    cooldowns.consume(1, 0.0)
+    cooldowns.consume(1, 0.0)
+    assert cooldowns.retry_after(1, 0.0) == pytest.approx(2.0)
+    assert cooldowns.retry_after(1, 1.0) == pytest.approx(1.0)
+    assert cooldowns.retry_after(1, 2.0) == 0.0
+    # Refilling stops at the burst size
+    assert cooldowns._tokens(1, 100.0) == 2
+
+
+def test_refilled_buckets_are_pruned():
+    cooldowns = Cooldowns(rate=1.0, burst=1)
+    cooldowns.consume(1, 0.0)
+    cooldowns.consume(2, 5.0)
+    cooldowns.prune(5.5)
+    assert len(cooldowns) == 1
+    assert cooldowns.retry_after(1, 5.5) == 0.0
+
+
+def test_check_cooldown_refuses_without_taking():
+    dispatcher = Dispatcher(Metrics(), user_rate=1.0, user_burst=1, command_rate=None, rate=None)
+    dispatcher.check_cooldown(make_ctx(1))
+    with pytest.raises(commands.CommandOnCooldown) as refused:
+        dispatcher.check_cooldown(make_ctx(1))
+    assert 0 < refused.value.retry_after <= 1.0
+    # Another user has their own bucket
+    dispatcher.check_cooldown(make_ctx(2))
+    assert dispatcher.messages.value(outcome="cooldown") == 1
+
+
+def test_check_cooldown_per_command():
+    dispatcher = Dispatcher(Metrics(), user_rate=None, command_rate=0.5, command_burst=1, rate=None)
+    dispatcher.check_cooldown(make_ctx(1, "heart surrender"))
+    dispatcher.check_cooldown(make_ctx(1, "distraction add"))
+    with pytest.raises(commands.CommandOnCooldown):
+        dispatcher.check_cooldown(make_ctx(1, "heart surrender"))
+
+
+class SlowChannel:
+    def __init__(self):
+        self.id = 1
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        await asyncio.sleep(0.01)
+        self.sent.append(content)
+        return len(self.sent)
+
+
+def make_reply_ctx(user_id, channel):
+    return SimpleNamespace(author=SimpleNamespace(id=user_id), channel=channel, interaction=None, send=channel.send)
+
+
+def test_replies_coalesce_per_user():
+    async def run():
+        dispatcher = Dispatcher(Metrics(), user_rate=None, command_rate=None, rate=None)
+        channel = SlowChannel()
+        replies = await asyncio.gather(
+            dispatcher.reply(make_reply_ctx(1, channel), "🕊️ Surrendered"),
+            dispatcher.reply(make_reply_ctx(1, channel), "🕊️ Surrendered"),
+            dispatcher.reply(make_reply_ctx(2, channel), "🕊️ Surrendered"),
+        )
+        return channel, replies
+
+    channel, replies = asyncio.run(run())
+    # The second user gets their own reply; the first user's repeat is merged
+    assert channel.sent == ["🕊️ Surrendered", "🕊️ Surrendered"]
+    assert replies[0] == replies[1] != replies[2]
+
+
+def test_channel_sends_coalesce():
+    async def run():
+        dispatcher = Dispatcher(Metrics(), user_rate=None, command_rate=None, rate=None)
+        channel = SlowChannel()
+        await asyncio.gather(*(dispatcher.send(channel, "Today's devotional") for _ in range(3)))
+        return channel, dispatcher
+
+    channel, dispatcher = asyncio.run(run())
+    assert channel.sent == ["Today's devotional"]
+    assert dispatcher.messages.value(outcome="coalesced") == 2
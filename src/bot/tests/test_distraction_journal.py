@@ -0,0 +1,59 @@
+import time
+import asyncio
+from DistractionJournal import DistractionJournal, match_query
+
+
+def texts(entries):
+    return [text for _, _, text in entries]
+
+
+def test_search_is_scoped_to_one_user(tmp_path):
+    async def run():
+        journal = DistractionJournal(str(tmp_path / "journal.sqlite3"))
+        journal.add(1, 10, "Worried about the work meeting")
+        journal.add(2, 10, "work meeting notes")
+        journal.add(1, None, "phone notifications")
+        journal.add(1, 10, "meetings all day at work")
+
+        # Stemmed, and only the searcher's own entries
+        assert sorted(texts(await journal.search(1, "meeting work"))) == [
+            "Worried about the work meeting",
+            "meetings all day at work",
+        ]
+        assert texts(await journal.search(2, "meeting")) == ["work meeting notes"]
+        assert await journal.search(3, "meeting") == []
+        assert await journal.search(1, "notifications email") == []
+        await journal.close()
+
+    asyncio.run(run())
+
+
+def test_user_terms_cannot_reach_other_users():
+    # Quoted and prefixed, so query syntax and other users' prefixes are just words
+    assert match_query(1, "u2xwork OR *") == '"u1xu2xwork" "u1xor"'
+    assert match_query(1, "!!!") is None
+
+
+def test_history_pages_newest_first(tmp_path):
+    async def run():
+        journal = DistractionJournal(str(tmp_path / "journal.sqlite3"))
+        for number in range(5):
+            journal.add(1, None, f"distraction {number}")
+        journal.add(2, None, "someone else's")
+        assert texts(await journal.history(1, limit=2)) == ["distraction 4", "distraction 3"]
+        assert texts(await journal.history(1, limit=2, offset=4)) == ["distraction 0"]
+        await journal.close()
+
+    asyncio.run(run())
+
+
+def test_compact_removes_old_entries_from_the_index(tmp_path):
+    async def run():
+        journal = DistractionJournal(str(tmp_path / "journal.sqlite3"))
+        journal.add(1, None, "old email", logged_at=int(time.time()) - 10 * 86400)
+        journal.add(1, None, "new email")
+        assert await journal.compact(retention_days=5) == 1
+        assert texts(await journal.search(1, "email")) == ["new email"]
+        await journal.close()
+
+    asyncio.run(run())
@@ -0,0 +1,108 @@
+import random
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from DistractionStats import HISTORY_DAYS, DistractionStatsStore, SpaceSaving, normalize
+
+
+def zipf_stream(items, length, seed):
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, items + 1)]
+    return rng.choices([f"theme {rank}" for rank in range(items)], weights, k=length)
+
+
+def assert_error_bound(summary, truth, total):
+    errors = summary.errors or {}
+    for item, count in summary.counts.items():
+        # Never under counted, and over counted by no more than its recorded error
+        assert truth[item] <= count <= truth[item] + errors.get(item, 0)
+        assert errors.get(item, 0) <= total // summary.capacity
+    for item, count in truth.items():
+        if count > total / summary.capacity:
+            assert item in summary.counts
+
+
+def test_heavy_hitters_within_error_bound():
+    stream = zipf_stream(200, 5000, seed=54)
+    summary = SpaceSaving(16)
+    for item in stream:
+        summary.add(item)
+    assert len(summary.counts) == 16
+    assert sum(summary.counts.values()) == len(stream)
+    assert_error_bound(summary, Counter(stream), len(stream))
+    assert summary.top(1)[0][0] == "theme 0"
+
+
+def test_merged_summaries_keep_error_bound():
+    first, second = zipf_stream(100, 2000, seed=1), zipf_stream(100, 3000, seed=2)
+    merged = SpaceSaving(16)
+    for stream in (first, second):
+        summary = SpaceSaving(16)
+        for item in stream:
+            summary.add(item)
+        merged.merge(summary)
+    assert_error_bound(merged, Counter(first + second), len(first) + len(second))
+
+
+def test_exact_while_under_capacity():
+    summary = SpaceSaving(4)
+    for item in ["email", "news", "email", "phone"]:
+        summary.add(item)
+    assert summary.errors is None
+    assert summary.top(2) == [("email", 2), ("news", 1)]
+
+
+def test_normalize_groups_similar_distractions():
+    assert normalize("Worried about the work meeting!") == normalize("worried about work meeting")
+    assert normalize("the") == "the"
+    assert normalize("Café au lait, again") == "café au lait"
+
+
+def test_store_flushes_only_what_changed(tmp_path, monkeypatch):
+    path = str(tmp_path / "distraction_stats.sqlite3")
+    writes = []
+
+    async def run():
+        store = DistractionStatsStore(path)
+        await store.load()
+        store.record(1, 10, "email")
+        store.record(2, 10, "news")
+        await store.flush()
+
+        write_rows = store._write_rows
+
+        def record_rows(rows, deleted):
+            writes.append(sorted((scope, key) for scope, key, _, _ in rows))
+            write_rows(rows, deleted)
+
+        monkeypatch.setattr(store, "_write_rows", record_rows)
+        await store.flush()
+        store.record(2, None, "phone")
+        await store.flush()
+
+        reloaded = DistractionStatsStore(path)
+        await reloaded.load()
+        return reloaded
+
+    reloaded = asyncio.run(run())
+    assert writes == [[("users", 2)]]
+    today = datetime.now().date().toordinal()
+    assert reloaded.user(2).window(7, today)[0] == [("news", 1), ("phone", 1)]
+    assert reloaded.guild(10).window(7, today)[0] == [("email", 1), ("news", 1)]
+
+
+def test_store_deletes_expired_summaries(tmp_path):
+    path = str(tmp_path / "distraction_stats.sqlite3")
+
+    async def run():
+        store = DistractionStatsStore(path)
+        store.record(1, None, "email", datetime.now() - timedelta(days=HISTORY_DAYS - 1))
+        store.record(2, None, "news")
+        await store.flush()
+        # A day later the first user's only entry has left the history
+        store.expire(datetime.now().date().toordinal() + 1)
+        await store.flush()
+        rows = await asyncio.to_thread(store._read)
+        assert [(scope, key) for scope, key, _ in rows] == [("users", 2)]
+
+    asyncio.run(run())
@@ -0,0 +1,45 @@
+from datetime import datetime, time
+from HeartReset import ResetIndex, ResetSchedule
+
+SCHEDULE = ResetSchedule([time(6, 0), time(12, 0), time(18, 0)])
+
+
+def test_window_across_midnight():
+    assert SCHEDULE.window(datetime(2026, 3, 1, 23, 30)) == (datetime(2026, 3, 1, 18, 0), datetime(2026, 3, 2, 0, 0))
+    assert SCHEDULE.window(datetime(2026, 3, 2, 0, 0)) == (datetime(2026, 3, 2, 0, 0), datetime(2026, 3, 2, 6, 0))
+    # Across the end of a month and a year too
+    assert SCHEDULE.next_boundary(datetime(2026, 12, 31, 19, 0)) == datetime(2027, 1, 1, 0, 0)
+
+
+def test_is_due_after_midnight():
+    last_reset = datetime(2026, 3, 1, 18, 5)
+    assert not SCHEDULE.is_due(last_reset, datetime(2026, 3, 1, 23, 59))
+    assert SCHEDULE.is_due(last_reset, datetime(2026, 3, 2, 0, 1))
+    assert SCHEDULE.is_due(None, datetime(2026, 3, 2, 0, 1))
+
+
+def test_index_buckets_across_midnight():
+    index = ResetIndex()
+    evening, night = datetime(2026, 3, 1, 18, 30), datetime(2026, 3, 1, 23, 30)
+    index.add(1, SCHEDULE.next_boundary(evening))
+    index.add(2, SCHEDULE.next_boundary(night))
+    index.add(3, SCHEDULE.next_boundary(datetime(2026, 3, 2, 1, 0)))
+
+    # Changed on either side of 18:00 before midnight, both due at midnight
+    assert index.next_boundary() == datetime(2026, 3, 2, 0, 0)
+    assert index.pop_due(datetime(2026, 3, 1, 23, 59)) == []
+    assert sorted(index.pop_due(datetime(2026, 3, 2, 0, 0))) == [1, 2]
+    assert len(index) == 1
+    assert index.next_boundary() == datetime(2026, 3, 2, 6, 0)
+
+
+def test_index_moves_and_discards_users():
+    index = ResetIndex()
+    index.add(1, datetime(2026, 3, 2, 0, 0))
+    index.add(1, datetime(2026, 3, 2, 6, 0))
+    index.add(2, datetime(2026, 3, 2, 6, 0))
+    index.discard(2)
+    index.discard(3)
+    assert index.pop_due(datetime(2026, 3, 2, 0, 0)) == []
+    assert index.pop_due(datetime(2026, 3, 2, 6, 0)) == [1]
+    assert len(index) == 0
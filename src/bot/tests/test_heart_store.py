@@ -0,0 +1,75 @@
+import time
+import asyncio
+from datetime import time as clock
+from HeartReset import ResetSchedule
+from HeartStore import SharedHeartStore
+
+
+def make_store(path):
+    store = SharedHeartStore(str(path))
+    store.reset_schedule = ResetSchedule([clock(6, 0), clock(12, 0), clock(18, 0)])
+    return store
+
+
+A_DAY_AGO = int(time.time()) - 86400
+
+
+async def backdate(store, user_id):
+    """Make a heart, stored and in memory, look last reset before the last boundary"""
+    # Midnight is always a boundary, so a day ago is always before the last one
+    store._hearts[user_id].last_reset = A_DAY_AGO
+
+    def update():
+        with store._connect() as connection:
+            connection.execute("UPDATE hearts SET last_reset = ? WHERE user_id = ?", (A_DAY_AGO, user_id))
+
+    await store._run(update)
+
+
+async def log(store, user_id, distraction):
+    heart = await store.get(user_id)
+    heart.add_distraction(distraction)
+    store.mark_dirty(user_id)
+
+
+def test_reset_survives_a_stale_write_from_another_worker(tmp_path):
+    async def run():
+        path = tmp_path / "hearts.sqlite3"
+        sweeper, writer = make_store(path), make_store(path)
+        await log(writer, 1, "email")
+        await writer.flush()
+        # Changed again before the boundary, but not written when the sweep runs
+        await log(writer, 1, "news")
+        await backdate(writer, 1)
+
+        assert await sweeper.reset_stored() == 1
+        await writer.flush()
+        assert await sweeper._run(sweeper._read_row, 1) is None
+
+        await sweeper.close()
+        await writer.close()
+
+    asyncio.run(run())
+
+
+def test_stale_write_keeps_a_heart_changed_since_its_reset(tmp_path):
+    async def run():
+        path = tmp_path / "hearts.sqlite3"
+        first, second = make_store(path), make_store(path)
+        await log(second, 1, "email")
+        await second.flush()
+        await log(second, 1, "news")
+        await backdate(second, 1)
+
+        # Reset lazily on this lookup, then changed
+        await log(first, 1, "phone")
+        await first.flush()
+
+        await second.flush()
+        heart = await second.get(1)
+        assert heart.heart[0] == "phone" and "news" not in heart.heart
+
+        await first.close()
+        await second.close()
+
+    asyncio.run(run())
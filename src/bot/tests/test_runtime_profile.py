@@ -0,0 +1,31 @@
+import os
+import sys
+import discord
+from RuntimeProfile import cog_intents, default_intents
+
+COGS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cogs")
+
+
+def test_cog_intents_reads_declarations_without_importing(tmp_path):
+    (tmp_path / "Guilds.py").write_text(
+        "raise RuntimeError('imported')\n"
+        "class GuildsCog(commands.Cog):\n"
+        "    required_intents = discord.Intents(guilds=True)\n"
+    )
+    (tmp_path / "Reactions.py").write_text(
+        "class ReactionsCog(commands.Cog, name='Reactions'):\n"
+        "    required_intents = discord.Intents(guild_reactions=True, guilds=False)\n"
+    )
+    (tmp_path / "notes.txt").write_text("not a cog")
+    assert cog_intents(str(tmp_path)) == discord.Intents(guilds=True, guild_reactions=True)
+
+
+def test_cogs_without_a_declaration_get_the_default_intents(tmp_path):
+    (tmp_path / "Old.py").write_text("class OldCog(Cog):\n    pass\n")
+    assert cog_intents(str(tmp_path)) == default_intents()
+
+
+def test_bot_cogs_only_need_guilds():
+    modules = set(sys.modules)
+    assert cog_intents(COGS_DIR) == discord.Intents(guilds=True)
+    assert not {module for module in sys.modules if module.startswith("cogs")} - modules
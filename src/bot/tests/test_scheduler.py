@@ -0,0 +1,115 @@
+import json
+import asyncio
+from datetime import datetime, timedelta
+from Scheduler import JobClaims, RecurringJob, Scheduler
+
+
+def ten_minutes_ago():
+    return (datetime.now() - timedelta(minutes=10)).time().replace(second=0, microsecond=0)
+
+
+def make_job(name, calls, catch_up=None):
+    async def callback():
+        calls.append(name)
+
+    return RecurringJob(name, [ten_minutes_ago()], callback, catch_up=catch_up)
+
+
+def test_next_run_and_previous_run_across_midnight():
+    job = RecurringJob("job", [datetime.min.time().replace(hour=9)], None)
+    night = datetime(2026, 3, 1, 23, 0).astimezone()
+    assert job.next_run(night) == datetime(2026, 3, 2, 9, 0).astimezone()
+    assert job.previous_run(night) == datetime(2026, 3, 1, 9, 0).astimezone()
+
+
+def test_catches_up_on_a_missed_run(tmp_path):
+    state_path = tmp_path / "scheduler.json"
+    # The last run was the day before the one that was just missed
+    state_path.write_text(json.dumps({"job": (datetime.now() - timedelta(days=1, minutes=10)).timestamp()}))
+    calls = []
+
+    async def run():
+        scheduler = Scheduler(str(state_path))
+        await scheduler.load()
+        job = make_job("job", calls, catch_up=timedelta(hours=3))
+        scheduler.add_job(job)
+        missed = job.previous_run(datetime.now().astimezone())
+        assert scheduler.next_run("job") == missed
+
+        scheduler.start()
+        for _ in range(100):
+            if calls:
+                break
+            await asyncio.sleep(0.01)
+        # Let the run save its state
+        await asyncio.gather(*scheduler._running)
+        scheduler.stop()
+        # The next run is tomorrow's, not another catch-up
+        assert scheduler.next_run("job") == job.next_run(datetime.now().astimezone())
+        return missed
+
+    missed = asyncio.run(run())
+    assert calls == ["job"]
+    assert json.loads(state_path.read_text())["job"] == missed.timestamp()
+
+
+def test_does_not_catch_up_without_catch_up_or_when_too_old(tmp_path):
+    state_path = tmp_path / "scheduler.json"
+    state_path.write_text(json.dumps({"job": 0, "old": 0}))
+
+    async def run():
+        scheduler = Scheduler(str(state_path))
+        await scheduler.load()
+        now = datetime.now().astimezone()
+        scheduler.add_job(make_job("job", []))
+        scheduler.add_job(make_job("old", [], catch_up=timedelta(minutes=1)))
+        assert scheduler.next_run("job") > now
+        assert scheduler.next_run("old") > now
+
+    asyncio.run(run())
+
+
+def test_first_sight_of_a_job_does_not_catch_up(tmp_path):
+    async def run():
+        scheduler = Scheduler(str(tmp_path / "scheduler.json"))
+        await scheduler.load()
+        now = datetime.now().astimezone()
+        scheduler.add_job(make_job("job", [], catch_up=timedelta(hours=3)))
+        assert scheduler.next_run("job") > now
+
+    asyncio.run(run())
+
+
+def test_two_claimants_make_each_run_once(tmp_path):
+    path = str(tmp_path / "job_runs.sqlite3")
+    first, second = JobClaims(path, owner="first"), JobClaims(path, owner="second")
+    run = datetime(2026, 3, 1, 9, 0).astimezone()
+
+    async def claim_both(run):
+        return await asyncio.gather(first.claim("job", run), second.claim("job", run))
+
+    assert sorted(asyncio.run(claim_both(run))) == [False, True]
+    # A claimed run stays claimed, and the next run is up for grabs again
+    assert asyncio.run(first.claim("job", run)) is False
+    assert sorted(asyncio.run(claim_both(run + timedelta(days=1)))) == [False, True]
+    assert asyncio.run(second.last_runs()) == {"job": int((run + timedelta(days=1)).timestamp())}
+
+
+def test_workers_sharing_claims_run_a_job_once(tmp_path):
+    path = str(tmp_path / "job_runs.sqlite3")
+    calls = []
+
+    async def run():
+        schedulers = [Scheduler(str(tmp_path / f"unused-{owner}.json"), JobClaims(path, owner)) for owner in "ab"]
+        job = make_job("job", calls)
+        missed = job.previous_run(datetime.now().astimezone())
+        for scheduler in schedulers:
+            scheduler.start()
+        # What each worker's loop does when the run comes up
+        await asyncio.gather(*(scheduler._run(job, missed) for scheduler in schedulers))
+        for scheduler in schedulers:
+            scheduler.stop()
+            assert scheduler._last_runs["job"] == missed.timestamp()
+
+    asyncio.run(run())
+    assert calls == ["job"]